@@ -0,0 +1,147 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 512))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+# Cosine similarity above which a differently-worded question reuses a cached answer
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+class AnswerCache:
+    """
+    LRU + TTL cache of chat answers keyed by (repo_id, sha, normalized question).
+    Misses on the exact key fall back to the most similar cached question of the
+    same repo and SHA by embedding cosine (entries stored without an embedding
+    only match exactly). Entries of a repo are dropped as
+    soon as a lookup arrives with a different SHA (i.e. RepoDB moved on).
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL, similarity=ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()  # (repo_id, sha, question) -> (answer, unit embedding or None, created)
+        self._shas = {}  # repo_id -> sha of its cached entries
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _drop_repo(self, repo_id):
+        for key in [key for key in self._entries if key[0] == repo_id]:
+            del self._entries[key]
+        self._shas.pop(repo_id, None)
+
+    def _check_sha(self, repo_id, sha):
+        if self._shas.get(repo_id, sha) != sha:
+            self._drop_repo(repo_id)
+            self.invalidations += 1
+            print(f"🧹 Answer cache invalidated for {repo_id} (new SHA {str(sha)[:7]}).")
+        self._shas[repo_id] = sha
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for key in [key for key, (_, _, created) in self._entries.items() if created < cutoff]:
+            del self._entries[key]
+
+    def contains(self, repo_id, sha, question):
+        """True when the exact (normalized) question is cached; no hit counters or recency change."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            self._check_sha(repo_id, sha)
+            self._expire()
+            return (repo_id, sha, normalize_question(question)) in self._entries
+
+    def get(self, repo_id, sha, question, embedding=None, embed=None):
+        """
+        Returns (answer, kind) with kind 'exact' or 'semantic', or (None, None) on a miss.
+        Without `embedding`, `embed` (a callable returning it) is only called after an
+        exact miss, when cached entries of the same repo and SHA could match semantically.
+        """
+        if not self.enabled:
+            return None, None
+        key = (repo_id, sha, normalize_question(question))
+        with self._lock:
+            self._check_sha(repo_id, sha)
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[0], "exact"
+            candidates = self.similarity > 0 and any(
+                other_key[:2] == key[:2] and other is not None for other_key, (_, other, _) in self._entries.items()
+            )
+        if candidates and embedding is None and embed is not None:
+            # Outside the lock: usually a remote call
+            embedding = embed()
+        with self._lock:
+            if candidates and embedding is not None:
+                query = np.array(embedding, dtype=np.float32)
+                query /= max(float(np.linalg.norm(query)), 1e-12)
+                best_key, best_score = None, self.similarity
+                for other_key, (_, other, _) in self._entries.items():
+                    if other_key[:2] == key[:2] and other is not None:
+                        score = float(other @ query)
+                        if score >= best_score:
+                            best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    print(f"🧠 Answer cache: '{question[:60]}' matched '{best_key[2][:60]}' ({best_score:.3f}).")
+                    return self._entries[best_key][0], "semantic"
+            self.misses += 1
+            return None, None
+
+    def put(self, repo_id, sha, question, answer, embedding=None):
+        if not self.enabled:
+            return
+        if embedding is not None:
+            embedding = np.array(embedding, dtype=np.float32)
+            embedding /= max(float(np.linalg.norm(embedding)), 1e-12)
+        with self._lock:
+            self._check_sha(repo_id, sha)
+            key = (repo_id, sha, normalize_question(question))
+            self._entries.pop(key, None)
+            self._entries[key] = (answer, embedding, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, repo_id):
+        with self._lock:
+            self._drop_repo(repo_id)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / total, 3) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+# Singleton instance
+answer_cache = AnswerCache()
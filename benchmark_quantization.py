@@ -0,0 +1,77 @@
+import os
+import sys
+import glob
+import sqlite3
+import numpy as np
+
+from chroma_client import chroma_registry
+from quantized_store import quantize_int8, int8_scores, RESCORE_FACTOR
+
+# Configuration
+NUM_QUERIES = 200
+TOP_K = 10
+
+def load_collections():
+    """Yields (name, float32 vectors) for every ingested repo, Chroma or quantized."""
+    client = chroma_registry.client
+    for collection in client.list_collections():
+        name = getattr(collection, "name", collection)
+        if not name.startswith("kiwi_"):
+            continue
+        embeddings = chroma_registry.get_collection(name).get(include=["embeddings"])["embeddings"]
+        if embeddings is not None and len(embeddings):
+            yield name, np.asarray(embeddings, dtype=np.float32)
+    for path in glob.glob(os.path.join(chroma_registry.path, "quantized_*.sqlite3")):
+        with sqlite3.connect(path) as conn:
+            rows = conn.execute("SELECT vector FROM vectors").fetchall()
+        if rows:
+            yield os.path.basename(path), np.array([np.frombuffer(r[0], dtype=np.float32) for r in rows])
+
+def benchmark(name, vectors, rng):
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    codes, scales = quantize_int8(vectors)
+
+    # Queries: stored vectors plus noise, so the nearest neighbours are non-trivial
+    picks = rng.choice(len(unit), size=min(NUM_QUERIES, len(unit)), replace=False)
+    queries = unit[picks] + rng.normal(scale=0.05, size=unit[picks].shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    k = min(TOP_K, len(unit))
+    n_candidates = min(len(unit), k * RESCORE_FACTOR)
+    recall_raw, recall_rescored = [], []
+    for q in queries:
+        truth = set(np.argsort(-(unit @ q))[:k])
+        approx = int8_scores(codes, scales, q)
+        recall_raw.append(len(truth & set(np.argsort(-approx)[:k])) / k)
+        candidates = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+        rescored = candidates[np.argsort(-(unit[candidates] @ q))[:k]]
+        recall_rescored.append(len(truth & set(rescored)) / k)
+
+    float_bytes = vectors.astype(np.float32).nbytes
+    int8_bytes = codes.nbytes + scales.nbytes
+    print(
+        f"{name[:40]:<40} {len(unit):>7} {unit.shape[1]:>5} "
+        f"{float_bytes / 1024 / 1024:>9.2f} {int8_bytes / 1024 / 1024:>9.2f} {1 - int8_bytes / float_bytes:>7.1%} "
+        f"{np.mean(recall_raw):>9.3f} {np.mean(recall_rescored):>9.3f}"
+    )
+    return float_bytes, int8_bytes
+
+def main():
+    print(f"📏 int8 quantization benchmark: recall@{TOP_K} vs memory (re-score factor {RESCORE_FACTOR})")
+    print(f"{'collection':<40} {'vectors':>7} {'dim':>5} {'f32 MB':>9} {'int8 MB':>9} {'saved':>7} {'R@10 raw':>9} {'R@10 re':>9}")
+    rng = np.random.default_rng(0)
+    totals = [0, 0]
+    for name, vectors in load_collections():
+        float_bytes, int8_bytes = benchmark(name, vectors, rng)
+        totals[0] += float_bytes
+        totals[1] += int8_bytes
+    if not totals[0]:
+        print(f"❌ No ingested collections found in {chroma_registry.path}.")
+        sys.exit(1)
+    print(
+        f"\n✅ Total: {totals[0] / 1024 / 1024:.2f} MB float32 -> {totals[1] / 1024 / 1024:.2f} MB int8 "
+        f"({1 - totals[1] / totals[0]:.1%} less resident vector memory)"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import time
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class BlobCache:
+    """
+    On-disk, content-addressed cache of file contents keyed by git blob SHA.
+    Blobs are immutable, so a cached entry never goes stale: re-ingesting a repo
+    (or another branch of it) only downloads blobs that actually changed.
+    Total size is capped; least-recently-used blobs are evicted first.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("BLOB_CACHE_DIR", "./blob_cache")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("BLOB_CACHE_MAX_MB", 1024)) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None  # sha -> [size, last_access], built lazily from disk
+        self._total_bytes = 0
+
+    @staticmethod
+    def git_blob_sha(data):
+        """Computes the git blob SHA-1 for raw file bytes (same as `git hash-object`)."""
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    def _path(self, sha):
+        return os.path.join(self.cache_dir, sha[:2], sha)
+
+    def _load_index(self):
+        """Scans the cache directory once to rebuild sizes and access times."""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                self._index[name] = [st.st_size, st.st_mtime]
+                self._total_bytes += st.st_size
+
+    def get(self, sha):
+        """Returns cached bytes for a blob SHA, or None on a miss."""
+        if not sha:
+            return None
+        with self._lock:
+            self._load_index()
+            if sha not in self._index:
+                self.misses += 1
+                return None
+        try:
+            with open(self._path(sha), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._drop(sha)
+                self.misses += 1
+            return None
+
+        # Touch the file so LRU order survives process restarts
+        try:
+            os.utime(self._path(sha))
+        except OSError:
+            pass
+        with self._lock:
+            if sha in self._index:
+                self._index[sha][1] = time.time()
+            self.hits += 1
+        return data
+
+    def put(self, sha, data):
+        """Stores blob bytes under their SHA and evicts old entries if over the cap."""
+        if not sha or len(data) > self.max_bytes:
+            return
+        path = self._path(sha)
+        with self._lock:
+            self._load_index()
+            if sha in self._index:
+                return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ BlobCache: failed to write {sha}: {e}")
+            return
+
+        with self._lock:
+            if sha not in self._index:
+                self._index[sha] = [len(data), os.path.getmtime(path)]
+                self._total_bytes += len(data)
+            self._evict()
+
+    def _drop(self, sha):
+        entry = self._index.pop(sha, None)
+        if entry:
+            self._total_bytes -= entry[0]
+
+    def _evict(self):
+        """Removes least-recently-used blobs until the cache fits its size cap."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for sha, _ in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(sha))
+            except OSError:
+                pass
+            self._drop(sha)
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def report(self):
+        """Returns a one-line hit/miss summary for ingestion logs."""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (
+            f"🗃️ Blob cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{self._total_bytes / 1024 / 1024:.1f}/{self.max_bytes / 1024 / 1024:.0f} MB used"
+        )
+
+# Singleton instance
+blob_cache = BlobCache()
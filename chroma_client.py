@@ -0,0 +1,115 @@
+import time
+import threading
+import chromadb
+
+from quantized_store import QuantizedVectorStore
+
+class ChromaRegistry:
+    """
+    Process-wide registry of the Chroma client (plus quantized stores). The
+    client is started once, so index loads and ingests stop paying client
+    start-up and SQLite open costs on every call. Collection handles are not
+    kept: ingests in a cli_ingest subprocess may delete and recreate a
+    collection under a new id, so each lookup resolves the name again.
+    Thread-safe.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or "./chroma_db"
+        self._lock = threading.RLock()
+        self._client = None
+        self._quantized = {}
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                start = time.perf_counter()
+                self._client = chromadb.PersistentClient(path=self.path)
+                print(f"🔌 Chroma client started ({self.path}) in {(time.perf_counter() - start) * 1000:.0f}ms")
+            return self._client
+
+    def get_collection(self, name):
+        """Returns the named collection, creating it if needed."""
+        return self.client.get_or_create_collection(name)
+
+    def delete_collection(self, name):
+        """Drops a collection. Returns False if it did not exist."""
+        with self._lock:
+            try:
+                self.client.delete_collection(name)
+                return True
+            except ValueError:
+                return False
+            except Exception as e:
+                # Newer Chroma versions raise NotFoundError instead of ValueError
+                if "does not exist" in str(e):
+                    return False
+                raise
+
+    def rename_collection(self, name, new_name):
+        """Renames a collection in place (e.g. a staged ingest taking over the repo's name)."""
+        with self._lock:
+            self.client.get_collection(name).modify(name=new_name)
+
+    def get_quantized_store(self, db_path):
+        with self._lock:
+            store = self._quantized.get(db_path)
+            if store is None:
+                store = QuantizedVectorStore(db_path)
+                self._quantized[db_path] = store
+            return store
+
+    def close_quantized_store(self, db_path):
+        """Closes a cached quantized store (e.g. before its file is deleted)."""
+        with self._lock:
+            store = self._quantized.pop(db_path, None)
+            if store is not None:
+                store.client.close()
+
+    def forget_quantized_store(self, db_path):
+        """
+        Stops handing out a cached quantized store whose file another process
+        rewrote; engines still using it keep it open until they are released.
+        """
+        with self._lock:
+            self._quantized.pop(db_path, None)
+
+    def health_check(self):
+        """
+        Pings the client; on failure the client is dropped so the next call
+        reconnects. Returns a status dict.
+        """
+        start = time.perf_counter()
+        try:
+            self.client.heartbeat()
+            with self._lock:
+                return {
+                    "ok": True,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "open_quantized_stores": len(self._quantized),
+                }
+        except Exception as e:
+            print(f"⚠️ Chroma health check failed: {e}. Resetting client.")
+            self._reset()
+            return {"ok": False, "error": str(e)}
+
+    def _reset(self):
+        with self._lock:
+            client, self._client = self._client, None
+            if client is not None and hasattr(client, "close"):
+                try:
+                    client.close()
+                except Exception:
+                    pass
+
+    def shutdown(self):
+        """Closes every quantized store and the Chroma client."""
+        with self._lock:
+            for db_path in list(self._quantized):
+                self.close_quantized_store(db_path)
+            self._reset()
+        print("🔌 Chroma registry shut down.")
+
+# Singleton instance
+chroma_registry = ChromaRegistry()
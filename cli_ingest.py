@@ -1,30 +1,92 @@
-
+import os
 import sys
+import argparse
 import nest_asyncio
 import traceback
-from indexer_robust import ingest_repo, generate_architecture_json
+from indexer_robust import ingest_repo, update_repo, generate_architecture_json, get_architecture_path
 
 # Apply nest_asyncio here, safely in a standalone process
 nest_asyncio.apply()
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Ingest a GitHub repository into Kiwi.")
+    parser.add_argument("owner")
+    parser.add_argument("repo")
+    parser.add_argument("branch")
+    parser.add_argument(
+        "--source",
+        choices=["api", "archive", "local", "git"],
+        default=None,
+        help=(
+            "'api' downloads files one by one, 'archive' streams a single tarball, "
+            "'local' reads --local-path as a directory, 'git' reads <branch> from the git repo at --local-path "
+            "(default: INGEST_SOURCE env or 'api')."
+        )
+    )
+    parser.add_argument(
+        "--local-path",
+        default=None,
+        help="Directory or (bare) git repository for the 'local' and 'git' sources."
+    )
+    parser.add_argument(
+        "--base-sha",
+        default=None,
+        help="Previously ingested commit. When set, only files changed since it are re-indexed."
+    )
+    parser.add_argument(
+        "--head-sha",
+        default=None,
+        help="Commit to update to in incremental mode (default: current branch HEAD)."
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Processes used to parse documents into nodes (default: PARSE_WORKERS env or 1, i.e. no pool)."
+    )
+    return parser.parse_args(argv)
+
 def main():
     if len(sys.argv) < 4:
-        print("Usage: python cli_ingest.py <owner> <repo> <branch>")
+        print("Usage: python cli_ingest.py <owner> <repo> <branch> [--source api|archive|local|git] [--local-path PATH] [--base-sha SHA [--head-sha SHA]] [--parse-workers N]")
         sys.exit(1)
         
-    owner = sys.argv[1]
-    repo = sys.argv[2]
-    branch = sys.argv[3]
+    args = parse_args(sys.argv[1:])
+    if args.source in ("local", "git") and not args.local_path:
+        print("❌ --local-path is required for the 'local' and 'git' sources.")
+        sys.exit(1)
+    if args.base_sha and args.source in ("local", "git"):
+        print("❌ Incremental updates (--base-sha) are only supported for GitHub sources.")
+        sys.exit(1)
+    if args.parse_workers is not None and args.parse_workers < 1:
+        print("❌ --parse-workers must be at least 1.")
+        sys.exit(1)
+    owner = args.owner
+    repo = args.repo
+    branch = args.branch
     
     print(f"🚀 CLI Ingestion starting for {owner}/{repo}/{branch}...")
     
     try:
-        repo_id = ingest_repo(owner, repo, branch)
+        if args.base_sha:
+            repo_id, changed = update_repo(
+                owner, repo, branch, args.base_sha, args.head_sha,
+                source=args.source, parse_workers=args.parse_workers
+            )
+        else:
+            repo_id = ingest_repo(
+                owner, repo, branch, source=args.source, local_path=args.local_path,
+                parse_workers=args.parse_workers
+            )
+            changed = True
         print(f"✅ CLI Ingestion success. Repo ID: {repo_id}")
         
-        # Generate architecture JSON
-        generate_architecture_json(repo_id)
-        print("✅ CLI Architecture JSON generation success.")
+        # Generate architecture JSON (incremental updates only re-run modules whose retrieval changed)
+        if not changed and os.path.exists(get_architecture_path(repo_id)):
+            print("⏭️ Nothing changed; keeping the existing architecture JSON.")
+        else:
+            generate_architecture_json(repo_id, reuse_reports=bool(args.base_sha))
+            print("✅ CLI Architecture JSON generation success.")
         
     except Exception as e:
         print(f"❌ CLI Ingestion Failed: {e}")
@@ -0,0 +1,187 @@
+import os
+import re
+from typing import Any, List, Sequence
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.node_parser import HierarchicalNodeParser, NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, NodeRelationship
+from llama_index.core.utils import get_tokenizer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Leaves are whole functions/methods (small ones packed together) up to this size;
+# parents group neighbouring leaves up to the parent size for auto-merging
+LEAF_CHUNK_TOKENS = int(os.getenv("CODE_LEAF_CHUNK_TOKENS", 512))
+PARENT_CHUNK_TOKENS = int(os.getenv("CODE_PARENT_CHUNK_TOKENS", 1536))
+# Non-code files (markdown, json, css, html, txt) keep a plain size hierarchy
+FALLBACK_CHUNK_SIZES = [1024, 256]
+# Chunking strategy: 'code' (structural) or 'hierarchical' (fixed token sizes)
+NODE_PARSER = os.getenv("NODE_PARSER", "code")
+
+PYTHON_EXTS = (".py",)
+JS_EXTS = (".js", ".jsx", ".ts", ".tsx")
+
+# Same definitions the repo map looks for (class/def/function/export/interface),
+# anchored at column 0 for top-level blocks and indented for class members
+TOP_LEVEL_PATTERNS = {
+    "python": re.compile(r'^(?:async\s+def|def|class)\s+\w+'),
+    "js": re.compile(
+        r'^(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+        r'(?:function\*?|class|interface|type|enum|const|let|var)\s+[\w$]+'
+    ),
+}
+MEMBER_PATTERNS = {
+    "python": re.compile(r'^\s+(?:async\s+def|def)\s+\w+'),
+    "js": re.compile(
+        r'^\s+(?:(?:public|private|protected|static|async|get|set|readonly|override)\s+)*'
+        r'(?:[\w$]+\s*(?:<[^>]*>)?\s*\([^)]*\)\s*(?::[^{=]*)?\{|[\w$]+\s*=\s*(?:async\s*)?\()'
+    ),
+}
+# Comments and decorators directly above a definition belong to it
+LEADING_LINE = re.compile(r'^\s*(?:#|//|/\*|\*|@)')
+
+def detect_language(file_path):
+    if file_path.endswith(PYTHON_EXTS):
+        return "python"
+    if file_path.endswith(JS_EXTS):
+        return "js"
+    return None
+
+def _split_at(lines, pattern):
+    """
+    Splits lines into blocks, starting a new block at every line matching `pattern`
+    (pulling directly preceding comment/decorator lines into it). The first block
+    is whatever precedes the first match (imports, module docstring, header).
+    """
+    starts = [0]
+    for i, line in enumerate(lines):
+        if i == 0 or not pattern.match(line):
+            continue
+        start = i
+        while start - 1 > starts[-1] and LEADING_LINE.match(lines[start - 1]):
+            start -= 1
+        if start > starts[-1]:
+            starts.append(start)
+    starts.append(len(lines))
+    return [lines[a:b] for a, b in zip(starts, starts[1:]) if b > a]
+
+class CodeHierarchyNodeParser(NodeParser):
+    """
+    Builds the parent/child node hierarchy along code structure instead of fixed
+    token windows: leaves are top-level functions, classes, or (for large
+    classes) individual methods, with small neighbours packed together; parents
+    group neighbouring leaves. Output has the same PARENT/CHILD relationships as
+    HierarchicalNodeParser, so AutoMergingRetriever works unchanged.
+    Non-code files go through a HierarchicalNodeParser fallback.
+    """
+
+    leaf_chunk_tokens: int = LEAF_CHUNK_TOKENS
+    parent_chunk_tokens: int = PARENT_CHUNK_TOKENS
+
+    _fallback: HierarchicalNodeParser = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._fallback = HierarchicalNodeParser.from_defaults(chunk_sizes=FALLBACK_CHUNK_SIZES)
+        self._tokenizer = get_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CodeHierarchyNodeParser"
+
+    def _tokens(self, text):
+        return len(self._tokenizer(text))
+
+    def _units(self, text, language):
+        """Structural units of a file, in order; their concatenation is the file text."""
+        lines = text.splitlines(keepends=True)
+        units = []
+        for block in _split_at(lines, TOP_LEVEL_PATTERNS[language]):
+            block_text = "".join(block)
+            if self._tokens(block_text) <= self.leaf_chunk_tokens:
+                units.append(block_text)
+                continue
+            # Too big for one leaf: descend to its members (methods)
+            for member in _split_at(block, MEMBER_PATTERNS[language]):
+                units.append("".join(member))
+        return units
+
+    def _split_lines(self, text, budget):
+        """Line-based fallback for a single unit (e.g. one huge function) over budget."""
+        pieces, current, current_tokens = [], [], 0
+        for line in text.splitlines(keepends=True):
+            line_tokens = self._tokens(line)
+            if current and current_tokens + line_tokens > budget:
+                pieces.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += line_tokens
+        if current:
+            pieces.append("".join(current))
+        return pieces
+
+    def _pack(self, texts, budget):
+        """Greedily packs consecutive texts into groups of at most `budget` tokens."""
+        groups, current, current_tokens = [], [], 0
+        for text in texts:
+            tokens = self._tokens(text)
+            if current and current_tokens + tokens > budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def _parse_code_node(self, node, language):
+        text = node.get_content()
+        leaf_texts = []
+        for group in self._pack(self._units(text, language), self.leaf_chunk_tokens):
+            joined = "".join(group)
+            if len(group) == 1 and self._tokens(joined) > self.leaf_chunk_tokens:
+                leaf_texts.extend(self._split_lines(joined, self.leaf_chunk_tokens))
+            else:
+                leaf_texts.append(joined)
+        leaf_texts = [t for t in leaf_texts if t.strip()]
+        if not leaf_texts:
+            return []
+
+        all_nodes = []
+        for group in self._pack(leaf_texts, self.parent_chunk_tokens):
+            leaves = build_nodes_from_splits(group, node, id_func=self.id_func)
+            if len(leaves) > 1:
+                parent = build_nodes_from_splits(["".join(group)], node, id_func=self.id_func)[0]
+                parent.relationships[NodeRelationship.CHILD] = [leaf.as_related_node_info() for leaf in leaves]
+                for leaf in leaves:
+                    leaf.relationships[NodeRelationship.PARENT] = parent.as_related_node_info()
+                all_nodes.append(parent)
+            # A lone leaf is its own root; a single-child parent adds nothing
+            all_nodes.extend(leaves)
+        return all_nodes
+
+    def _parse_nodes(
+        self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any
+    ) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for node in nodes:
+            language = detect_language(node.metadata.get("file_path", ""))
+            if language is None:
+                all_nodes.extend(self._fallback.get_nodes_from_documents([node]))
+            else:
+                all_nodes.extend(self._parse_code_node(node, language))
+        return all_nodes
+
+def create_node_parser():
+    """
+    'code' (default) chunks along file -> class -> function boundaries;
+    'hierarchical' is the previous fixed 1024/512/128 token hierarchy.
+    Both produce parent/child nodes for the AutoMergingRetriever.
+    Module-level so parse worker processes can build their own parser.
+    """
+    if NODE_PARSER == "hierarchical":
+        return HierarchicalNodeParser.from_defaults(chunk_sizes=[1024, 512, 128])
+    return CodeHierarchyNodeParser()
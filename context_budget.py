@@ -0,0 +1,180 @@
+import os
+import json
+from dotenv import load_dotenv
+
+from llama_index.core import get_response_synthesizer
+from llama_index.core.query_engine import RetrieverQueryEngine
+
+from repo_map import split_repo_map, assemble_repo_map, ALLOWED_EXTS
+from lexical_index import tokenize, count_tokens
+from lazy_docstore import BatchedAutoMergingRetriever
+
+load_dotenv()
+
+# Tokens of repo map + dependency graph allowed into one chat prompt
+CHAT_CONTEXT_BUDGET_TOKENS = int(os.getenv("CHAT_CONTEXT_BUDGET_TOKENS", 4000))
+# What the prompt used to carry: the whole map plus this many characters of graph
+LEGACY_GRAPH_CHARS = 50000
+# Files imported by / importing a retrieved file are worth this fraction of its score
+NEIGHBOUR_WEIGHT = 0.5
+
+def _module_key(path):
+    """Normalizes a file path or import specifier ('./ui/Nav', 'src/ui/Nav.tsx', 'app.ui.nav') for matching."""
+    path = path.strip().strip("'\"").lower()
+    while path.startswith(("./", "../")):
+        path = path.split("/", 1)[1]
+    path = path.lstrip("@~/")
+    root, ext = os.path.splitext(path)
+    if ext in ALLOWED_EXTS:
+        path = root
+    elif "/" not in path:
+        path = path.replace(".", "/")
+    return path[:-len("/index")] if path.endswith("/index") else path
+
+class ContextBudgeter:
+    """
+    Picks the repo map sections and dependency graph entries relevant to one
+    question: files of the retrieved nodes first, then their graph neighbours,
+    then files whose path or symbols share terms with the question, all within
+    a token budget. The tech stack header is always kept when it fits.
+    """
+
+    def __init__(self, repo_map, dependency_graph, budget_tokens=CHAT_CONTEXT_BUDGET_TOKENS):
+        self.budget_tokens = budget_tokens
+        self.header, self.sections = split_repo_map(repo_map or "")
+        try:
+            self.graph = json.loads(dependency_graph) if dependency_graph else {}
+        except json.JSONDecodeError:
+            self.graph = {}
+        self.header_tokens = count_tokens("\n".join(self.header))
+        self.section_tokens = {path: count_tokens("\n".join(lines)) for path, lines in self.sections.items()}
+        self.graph_entries = {path: self._graph_entry(path) for path in self.graph}
+        self.graph_tokens = {path: count_tokens(entry) for path, entry in self.graph_entries.items()}
+        self.section_terms = {
+            path: set(tokenize(path + "\n" + "\n".join(lines))) for path, lines in self.sections.items()
+        }
+        self.neighbours = self._build_neighbours()
+        self.legacy_tokens = (
+            self.header_tokens + sum(self.section_tokens.values()) + count_tokens((dependency_graph or "")[:LEGACY_GRAPH_CHARS])
+        )
+
+    @classmethod
+    def for_repo(cls, repo_id, budget_tokens=CHAT_CONTEXT_BUDGET_TOKENS):
+        texts = []
+        for path in (f"./maps/{repo_id}.txt", f"./graphs/{repo_id}.json"):
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    texts.append(f.read())
+            else:
+                texts.append("")
+        return cls(*texts, budget_tokens=budget_tokens)
+
+    def _graph_entry(self, path):
+        info = self.graph[path]
+        if isinstance(info, dict):
+            # Failed analyses only carry an error message; keep what is useful
+            info = {k: v for k, v in info.items() if k != "error" and v not in ("", [], None, "Analysis failed")}
+        return f"{json.dumps(path)}: {json.dumps(info)}"
+
+    def _build_neighbours(self):
+        # Every path suffix ('src/ui/nav', 'ui/nav', 'nav') -> files, so an import resolves in one lookup
+        by_suffix = {}
+        for path in self.graph:
+            parts = _module_key(path).split("/")
+            for i in range(len(parts)):
+                by_suffix.setdefault("/".join(parts[i:]), set()).add(path)
+        neighbours = {path: set() for path in self.graph}
+        for path, info in self.graph.items():
+            dependencies = info.get("dependencies", []) if isinstance(info, dict) else []
+            for dependency in dependencies:
+                if not isinstance(dependency, str):
+                    continue
+                for target in by_suffix.get(_module_key(dependency), ()):
+                    if target != path:
+                        neighbours[path].add(target)
+                        neighbours[target].add(path)
+        return neighbours
+
+    def _rank_files(self, question, file_paths):
+        scores = {}
+        for rank, path in enumerate(dict.fromkeys(file_paths)):
+            scores[path] = scores.get(path, 0.0) + 10.0 / (rank + 1)
+        for path, score in list(scores.items()):
+            for neighbour in self.neighbours.get(path, ()):
+                scores[neighbour] = max(scores.get(neighbour, 0.0), score * NEIGHBOUR_WEIGHT)
+        question_terms = set(tokenize(question))
+        if question_terms:
+            for path, terms in self.section_terms.items():
+                overlap = len(question_terms & terms)
+                if overlap:
+                    scores[path] = scores.get(path, 0.0) + overlap / len(question_terms)
+        return sorted(scores, key=scores.get, reverse=True)
+
+    def select(self, question, nodes):
+        """
+        Returns (repo_map_text, dependency_graph_text, tokens_used) for a question
+        and its retrieved nodes.
+        """
+        file_paths = [n.node.metadata.get("file_path") for n in nodes if n.node.metadata.get("file_path")]
+        used = self.header_tokens if self.header_tokens <= self.budget_tokens else 0
+        header = self.header if used else []
+        chosen_sections, chosen_graph = set(), []
+        for path in self._rank_files(question, file_paths):
+            section_cost = self.section_tokens.get(path, 0)
+            if path in self.sections and used + section_cost <= self.budget_tokens:
+                chosen_sections.add(path)
+                used += section_cost
+            graph_cost = self.graph_tokens.get(path, 0)
+            if path in self.graph_entries and used + graph_cost <= self.budget_tokens:
+                chosen_graph.append(path)
+                used += graph_cost
+            if used >= self.budget_tokens:
+                break
+        # Keep the map's own (path) order so related files stay together
+        sections = [lines for path, lines in self.sections.items() if path in chosen_sections]
+        repo_map = assemble_repo_map(header, sections) if (header or sections) else "(No Repo Map found)"
+        if len(chosen_sections) < len(self.sections):
+            repo_map += f"\n\n(Showing {len(chosen_sections)} of {len(self.sections)} files: those relevant to this question.)"
+        graph = "{\n" + ",\n".join(self.graph_entries[path] for path in chosen_graph) + "\n}" if chosen_graph else "(No Dependency Graph found)"
+        return repo_map, graph, used
+
+class BudgetedQueryEngine(RetrieverQueryEngine):
+    """
+    Retriever query engine whose QA template has {repo_map} and
+    {dependency_graph} slots, filled per query by a ContextBudgeter from the
+    retrieved nodes, instead of pasting the whole map and graph into every prompt.
+    """
+
+    def __init__(self, retriever, qa_template, budgeter, repo_id="", **kwargs):
+        self.qa_template = qa_template
+        self.budgeter = budgeter
+        self.repo_id = repo_id
+        super().__init__(retriever, **kwargs)
+
+    def synthesizer_for(self, query_bundle, nodes, streaming=False):
+        repo_map, graph, used = self.budgeter.select(query_bundle.query_str, nodes)
+        print(
+            f"✂️ Context budget ({self.repo_id}): map+graph {self.budgeter.legacy_tokens} -> {used} tokens "
+            f"(budget {self.budgeter.budget_tokens})"
+        )
+        template = self.qa_template.partial_format(repo_map=repo_map, dependency_graph=graph)
+        return get_response_synthesizer(text_qa_template=template, streaming=streaming)
+
+    def retrieve_many(self, query_bundles):
+        """retrieve() for several queries; one batch when the retriever supports it."""
+        if isinstance(self._retriever, BatchedAutoMergingRetriever):
+            node_lists = self._retriever.retrieve_many(query_bundles)
+        else:
+            node_lists = [self._retriever.retrieve(query_bundle) for query_bundle in query_bundles]
+        return [
+            self._apply_node_postprocessors(nodes, query_bundle=query_bundle)
+            for nodes, query_bundle in zip(node_lists, query_bundles)
+        ]
+
+    def _query(self, query_bundle):
+        nodes = self.retrieve(query_bundle)
+        return self.synthesizer_for(query_bundle, nodes).synthesize(query=query_bundle, nodes=nodes)
+
+    async def _aquery(self, query_bundle):
+        nodes = await self.aretrieve(query_bundle)
+        return await self.synthesizer_for(query_bundle, nodes).asynthesize(query=query_bundle, nodes=nodes)
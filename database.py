@@ -1,11 +1,23 @@
 
 import os
 import json
+import threading
 from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Chat counters are kept in memory and merged into the JSON file at most this often
+CHAT_COUNT_FLUSH_SECONDS = float(os.getenv("CHAT_COUNT_FLUSH_SECONDS", 30))
 
 class RepoDB:
-    def __init__(self, db_path="db/repos.json"):
+    def __init__(self, db_path="db/repos.json", flush_seconds=CHAT_COUNT_FLUSH_SECONDS):
         self.db_path = db_path
+        self.flush_seconds = flush_seconds
+        # Guards every read-modify-write of the file and the pending chat counters
+        self._lock = threading.RLock()
+        self._pending_chats = {}  # repo_id -> [chats not yet flushed, last chat timestamp]
+        self._flush_timer = None
         self._ensure_db()
 
     def _ensure_db(self):
@@ -24,9 +36,11 @@ class RepoDB:
             return {}
 
     def _save(self, data):
-        """Saves the database to disk."""
-        with open(self.db_path, "w", encoding="utf-8") as f:
+        """Saves the database to disk; readers see either the old or the new file, never a partial one."""
+        tmp_path = f"{self.db_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.db_path)
 
     def get_all(self):
         """Returns all repositories as a list of values."""
@@ -46,20 +60,69 @@ class RepoDB:
         if "repo_id" not in repo_data:
             raise ValueError("repo_data must contain 'repo_id'")
             
-        data = self._load()
-        repo_id = repo_data["repo_id"]
-        
-        # Merge if exists, or create new
-        if repo_id in data:
-            data[repo_id].update(repo_data)
-        else:
-            data[repo_id] = repo_data
+        with self._lock:
+            data = self._load()
+            repo_id = repo_data["repo_id"]
             
-        # Update timestamp
-        data[repo_id]["last_updated"] = datetime.utcnow().isoformat() + "Z"
-        
-        self._save(data)
-        return data[repo_id]
+            # Merge if exists, or create new
+            if repo_id in data:
+                data[repo_id].update(repo_data)
+            else:
+                data[repo_id] = repo_data
+                
+            # Update timestamp
+            data[repo_id]["last_updated"] = datetime.utcnow().isoformat() + "Z"
+            
+            self._save(data)
+            return data[repo_id]
+
+    def _with_pending_chats(self, record):
+        pending = self._pending_chats.get(record["repo_id"])
+        if pending:
+            record = dict(record, chat_count=record.get("chat_count", 0) + pending[0], last_chat=pending[1])
+        return record
+
+    def record_chat(self, repo_id):
+        """
+        Counts a chat against a repository (drives warm preloading of engines).
+        The count is kept in memory and written by a background flush, so chat
+        requests never rewrite the file. Returns the record including unflushed
+        chats, or None for unknown repositories.
+        """
+        record = self.get(repo_id)
+        if record is None:
+            return None
+        with self._lock:
+            pending = self._pending_chats.setdefault(repo_id, [0, None])
+            pending[0] += 1
+            pending[1] = datetime.utcnow().isoformat() + "Z"
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_seconds, self.flush_chats)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            return self._with_pending_chats(record)
+
+    def flush_chats(self):
+        """Merges the in-memory chat counters into the file."""
+        with self._lock:
+            self._flush_timer = None
+            if not self._pending_chats:
+                return
+            data = self._load()
+            for repo_id, (count, last_chat) in self._pending_chats.items():
+                if repo_id in data:
+                    data[repo_id]["chat_count"] = data[repo_id].get("chat_count", 0) + count
+                    data[repo_id]["last_chat"] = last_chat
+            self._pending_chats = {}
+            self._save(data)
+
+    def most_used(self, limit):
+        """Returns the `limit` repository IDs with the most chats, most used first."""
+        with self._lock:
+            repos = [self._with_pending_chats(r) for r in self._load().values()]
+        repos = [r for r in repos if r.get("chat_count")]
+        repos.sort(key=lambda r: (r["chat_count"], r.get("last_chat", "")), reverse=True)
+        return [r["repo_id"] for r in repos[:limit]]
 
 # Singleton instance
 db = RepoDB()
@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 'exact' (content hash), 'near' (content hash + MinHash LSH) or 'off'
+DEDUP_MODE = os.getenv("DEDUP_MODE", "exact")
+# Estimated Jaccard similarity above which two chunks count as near-duplicates
+DEDUP_NEAR_THRESHOLD = float(os.getenv("DEDUP_NEAR_THRESHOLD", 0.9))
+# 'repo' (each repo keeps its own vectors) or 'global' (new ingests store vectors in one
+# collection keyed by content hash, so chunks repeated across repos are embedded and stored once)
+DEDUP_SCOPE = os.getenv("DEDUP_SCOPE", "repo")
+
+DEDUP_FILENAME = "dedup.json"
+
+# MinHash: 64 permutations in 16 LSH bands of 4 rows, over 5-token shingles
+NUM_PERM = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32, so a*x+b never overflows uint64
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def content_hash(text):
+    """Hash of chunk text, ignoring trailing whitespace and line-ending differences."""
+    normalized = "\n".join(line.rstrip() for line in text.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def minhash_signature(text):
+    """MinHash signature over token shingles, or None for chunks too short to compare."""
+    tokens = TOKEN_PATTERN.findall(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return None
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    )
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+class ChunkDeduplicator:
+    """
+    Detects leaf chunks whose content was already seen (license headers, vendored
+    copies, generated boilerplate, repeated config). The first occurrence is the
+    canonical chunk and is the only one embedded and stored in the vector store;
+    later copies stay in the docstore (so auto-merging still sees full parents)
+    and are recorded as duplicates referencing the canonical node id.
+
+    The exact-hash index is persisted next to the docstore, so incremental updates
+    dedup against the whole repo. MinHash signatures are kept for the current run only.
+    Copies across repos are shared by the vector store instead (DEDUP_SCOPE=global,
+    see shared_store).
+    """
+
+    def __init__(self, mode=None, near_threshold=None):
+        self.mode = mode or DEDUP_MODE
+        self.near_threshold = near_threshold or DEDUP_NEAR_THRESHOLD
+        self.canonical_by_hash = {}  # content hash -> canonical node id
+        self.duplicates = {}         # duplicate node id -> canonical node id
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.checked = 0
+        self._signatures = {}        # canonical node id -> MinHash signature
+        self._buckets = {}           # (band, band hash) -> [canonical node ids]
+
+    @property
+    def enabled(self):
+        return self.mode in ("exact", "near")
+
+    def _bands(self, signature):
+        rows = NUM_PERM // LSH_BANDS
+        for band in range(LSH_BANDS):
+            yield band, signature[band * rows:(band + 1) * rows].tobytes()
+
+    def _find_near(self, signature):
+        seen = set()
+        for key in self._bands(signature):
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.near_threshold:
+                    return candidate
+        return None
+
+    def check(self, node):
+        """
+        Returns the canonical node id if `node` duplicates an earlier chunk,
+        otherwise registers it as canonical and returns None.
+        """
+        if not self.enabled:
+            return None
+        self.checked += 1
+        text = node.get_content()
+        digest = content_hash(text)
+        canonical = self.canonical_by_hash.get(digest)
+        if canonical is not None:
+            self.exact_hits += 1
+            self.duplicates[node.node_id] = canonical
+            return canonical
+
+        signature = minhash_signature(text) if self.mode == "near" else None
+        if signature is not None:
+            canonical = self._find_near(signature)
+            if canonical is not None:
+                self.near_hits += 1
+                self.duplicates[node.node_id] = canonical
+                return canonical
+            self._signatures[node.node_id] = signature
+            for key in self._bands(signature):
+                self._buckets.setdefault(key, []).append(node.node_id)
+
+        self.canonical_by_hash[digest] = node.node_id
+        return None
+
+    def forget(self, docstore, node_ids):
+        """
+        Drops nodes that are about to be deleted. When a canonical chunk goes but
+        its duplicates stay, the first surviving duplicate is promoted to canonical.
+        Returns the promoted nodes; they have no vector yet and must be embedded.
+        """
+        node_ids = set(node_ids)
+        for node_id in node_ids:
+            self.duplicates.pop(node_id, None)
+        self.canonical_by_hash = {h: c for h, c in self.canonical_by_hash.items() if c not in node_ids}
+
+        orphans = {}
+        for dup_id, canonical in self.duplicates.items():
+            if canonical in node_ids:
+                orphans.setdefault(canonical, []).append(dup_id)
+
+        promoted = []
+        for dup_ids in orphans.values():
+            new_canonical = docstore.get_node(dup_ids[0], raise_error=False)
+            if new_canonical is None:
+                continue
+            promoted.append(new_canonical)
+            self.canonical_by_hash[content_hash(new_canonical.get_content())] = new_canonical.node_id
+            self.duplicates.pop(new_canonical.node_id, None)
+            for dup_id in dup_ids[1:]:
+                self.duplicates[dup_id] = new_canonical.node_id
+        return promoted
+
+    def report(self):
+        """Returns a one-line summary for ingestion logs."""
+        skipped = self.exact_hits + self.near_hits
+        rate = (skipped / self.checked * 100) if self.checked else 0.0
+        return (
+            f"🧬 Dedup ({self.mode}): {skipped}/{self.checked} leaves were duplicates "
+            f"({self.exact_hits} exact, {self.near_hits} near, {rate:.1f}%) and were not embedded"
+        )
+
+    def save(self, storage_dir):
+        with open(os.path.join(storage_dir, DEDUP_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"canonical_by_hash": self.canonical_by_hash, "duplicates": self.duplicates}, f)
+
+    @classmethod
+    def load(cls, storage_dir, mode=None):
+        dedup = cls(mode=mode)
+        path = os.path.join(storage_dir, DEDUP_FILENAME)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            dedup.canonical_by_hash = data.get("canonical_by_hash", {})
+            dedup.duplicates = data.get("duplicates", {})
+        return dedup
@@ -0,0 +1,151 @@
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def describe_embed_model(embed_model):
+    """
+    Returns (model_name, dimension) identifying the vectors an embed model produces.
+    The dimension is the configured output dimensionality when set, else the
+    model's native size ("native").
+    """
+    model_name = getattr(embed_model, "model_name", None) or type(embed_model).__name__
+    config = getattr(embed_model, "embedding_config", None)
+    if isinstance(config, dict):
+        dimension = config.get("output_dimensionality")
+    else:
+        dimension = getattr(config, "output_dimensionality", None)
+    dimension = dimension or getattr(embed_model, "embed_dim", None) or "native"
+    return model_name, str(dimension)
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embedding vectors keyed by
+    sha256(model name, dimension, chunk text). Re-ingesting a repo only embeds
+    chunks whose text actually changed. Vectors are stored as float32; total
+    size is capped and least-recently-used entries are evicted first.
+    """
+
+    def __init__(self, db_path=None, max_bytes=None):
+        self.db_path = db_path or os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("EMBEDDING_CACHE_MAX_MB", 2048)) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+
+    @staticmethod
+    def make_key(text, model_name, dimension):
+        digest = hashlib.sha256()
+        for part in (model_name, str(dimension), text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _connect(self):
+        """Opens the database once; callers hold the lock."""
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._total_bytes = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        self._conn = conn
+        return conn
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys that are cached."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            unique = list(dict.fromkeys(keys))
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array("f", blob).tolist()
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items):
+        """Stores (key, vector) pairs and evicts old entries if over the cap."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, array.array("f", vector).tobytes(), now) for key, vector in items]
+        with self._lock:
+            conn = self._connect()
+            try:
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ EmbeddingCache: failed to store {len(rows)} vectors: {e}")
+                return
+            # Vectors in one batch come from one model, so they share a size
+            self._total_bytes += (conn.total_changes - before) * len(rows[0][1])
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Removes least-recently-used vectors until the cache fits its size cap."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Evict down to 90% so we don't run this on every insert
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            conn.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k, _ in rows])
+            self._total_bytes -= sum(size for _, size in rows)
+        conn.commit()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def report(self):
+        """Returns a one-line hit/miss summary for ingestion logs."""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (
+            f"🧠 Embedding cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{self._total_bytes / 1024 / 1024:.1f}/{self.max_bytes / 1024 / 1024:.0f} MB used"
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Singleton instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import threading
+from dotenv import load_dotenv
+
+from llama_index.embeddings.google_genai import GoogleGenAIEmbedding
+
+load_dotenv()
+
+# Starting point and bounds for the adaptive controller
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 8))
+EMBED_MIN_BATCH_SIZE = int(os.getenv("EMBED_MIN_BATCH_SIZE", 8))
+# Gemini's batchEmbedContents accepts at most 100 texts per call
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 100))
+# Batches slower than this shrink the batch size
+EMBED_TARGET_LATENCY = float(os.getenv("EMBED_TARGET_LATENCY", 5.0))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 6))
+
+def is_rate_limit_error(error):
+    """True for quota / rate-limit failures (HTTP 429, RESOURCE_EXHAUSTED)."""
+    for attr in ("code", "status_code"):
+        if getattr(error, attr, None) == 429:
+            return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "quota" in message.lower()
+
+def embed_queries(embed_model, queries):
+    """
+    Query embeddings for several questions. LlamaIndex has no batched query
+    embedding; GoogleGenAIEmbedding's batch call accepts the query task type,
+    so Gemini gets one round trip per EMBED_MAX_BATCH_SIZE questions. Any other
+    model embeds one query at a time through the public API.
+    """
+    if isinstance(embed_model, GoogleGenAIEmbedding):
+        embeddings = []
+        for start in range(0, len(queries), EMBED_MAX_BATCH_SIZE):
+            embeddings.extend(embed_model._embed_texts(queries[start:start + EMBED_MAX_BATCH_SIZE], task_type="RETRIEVAL_QUERY"))
+        return embeddings
+    return [embed_model.get_query_embedding(query) for query in queries]
+
+class AdaptiveEmbedder:
+    """
+    Calls `embed_model.get_text_embedding_batch` with AIMD control over batch
+    size and concurrency:
+    - a 429 halves both and retries the batch after an exponential back-off;
+    - a batch slower than the target latency shrinks the batch size;
+    - a run of fast successful batches grows them back one step at a time.
+    The embed stage reads `batch_size` / `concurrency` before every submission.
+    """
+
+    def __init__(self, embed_model, batch_size=None, concurrency=None,
+                 max_batch_size=None, max_concurrency=None, target_latency=None):
+        self.embed_model = embed_model
+        self.max_batch_size = max_batch_size or EMBED_MAX_BATCH_SIZE
+        self.max_concurrency = max_concurrency or EMBED_MAX_CONCURRENCY
+        self.min_batch_size = min(EMBED_MIN_BATCH_SIZE, self.max_batch_size)
+        self.batch_size = min(batch_size or self.max_batch_size, self.max_batch_size)
+        self.concurrency = min(concurrency or EMBED_CONCURRENCY, self.max_concurrency)
+        self.target_latency = target_latency or EMBED_TARGET_LATENCY
+
+        self.calls = 0
+        self.texts = 0
+        self.rate_limited = 0
+        self.busy_seconds = 0.0
+        self._fast_streak = 0
+        self._lock = threading.Lock()
+
+    def _on_success(self, latency):
+        with self._lock:
+            if latency > self.target_latency:
+                self._fast_streak = 0
+                self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+                return
+            self._fast_streak += 1
+            # Additive increase, one knob at a time, after a full round of fast batches
+            if self._fast_streak >= max(self.concurrency, 2):
+                self._fast_streak = 0
+                if self.batch_size < self.max_batch_size:
+                    self.batch_size = min(self.max_batch_size, self.batch_size + self.min_batch_size)
+                elif self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+
+    def _on_rate_limit(self):
+        with self._lock:
+            self.rate_limited += 1
+            self._fast_streak = 0
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            self.concurrency = max(1, self.concurrency // 2)
+
+    def embed(self, texts):
+        """Embeds one batch, retrying rate-limit errors with exponential back-off."""
+        for attempt in range(EMBED_MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                embeddings = self.embed_model.get_text_embedding_batch(texts)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == EMBED_MAX_RETRIES:
+                    raise
+                self._on_rate_limit()
+                wait = min(60.0, 2 ** attempt) + random.uniform(0, 1)
+                print(
+                    f"⏳ Embedding rate limited, retrying in {wait:.1f}s "
+                    f"(batch size {self.batch_size}, concurrency {self.concurrency})",
+                    flush=True
+                )
+                time.sleep(wait)
+                continue
+            latency = time.perf_counter() - start
+            with self._lock:
+                self.calls += 1
+                self.texts += len(texts)
+                self.busy_seconds += latency
+            self._on_success(latency)
+            return embeddings
+
+    def report(self, elapsed):
+        """Returns a one-line throughput summary for ingestion logs."""
+        rate = self.texts / elapsed if elapsed > 0 else 0.0
+        return (
+            f"⚡ Embedded {self.texts} texts in {self.calls} calls: {rate:.1f} embeddings/sec, "
+            f"{self.rate_limited} rate-limited retries, final batch size {self.batch_size}, "
+            f"concurrency {self.concurrency}"
+        )
@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Budgets for loaded query engines held by the API process
+ENGINE_CACHE_MAX_ENTRIES = int(os.getenv("ENGINE_CACHE_MAX_ENTRIES", 8))
+ENGINE_CACHE_MAX_MB = float(os.getenv("ENGINE_CACHE_MAX_MB", 1024))
+# Most-chatted repos loaded in the background at API startup (0 disables)
+ENGINE_CACHE_PRELOAD = int(os.getenv("ENGINE_CACHE_PRELOAD", 0))
+
+# In-memory Python dicts are several times larger than their JSON on disk
+JSON_EXPANSION = 4
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def estimate_engine_bytes(repo_id, storage_dir, docstore=None, vector_store=None):
+    """
+    Approximate resident size of a repo's query engine: the parsed repo map and
+    graph held by its context budgeter, the BM25 index, the docstore's node
+    cache at capacity and, for quantized repos, the int8 codes.
+    """
+    size = (_file_size(f"./maps/{repo_id}.txt") + _file_size(f"./graphs/{repo_id}.json")) * JSON_EXPANSION
+    size += _file_size(os.path.join(storage_dir, "bm25.json")) * JSON_EXPANSION
+    if docstore is not None and hasattr(docstore, "cache_size"):
+        node_count = len(docstore)
+        if node_count:
+            docstore_bytes = _file_size(os.path.join(storage_dir, "docstore.sqlite3"))
+            size += docstore_bytes * min(1.0, docstore.cache_size / node_count) * JSON_EXPANSION
+    if vector_store is not None and hasattr(vector_store, "memory_bytes"):
+        size += vector_store.memory_bytes()
+    return int(size)
+
+class EngineCache:
+    """
+    LRU cache of per-repo query engines bounded by entry count and by the sum
+    of each entry's estimated size. Least recently used engines are evicted
+    first; the newest entry is always kept, even if it alone exceeds the budget.
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries=ENGINE_CACHE_MAX_ENTRIES, max_bytes=ENGINE_CACHE_MAX_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # repo_id -> (engine, size_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, repo_id):
+        with self._lock:
+            return repo_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, repo_id, default=None):
+        with self._lock:
+            entry = self._entries.get(repo_id)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(repo_id)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, repo_id, default=None):
+        """Like get, without touching recency or hit counters."""
+        with self._lock:
+            entry = self._entries.get(repo_id)
+            return entry[0] if entry is not None else default
+
+    def put(self, repo_id, engine, size_bytes=0):
+        with self._lock:
+            self._entries.pop(repo_id, None)
+            self._entries[repo_id] = (engine, size_bytes)
+            total = sum(size for _, size in self._entries.values())
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+                evicted_id, (_, evicted_size) = self._entries.popitem(last=False)
+                total -= evicted_size
+                self.evictions += 1
+                print(f"♻️ Evicted query engine for {evicted_id} ({evicted_size / 1024 / 1024:.1f} MB).")
+
+    def pop(self, repo_id, default=None):
+        with self._lock:
+            entry = self._entries.pop(repo_id, None)
+            return entry[0] if entry is not None else default
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_mb": round(sum(size for _, size in self._entries.values()) / 1024 / 1024, 2),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "repos": {
+                    repo_id: round(size / 1024 / 1024, 2) for repo_id, (_, size) in reversed(self._entries.items())
+                },
+            }
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_HOST = "api.github.com"
+
+def create_http_session(pool_size):
+    """
+    Returns a requests Session with a keep-alive connection pool sized for
+    `pool_size` concurrent requests, retrying transient server errors.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response when a 304 is answered from the ETag cache."""
+
+    def __init__(self, url, body, headers):
+        self.url = url
+        self.status_code = 200
+        self.text = body
+        self.headers = headers
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.text)
+
+class GithubClient:
+    """
+    Shared GitHub client for every API caller in the process.
+    - One pooled keep-alive session.
+    - Conditional requests: responses are cached on disk with their ETag and
+      revalidated with If-None-Match, so an unchanged resource costs a 304,
+      which does not count against the rate limit. The disk cache is capped
+      by size and the in-memory copy by entry count; least recently used
+      responses are evicted first.
+    - Rate-limit aware: tracks X-RateLimit-* headers and paces or pauses
+      requests against the remaining budget instead of failing mid-ingest.
+    """
+
+    def __init__(self, token=None, cache_dir=None, pool_size=None):
+        self.token = token or os.getenv("GITHUB_TOKEN")
+        self.cache_dir = cache_dir or os.getenv("GITHUB_CACHE_DIR", "./github_cache")
+        self.cache_max_bytes = int(os.getenv("GITHUB_CACHE_MAX_MB", 256)) * 1024 * 1024
+        # Parsed responses kept in memory (tree and compare bodies can be megabytes each)
+        self.memory_entries = int(os.getenv("GITHUB_CACHE_MEMORY_ENTRIES", 64))
+        self.session = create_http_session(pool_size or int(os.getenv("FETCH_CONCURRENCY", 16)))
+        # Requests kept in reserve; below this we wait for the window to reset
+        self.reserve = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", 50))
+        # Below this many remaining requests, spread them evenly until reset
+        self.pace_below = int(os.getenv("GITHUB_RATE_LIMIT_PACE_BELOW", 500))
+        # Longest we are willing to sleep for a reset before giving up
+        self.max_wait = int(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", 900))
+
+        self.remaining = None
+        self.limit = None
+        self.reset_at = None
+        self.conditional_hits = 0
+        self._lock = threading.Lock()
+        self._memory_cache = OrderedDict()  # url -> entry, LRU
+        self._disk_index = None  # cache file name -> [size, last_access], built lazily from disk
+        self._disk_bytes = 0
+
+    @property
+    def headers(self):
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    # --- ETag cache ---
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _remember(self, url, entry):
+        with self._lock:
+            self._memory_cache[url] = entry
+            self._memory_cache.move_to_end(url)
+            while len(self._memory_cache) > self.memory_entries:
+                self._memory_cache.popitem(last=False)
+
+    def _load_disk_index(self):
+        """Scans the cache directory once to rebuild sizes and access times; callers hold the lock."""
+        if self._disk_index is not None:
+            return
+        self._disk_index = {}
+        self._disk_bytes = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            self._disk_index[name] = [st.st_size, st.st_mtime]
+            self._disk_bytes += st.st_size
+
+    def _evict_disk(self):
+        """Removes least-recently-used responses until the disk cache fits its cap; callers hold the lock."""
+        if self._disk_bytes <= self.cache_max_bytes:
+            return
+        for name, (size, _) in sorted(self._disk_index.items(), key=lambda kv: kv[1][1]):
+            if self._disk_bytes <= self.cache_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            del self._disk_index[name]
+            self._disk_bytes -= size
+
+    def _load_cached(self, url):
+        with self._lock:
+            entry = self._memory_cache.get(url)
+            if entry is not None:
+                self._memory_cache.move_to_end(url)
+                return entry
+        path = self._cache_path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Touch the file so LRU order survives process restarts
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        with self._lock:
+            self._load_disk_index()
+            name = os.path.basename(path)
+            if name in self._disk_index:
+                self._disk_index[name][1] = time.time()
+        self._remember(url, entry)
+        return entry
+
+    def _store_cached(self, url, resp):
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        entry = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "body": resp.text,
+            "content_type": resp.headers.get("Content-Type", "application/json"),
+        }
+        self._remember(url, entry)
+        path = self._cache_path(url)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"⚠️ GithubClient: failed to cache {url}: {e}")
+            return
+        with self._lock:
+            self._load_disk_index()
+            name = os.path.basename(path)
+            previous = self._disk_index.get(name)
+            if previous:
+                self._disk_bytes -= previous[0]
+            self._disk_index[name] = [size, time.time()]
+            self._disk_bytes += size
+            self._evict_disk()
+
+    # --- Rate limit budget ---
+    def _update_rate_limit(self, resp):
+        remaining = resp.headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        with self._lock:
+            self.remaining = int(remaining)
+            self.limit = int(resp.headers.get("X-RateLimit-Limit", self.limit or 0))
+            self.reset_at = int(resp.headers.get("X-RateLimit-Reset", self.reset_at or 0))
+
+    def _wait_for_budget(self, conditional):
+        """Sleeps as needed so the request fits the remaining rate budget."""
+        with self._lock:
+            remaining, reset_at = self.remaining, self.reset_at
+        if remaining is None or reset_at is None:
+            return
+        window = max(0.0, reset_at - time.time())
+        if window == 0:
+            return
+
+        # Revalidations usually come back 304 (free), so only block them when fully exhausted
+        floor = 0 if conditional else self.reserve
+        if remaining <= floor:
+            wait = window + 1
+            if wait > self.max_wait:
+                print(f"⚠️ GithubClient: rate budget exhausted, reset in {wait:.0f}s (over max wait). Sending anyway.")
+                return
+            print(f"⏳ GithubClient: {remaining} requests left, waiting {wait:.0f}s for rate limit reset...")
+            time.sleep(wait)
+        elif not conditional and remaining < self.pace_below:
+            # Spread what is left over the rest of the window
+            time.sleep(min(window / max(remaining - floor, 1), self.max_wait))
+
+    def _retry_after(self, resp):
+        """Seconds to wait before retrying a rate-limited response, or None if not rate limited."""
+        if resp.status_code not in (403, 429):
+            return None
+        if resp.headers.get("Retry-After"):
+            return int(resp.headers["Retry-After"])
+        if resp.headers.get("X-RateLimit-Remaining") == "0":
+            return max(0, int(resp.headers.get("X-RateLimit-Reset", time.time())) - time.time()) + 1
+        return None
+
+    # --- Requests ---
+    def request(self, method, url, headers=None, **kwargs):
+        """Sends a request through the shared session with rate-limit accounting (no caching)."""
+        merged = dict(self.headers)
+        merged.update(headers or {})
+        is_api = API_HOST in url
+        timeout = kwargs.pop("timeout", 60)
+        for attempt in range(2):
+            if is_api:
+                self._wait_for_budget(conditional="If-None-Match" in merged or "If-Modified-Since" in merged)
+            resp = self.session.request(method, url, headers=merged, timeout=timeout, **kwargs)
+            if is_api:
+                self._update_rate_limit(resp)
+            wait = self._retry_after(resp)
+            if wait is None or attempt == 1 or wait > self.max_wait:
+                return resp
+            print(f"⏳ GithubClient: rate limited on {url}, retrying in {wait:.0f}s...")
+            resp.close()
+            time.sleep(wait)
+        return resp
+
+    def get(self, url, cache=True, **kwargs):
+        """
+        GET with conditional revalidation. Returns a requests.Response, or a
+        CachedResponse (status 200) when GitHub answers 304 Not Modified.
+        """
+        if not cache or kwargs.get("stream"):
+            return self.request("GET", url, **kwargs)
+
+        cached = self._load_cached(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            elif cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = self.request("GET", url, headers=headers, **kwargs)
+        if resp.status_code == 304 and cached:
+            with self._lock:
+                self.conditional_hits += 1
+            return CachedResponse(url, cached["body"], {"Content-Type": cached.get("content_type")})
+        if resp.status_code == 200:
+            self._store_cached(url, resp)
+        return resp
+
+    def rate_limit_status(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+                "conditional_hits": self.conditional_hits,
+            }
+
+# Singleton instance
+github_client = GithubClient()
@@ -1,7 +1,7 @@
 
 import os
-import requests
 from dotenv import load_dotenv
+from github_client import github_client
 
 load_dotenv()
 
@@ -12,14 +12,9 @@ class GithubService:
             # We allow init without token, but methods might fail or be rate limited if logic not careful.
             # Ideally we warn.
             print("⚠️ GithubService: GITHUB_TOKEN not found in env.")
-        
-        self.headers = {
-            "Authorization": f"Bearer {self.token}" if self.token else "",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        # Remove empty auth if no token (for public repos, though rate limit is low)
-        if not self.token:
-            del self.headers["Authorization"]
+            
+        # Shared client: conditional (ETag) requests and rate-limit budgeting
+        self.client = github_client
 
     def get_branches(self, owner, repo):
         """
@@ -29,7 +24,7 @@ class GithubService:
         print(f"🔍 Fetching branches for {owner}/{repo}...")
         
         try:
-            resp = requests.get(url, headers=self.headers)
+            resp = self.client.get(url)
             if resp.status_code == 200:
                 data = resp.json()
                 return [b["name"] for b in data]
@@ -50,7 +45,7 @@ class GithubService:
         try:
             # We can use the commits endpoint or get the branch info again.
             # Commits endpoint is good.
-            resp = requests.get(url, headers=self.headers)
+            resp = self.client.get(url)
             if resp.status_code == 200:
                 data = resp.json()
                 return data.get("sha")
@@ -69,7 +64,7 @@ class GithubService:
         print(f"🔍 Comparing {base_sha[:7]}...{head_sha[:7]} for {owner}/{repo}...")
         
         try:
-            resp = requests.get(url, headers=self.headers)
+            resp = self.client.get(url)
             if resp.status_code == 200:
                 data = resp.json()
                 files = []
@@ -110,3 +105,38 @@ class GithubService:
         except Exception as e:
             print(f"❌ GithubService Compare Error: {e}")
             return {"status": "error", "error": str(e)}
+
+    def get_changed_files(self, owner, repo, base_sha, head_sha):
+        """
+        Returns every file touched between two commits, unfiltered, for incremental
+        re-ingestion: [{"filename", "status", "sha", "previous_filename"}].
+        Returns None if the comparison failed or was truncated by the API (300 file cap),
+        in which case callers should fall back to a full ingest.
+        """
+        url = f"https://api.github.com/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}"
+        print(f"🔍 Listing changed files {base_sha[:7]}...{head_sha[:7]} for {owner}/{repo}...")
+        
+        try:
+            resp = self.client.get(url)
+            if resp.status_code != 200:
+                print(f"❌ Compare failed: {resp.status_code} - {resp.text}")
+                return None
+                
+            data = resp.json()
+            files = data.get("files", [])
+            if len(files) >= 300:
+                print("⚠️ Compare result truncated by GitHub (300+ files).")
+                return None
+                
+            return [
+                {
+                    "filename": f.get("filename", ""),
+                    "status": f.get("status"),  # added, modified, removed, renamed, copied, changed
+                    "sha": f.get("sha"),
+                    "previous_filename": f.get("previous_filename")
+                }
+                for f in files
+            ]
+        except Exception as e:
+            print(f"❌ GithubService Compare Error: {e}")
+            return None
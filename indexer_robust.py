@@ -5,8 +5,14 @@ import requests
 import asyncio
 import re
 import json
+import time
+import tarfile
 import traceback
-import chromadb
+import shutil
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from dotenv import load_dotenv
 
 from llama_index.core import (
@@ -15,12 +21,33 @@ from llama_index.core import (
     Settings,
     Document
 )
-from llama_index.core.node_parser import HierarchicalNodeParser, get_leaf_nodes
+from llama_index.core.node_parser import get_leaf_nodes
 from llama_index.llms.google_genai import GoogleGenAI
 from llama_index.embeddings.google_genai import GoogleGenAIEmbedding
 from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core.retrievers import AutoMergingRetriever
 from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import QueryBundle
+
+# Content-addressed cache of downloaded blobs (keyed by git blob SHA)
+from blob_cache import blob_cache
+
+from github_service import GithubService
+from github_client import github_client
+from ingestion_pipeline import StreamingIngestionPipeline
+from embedding_cache import embedding_cache
+from local_source import iter_local_directory, iter_local_git
+from pruning import FilePruner
+from code_chunker import create_node_parser
+from dedup import ChunkDeduplicator, DEDUP_SCOPE
+from lexical_index import BM25Index, HybridRetriever, leaf_nodes_for_files
+from quantized_store import QuantizedVectorStore
+from shared_store import SharedChunkVectorStore, SHARED_COLLECTION_NAME
+from chroma_client import chroma_registry
+from lazy_docstore import SQLiteDocumentStore, BatchedAutoMergingRetriever, DOCSTORE_FILENAME
+from repo_map import (
+    extract_signatures, extract_shard, format_section, section_key, map_section_cache,
+    assemble_repo_map, split_repo_map, ALLOWED_EXTS
+)
 
 # Import SwarmService for local LLM analysis
 from swarm_service import swarm_service
@@ -33,24 +60,101 @@ load_dotenv()
 Settings.llm = GoogleGenAI(model=os.getenv("LLM_MODEL", "models/gemini-1.5-pro"))
 Settings.embed_model = GoogleGenAIEmbedding(model=os.getenv("EMBEDDING_MODEL", "models/embedding-001"))
 
-def fetch_github_files_manual(owner, repo, branch="main"):
-    """
-    Manually fetches files using the GitHub API to avoid library bugs.
-    """
+# Download tuning: number of files fetched in parallel over one keep-alive pool
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 16))
+
+# File selection shared by every ingestion source (ALLOWED_EXTS lives in repo_map)
+EXCLUDED_FILES = {"package-lock.json", "yarn.lock", "pnpm-lock.yaml", "composer.lock", "Cargo.lock"}
+
+# Vector storage for new ingests: 'none' (Chroma, float32) or 'int8' (quantized, re-scored);
+# DEDUP_SCOPE=global overrides both with the shared content-hash collection
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+
+# Module reports generated in parallel by generate_architecture_json
+ARCHITECTURE_CONCURRENCY = int(os.getenv("ARCHITECTURE_CONCURRENCY", 4))
+
+# Ingestion sources: 'api' downloads file by file, 'archive' streams one tarball,
+# 'local' reads a local directory, 'git' reads a ref of a local (bare) git repo
+INGEST_SOURCE = os.getenv("INGEST_SOURCE", "api")
+
+def is_relevant_file(path):
+    """Returns True if a repository path passes the extension and exclusion filters."""
+    return path.endswith(ALLOWED_EXTS) and path.split("/")[-1] not in EXCLUDED_FILES
+
+def get_github_headers():
+    """Returns authenticated GitHub API headers, failing fast without a token."""
     token = os.getenv("GITHUB_TOKEN")
     if not token:
         print("❌ ERROR: GITHUB_TOKEN is missing.")
         raise ValueError("GITHUB_TOKEN is missing")
         
-    headers = {
+    return {
         "Authorization": f"Bearer {token}",
         "Accept": "application/vnd.github.v3+json"
     }
+
+def _download_file(session, url, headers):
+    """Downloads a single file. Returns (status_code, raw_bytes, latency_seconds)."""
+    start = time.perf_counter()
+    resp = session.get(url, headers=headers, timeout=60)
+    return resp.status_code, resp.content, time.perf_counter() - start
+
+def _make_document(path, text, url):
+    """Builds the LlamaIndex Document every ingestion source produces."""
+    return Document(
+        text=text,
+        metadata={
+            "file_path": path,
+            "file_name": path.split("/")[-1],
+            "url": url
+        },
+        # The URL carries owner/repo/branch; keeping it out of the embedded text lets the
+        # embedding cache serve identical files across repos and branches
+        excluded_embed_metadata_keys=["url"]
+    )
+
+def _print_download_stats(latencies, total_bytes, elapsed):
+    """Prints throughput and latency percentiles for a download run."""
+    if not latencies:
+        return
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    elapsed = max(elapsed, 1e-6)
+    print(
+        f"📊 Downloaded {len(latencies)} files ({total_bytes / 1024 / 1024:.2f} MB) in {elapsed:.2f}s "
+        f"-> {len(latencies) / elapsed:.1f} files/s, {total_bytes / 1024 / 1024 / elapsed:.2f} MB/s "
+        f"(latency p50 {p50 * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms, max {ordered[-1] * 1000:.0f}ms)"
+    )
+
+def fetch_raw_file(owner, repo, ref, path, headers, sha=None):
+    """Returns the text of a single repository file (blob cache first), or None."""
+    data = blob_cache.get(sha)
+    if data is None:
+        url = f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{path}"
+        status_code, data, _ = _download_file(github_client.session, url, headers)
+        if status_code != 200:
+            return None
+        blob_cache.put(sha, data)
+    return data.decode("utf-8", errors="replace")
+
+def fetch_github_files_manual(owner, repo, branch="main", pruner=None):
+    """
+    Manually fetches files using the GitHub API to avoid library bugs.
+    """
+    return list(iter_github_files_manual(owner, repo, branch, pruner))
+
+def iter_github_files_manual(owner, repo, branch="main", pruner=None):
+    """
+    Streaming variant of fetch_github_files_manual: yields Documents as they are downloaded.
+    With a FilePruner, oversized/generated files are skipped before download using the tree `size`.
+    """
+    headers = get_github_headers()
     
     # 1. Get Repo Info (to find default branch if needed)
     repo_url = f"https://api.github.com/repos/{owner}/{repo}"
     print(f"🚀 Connecting to {owner}/{repo}...")
-    repo_resp = requests.get(repo_url, headers=headers)
+    repo_resp = github_client.get(repo_url)
     
     default_branch = "main"
     if repo_resp.status_code == 200:
@@ -61,267 +165,900 @@ def fetch_github_files_manual(owner, repo, branch="main"):
     tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{target_branch}?recursive=1"
     
     print(f"🔍 Fetching tree for branch: {target_branch}...")
-    resp = requests.get(tree_url, headers=headers)
+    resp = github_client.get(tree_url)
     
     if resp.status_code == 404 and target_branch != default_branch:
         print(f"⚠️ Branch '{target_branch}' not found. Falling back to default: '{default_branch}'")
         target_branch = default_branch
         tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{target_branch}?recursive=1"
-        resp = requests.get(tree_url, headers=headers)
+        resp = github_client.get(tree_url)
 
     if resp.status_code != 200:
         print(f"❌ Error fetching tree: {resp.status_code} - {resp.text}")
-        return []
+        return
         
     tree_data = resp.json()
     
     # 2. Filter Files
-    allowed_exts = (".py", ".js", ".jsx", ".ts", ".tsx", ".md", ".json", ".css", ".html", ".txt")
-    excluded_files = {"package-lock.json", "yarn.lock", "pnpm-lock.yaml", "composer.lock", "Cargo.lock"}
-    
     target_files = [
         item for item in tree_data.get("tree", []) 
         if item["type"] == "blob" 
-        and item["path"].endswith(allowed_exts)
-        and item["path"].split("/")[-1] not in excluded_files
+        and is_relevant_file(item["path"])
     ]
     
-    print(f"🔍 Found {len(target_files)} relevant files. Downloading...")
+    if pruner is not None:
+        gitattributes = next((item for item in tree_data.get("tree", []) if item["path"] == ".gitattributes"), None)
+        if gitattributes:
+            text = fetch_raw_file(owner, repo, target_branch, ".gitattributes", headers, gitattributes.get("sha"))
+            if text:
+                pruner.load_gitattributes(text)
+        target_files = [item for item in target_files if pruner.check_entry(item["path"], item.get("size")) is None]
     
-    documents = []
+    print(f"🔍 Found {len(target_files)} relevant files. Downloading with {FETCH_CONCURRENCY} workers...")
     
     # 3. Download Content
-    for file_info in target_files:
-        # Use the 'raw' URL for cleaner text
-        raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{target_branch}/{file_info['path']}"
+    yield from iter_download_github_files(owner, repo, target_branch, target_files, headers)
+
+def download_github_files(owner, repo, ref, target_files, headers):
+    """
+    Downloads tree entries ({"path", "sha"}) at `ref` with bounded concurrency over
+    a shared keep-alive pool, serving unchanged blobs from the blob cache.
+    Returns Documents in the same order as `target_files`.
+    """
+    return list(iter_download_github_files(owner, repo, ref, target_files, headers))
+
+def iter_download_github_files(owner, repo, ref, target_files, headers):
+    """
+    Generator behind download_github_files. At most 2 x FETCH_CONCURRENCY files are
+    in flight or waiting to be consumed, so a slow consumer throttles downloads.
+    """
+    latencies = []
+    total_bytes = 0
+    blob_cache.reset_stats()
+    # Shared keep-alive pool (raw.githubusercontent.com is not metered by the API rate limit)
+    session = github_client.session
+    start_time = time.perf_counter()
+    
+    def resolve(entry):
+        nonlocal total_bytes
+        future, file_info, raw_url, cached = entry
+        if cached is not None:
+            return _make_document(file_info['path'], cached.decode("utf-8", errors="replace"), raw_url)
         try:
-            file_resp = requests.get(raw_url, headers=headers)
-            if file_resp.status_code == 200:
-                text_content = file_resp.text
+            status_code, content, latency = future.result()
+            if status_code == 200:
+                latencies.append(latency)
+                total_bytes += len(content)
+                print(f"   ⬇️ {file_info['path']} ({latency * 1000:.0f}ms)")
+                blob_cache.put(file_info.get("sha"), content)
                 
                 # Create a LlamaIndex Document
-                doc = Document(
-                    text=text_content,
-                    metadata={
-                        "file_path": file_info['path'],
-                        "file_name": file_info['path'].split("/")[-1],
-                        "url": raw_url
-                    }
-                )
-                documents.append(doc)
-            else:
-                print(f"   ❌ Failed: {file_info['path']}")
+                return _make_document(file_info['path'], content.decode("utf-8", errors="replace"), raw_url)
+            print(f"   ❌ Failed: {file_info['path']}")
         except Exception as e:
             print(f"   ⚠️ Error processing {file_info['path']}: {e}")
+        return None
+    
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        # Sliding window keeps tree order so downstream output is deterministic
+        window = deque()
+        for file_info in target_files:
+            # Use the 'raw' URL for cleaner text
+            raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{file_info['path']}"
             
-    return documents
+            # Unchanged blobs are served from the content-addressed cache
+            cached = blob_cache.get(file_info.get("sha"))
+            if cached is not None:
+                window.append((None, file_info, raw_url, cached))
+            else:
+                window.append((executor.submit(_download_file, session, raw_url, headers), file_info, raw_url, None))
+                
+            while len(window) > FETCH_CONCURRENCY * 2:
+                doc = resolve(window.popleft())
+                if doc is not None:
+                    yield doc
+                    
+        while window:
+            doc = resolve(window.popleft())
+            if doc is not None:
+                yield doc
+        
+    _print_download_stats(latencies, total_bytes, time.perf_counter() - start_time)
+    print(blob_cache.report())
+
+def fetch_github_files_archive(owner, repo, branch="main", pruner=None):
+    """
+    Fetches the whole repository as a single tarball and stream-decompresses it,
+    applying the same filters as fetch_github_files_manual. One request instead of
+    one per file, and only a single call against the API rate limit.
+    """
+    return list(iter_github_files_archive(owner, repo, branch, pruner))
+
+def iter_github_files_archive(owner, repo, branch="main", pruner=None):
+    """
+    Streaming variant of fetch_github_files_archive: yields Documents as they are extracted.
+    """
+    headers = get_github_headers()
+    
+    target_branch = branch
+    archive_url = f"https://api.github.com/repos/{owner}/{repo}/tarball/{target_branch}"
+    print(f"📦 Streaming archive for {owner}/{repo}@{target_branch}...")
+    resp = github_client.request("GET", archive_url, headers=headers, stream=True, timeout=300)
+    
+    if resp.status_code == 404:
+        # Resolve default branch only when needed (costs one extra API call)
+        repo_resp = github_client.get(f"https://api.github.com/repos/{owner}/{repo}")
+        default_branch = repo_resp.json().get("default_branch", "main") if repo_resp.status_code == 200 else "main"
+        if default_branch != target_branch:
+            print(f"⚠️ Branch '{target_branch}' not found. Falling back to default: '{default_branch}'")
+            target_branch = default_branch
+            archive_url = f"https://api.github.com/repos/{owner}/{repo}/tarball/{target_branch}"
+            resp.close()
+            resp = github_client.request("GET", archive_url, headers=headers, stream=True, timeout=300)
+
+    if resp.status_code != 200:
+        print(f"❌ Error fetching archive: {resp.status_code} - {resp.text}")
+        return
+    
+    extracted = 0
+    total_bytes = 0
+    start_time = time.perf_counter()
+    
+    try:
+        # 'r|gz' reads the archive as a forward-only stream, never buffering it whole
+        with tarfile.open(fileobj=resp.raw, mode="r|gz") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                    
+                # Entries are prefixed with '{owner}-{repo}-{sha}/'
+                parts = member.name.split("/", 1)
+                if len(parts) < 2:
+                    continue
+                path = parts[1]
+                
+                # Root dotfiles come first in tree order, ahead of the files they describe
+                if path == ".gitattributes" and pruner is not None:
+                    pruner.load_gitattributes(archive.extractfile(member).read().decode("utf-8", errors="replace"))
+                    continue
+                if not is_relevant_file(path):
+                    continue
+                if pruner is not None and pruner.check_entry(path, member.size) is not None:
+                    continue
+                
+                try:
+                    data = archive.extractfile(member).read()
+                    total_bytes += len(data)
+                    # Seed the blob cache so later per-file ingests can skip these downloads
+                    blob_cache.put(blob_cache.git_blob_sha(data), data)
+                    doc = _make_document(
+                        path,
+                        data.decode("utf-8", errors="replace"),
+                        f"https://raw.githubusercontent.com/{owner}/{repo}/{target_branch}/{path}"
+                    )
+                except Exception as e:
+                    print(f"   ⚠️ Error processing {path}: {e}")
+                    continue
+                extracted += 1
+                yield doc
+    finally:
+        resp.close()
+        
+    elapsed = max(time.perf_counter() - start_time, 1e-6)
+    print(
+        f"📊 Extracted {extracted} relevant files ({total_bytes / 1024 / 1024:.2f} MB) "
+        f"from archive in {elapsed:.2f}s -> {total_bytes / 1024 / 1024 / elapsed:.2f} MB/s"
+    )
+
+def fetch_documents(owner, repo, branch="main", source=None, local_path=None, pruner=None):
+    """Fetches repository Documents using the selected ingestion source."""
+    return list(iter_documents(owner, repo, branch, source, local_path, pruner))
+
+def iter_documents(owner, repo, branch="main", source=None, local_path=None, pruner=None):
+    """
+    Returns a Document iterator for the selected ingestion source. With a
+    FilePruner, size/path checks run before download and content checks after.
+    """
+    source = source or INGEST_SOURCE
+    if source in ("local", "git"):
+        if not local_path:
+            raise ValueError(f"Source '{source}' requires a local path.")
+        # Same URL scheme as a GitHub ingest, so metadata (and embeddings) match
+        url_prefix = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}"
+        if source == "git":
+            docs = iter_local_git(local_path, branch, is_relevant_file, _make_document, url_prefix, pruner)
+        else:
+            docs = iter_local_directory(local_path, is_relevant_file, _make_document, url_prefix, pruner)
+    elif source == "archive":
+        docs = iter_github_files_archive(owner, repo, branch, pruner)
+    elif source == "api":
+        docs = iter_github_files_manual(owner, repo, branch, pruner)
+    else:
+        raise ValueError(f"Unknown ingestion source: {source}")
+    return pruner.filter_documents(docs) if pruner is not None else docs
 
 def get_repo_collection_name(repo_id):
     # Ensure safe collection name (alphanumeric, underscores)
     return f"kiwi_{repo_id.replace('-', '_')}"
 
+def get_repo_storage_dir(repo_id):
+    return f"./chroma_db/storage_{repo_id}"
+
+def get_quantized_store_path(repo_id):
+    return f"./chroma_db/quantized_{repo_id}.sqlite3"
+
+def get_shared_map_path(repo_id):
+    return f"./chroma_db/shared_{repo_id}.sqlite3"
+
+def _shared_view(map_path, repo_tag):
+    return SharedChunkVectorStore(chroma_registry.get_collection(SHARED_COLLECTION_NAME), map_path, repo_tag)
+
+def create_vector_store(repo_id, quantization=None, scope=None):
+    """
+    Vector store for a repo: its Chroma collection, an int8 QuantizedVectorStore,
+    or its view of the shared content-hash collection (DEDUP_SCOPE=global).
+    """
+    if (scope or DEDUP_SCOPE) == "global":
+        return _shared_view(get_shared_map_path(repo_id), repo_id)
+    if (quantization or VECTOR_QUANTIZATION) == "int8":
+        return chroma_registry.get_quantized_store(get_quantized_store_path(repo_id))
+    chroma_collection = chroma_registry.get_collection(get_repo_collection_name(repo_id))
+    return ChromaVectorStore(chroma_collection=chroma_collection)
+
+def open_vector_store(repo_id):
+    """Opens the vector store a repo was ingested into, whatever the current setting."""
+    if os.path.exists(get_shared_map_path(repo_id)):
+        return create_vector_store(repo_id, scope="global")
+    quantized = os.path.exists(get_quantized_store_path(repo_id))
+    return create_vector_store(repo_id, "int8" if quantized else "none", "repo")
+
+def _remove_quantized_file(path):
+    chroma_registry.close_quantized_store(path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def remove_quantized_store(repo_id):
+    _remove_quantized_file(get_quantized_store_path(repo_id))
+
+def _remove_shared_view(map_path, repo_tag):
+    """Drops a repo's membership in the shared collection and its node map."""
+    if not os.path.exists(map_path):
+        return
+    view = _shared_view(map_path, repo_tag)
+    view.clear()
+    view.close()
+    os.remove(map_path)
+
+def discard_staging_vector_store(repo_id):
+    """Drops any staged vectors of a repo (left by a failed or interrupted ingest)."""
+    chroma_registry.delete_collection(f"{get_repo_collection_name(repo_id)}_staging")
+    _remove_quantized_file(f"{get_quantized_store_path(repo_id)}.staging")
+    _remove_shared_view(f"{get_shared_map_path(repo_id)}.staging", f"{repo_id}:staging")
+
+def create_staging_vector_store(repo_id):
+    """
+    Empty vector store a full ingest writes into: a '_staging' Chroma collection,
+    a '.staging' quantized file or a ':staging' shared view, replacing the repo's
+    vectors only in promote_staging_vector_store, after ingestion succeeded.
+    """
+    discard_staging_vector_store(repo_id)
+    if DEDUP_SCOPE == "global":
+        return _shared_view(f"{get_shared_map_path(repo_id)}.staging", f"{repo_id}:staging")
+    if VECTOR_QUANTIZATION == "int8":
+        return chroma_registry.get_quantized_store(f"{get_quantized_store_path(repo_id)}.staging")
+    return ChromaVectorStore(chroma_collection=chroma_registry.get_collection(f"{get_repo_collection_name(repo_id)}_staging"))
+
+def promote_staging_vector_store(repo_id, staging_store):
+    """Drops the repo's previous vectors (Chroma, quantized and/or shared) and puts the staged ones in their place."""
+    collection_name = get_repo_collection_name(repo_id)
+    if chroma_registry.delete_collection(collection_name):
+        print(f"🗑️ Cleared previous collection: {collection_name}")
+    remove_quantized_store(repo_id)
+    _remove_shared_view(get_shared_map_path(repo_id), repo_id)
+    if isinstance(staging_store, QuantizedVectorStore):
+        path = get_quantized_store_path(repo_id)
+        # Closing checkpoints the WAL into the main file, so only that file moves
+        chroma_registry.close_quantized_store(f"{path}.staging")
+        os.replace(f"{path}.staging", path)
+    elif isinstance(staging_store, SharedChunkVectorStore):
+        staging_store.retag(repo_id)
+        staging_store.close()
+        os.replace(staging_store.map_path, get_shared_map_path(repo_id))
+    else:
+        chroma_registry.rename_collection(f"{collection_name}_staging", collection_name)
+
 # --- FEATURE A: REPO MAP GENERATOR ---
-def generate_repo_map(documents):
-    print("🗺️ Generating Repo Map using Regex analysis...")
-    map_lines = []
-    
-    # Tech Stack Extraction (package.json)
+# Signatures come from repo_map: ast for Python, a statement scanner for JS/TS, regex otherwise.
+# Processes extracting map sections of uncached files (1 extracts inline), and files per pool task
+REPO_MAP_WORKERS = int(os.getenv("REPO_MAP_WORKERS", min(4, os.cpu_count() or 1)))
+REPO_MAP_SHARD_SIZE = int(os.getenv("REPO_MAP_SHARD_SIZE", 32))
+# Spawned workers re-import the entry module (seconds), so the pool only starts after this many uncached files
+REPO_MAP_POOL_MIN_FILES = int(os.getenv("REPO_MAP_POOL_MIN_FILES", 500))
+
+def generate_tech_stack_lines(doc):
+    """Returns the TECH STACK header lines for a package.json Document (else [])."""
+    if doc.metadata.get("file_name") != "package.json":
+        return []
+        
     tech_stack_header = []
-    for doc in documents:
-        if doc.metadata.get("file_name") == "package.json":
-            try:
-                data = json.loads(doc.text)
-                tech_stack_header.append("--- TECH STACK ---")
-                
-                deps = data.get("dependencies", {})
-                if deps:
-                    tech_stack_header.append("Dependencies:")
-                    for pkg, ver in deps.items():
-                        tech_stack_header.append(f"  {pkg}: {ver}")
-                        
-                dev_deps = data.get("devDependencies", {})
-                if dev_deps:
-                    tech_stack_header.append("DevDependencies:")
-                    for pkg, ver in dev_deps.items():
-                        tech_stack_header.append(f"  {pkg}: {ver}")
+    try:
+        data = json.loads(doc.text)
+        tech_stack_header.append("--- TECH STACK ---")
+        
+        deps = data.get("dependencies", {})
+        if deps:
+            tech_stack_header.append("Dependencies:")
+            for pkg, ver in deps.items():
+                tech_stack_header.append(f"  {pkg}: {ver}")
                 
-                tech_stack_header.append("------------------")
-            except Exception as e:
-                print(f"⚠️ Failed to parse package.json: {e}")
-
-    # Patterns to capture signatures
-    patterns = [
-        r'^\s*(import\s+.+)',
-        r'^\s*(from\s+.+\s+import\s+.+)',
-        r'^\s*(class\s+\w+)',
-        r'^\s*(def\s+\w+)',
-        r'^\s*(async\s+def\s+\w+)',
-        r'^\s*(function\s+\w+)',
-        r'^\s*(export\s+.+)',
-        r'^\s*(interface\s+\w+)',
-    ]
-    combined_pattern = re.compile('|'.join(patterns), re.MULTILINE)
+        dev_deps = data.get("devDependencies", {})
+        if dev_deps:
+            tech_stack_header.append("DevDependencies:")
+            for pkg, ver in dev_deps.items():
+                tech_stack_header.append(f"  {pkg}: {ver}")
+        
+        tech_stack_header.append("------------------")
+    except Exception as e:
+        print(f"⚠️ Failed to parse package.json: {e}")
+        return []
+    return tech_stack_header
+
+def generate_repo_map_section(doc):
+    """Returns the repo map lines for a single Document."""
+    file_path = doc.metadata.get("file_path", "unknown")
+    signatures, _ = extract_signatures(file_path, doc.text)
+    return format_section(file_path, signatures)
 
+def generate_repo_map(documents):
+    print("🗺️ Generating Repo Map...")
+    builder = RepoMapBuilder()
     for doc in documents:
+        builder.add(doc)
+    return builder.build()
+
+class RepoMapBuilder:
+    """
+    Accumulates repo map sections one Document at a time, so the map can be built while streaming.
+    Sections of files whose blob was mapped before come from the section cache; the rest are
+    extracted in shards, on a process pool once enough of them are uncached, while documents keep
+    arriving. Call finish() (build() does) before reading `sections`.
+    """
+    
+    def __init__(self, workers=None, shard_size=None, cache=map_section_cache):
+        self.tech_stack_header = []
+        self.sections = {}  # file_path -> section lines (None until extracted)
+        self.workers = workers or REPO_MAP_WORKERS
+        self.shard_size = shard_size or REPO_MAP_SHARD_SIZE
+        self.cache = cache
+        self.counts = {"cached": 0, "python": 0, "script": 0, "regex": 0}
+        self._misses = 0
+        self._shard = []  # (file_path, text, cache key) awaiting extraction
+        self._futures = []
+        self._executor = None
+        self._started = None
+        
+    def add(self, doc):
+        if self._started is None:
+            self._started = time.time()
+        # Tech Stack Extraction (package.json)
+        self.tech_stack_header.extend(generate_tech_stack_lines(doc))
         file_path = doc.metadata.get("file_path", "unknown")
-        map_lines.append(f"\n📄 File: {file_path}")
-        
-        # Scan content
-        matches = combined_pattern.findall(doc.text)
-        if matches:
-            for match_tuple in matches:
-                # findall returns tuple of groups, filter empty
-                signature = next((m for m in match_tuple if m), "")
-                if signature:
-                    # Truncate if too long
-                    if len(signature) > 80:
-                        signature = signature[:77] + "..."
-                    map_lines.append(f"  └─ {signature.strip()}")
-        else:
-             map_lines.append("  (No signatures found)")
-             
-    # Prepend Tech Stack if found
-    if tech_stack_header:
-        final_map = "\n".join(tech_stack_header) + "\n" + "\n".join(map_lines)
-    else:
-        final_map = "\n".join(map_lines)
+        key = section_key(file_path, doc.text)
+        signatures = self.cache.get(key) if self.cache is not None else None
+        if signatures is not None:
+            self.sections[file_path] = format_section(file_path, signatures)
+            self.counts["cached"] += 1
+            return
+        # Placeholder keeps the map in document order
+        self.sections[file_path] = None
+        self._misses += 1
+        self._shard.append((file_path, doc.text, key))
+        if len(self._shard) >= self.shard_size:
+            self._flush()
+    
+    def _flush(self):
+        shard, self._shard = self._shard, []
+        if not shard:
+            return
+        items = [(file_path, text) for file_path, text, _ in shard]
+        if self.workers <= 1 or (self._executor is None and self._misses < REPO_MAP_POOL_MIN_FILES):
+            self._store(shard, extract_shard(items))
+            return
+        if self._executor is None:
+            # spawn, not fork: documents arrive on a fetch thread of a multi-threaded process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        self._futures.append((shard, self._executor.submit(extract_shard, items)))
+        
+    def _store(self, shard, results):
+        entries = []
+        for (file_path, _, key), (signatures, method) in zip(shard, results):
+            self.sections[file_path] = format_section(file_path, signatures)
+            self.counts[method] += 1
+            entries.append((key, signatures))
+        if self.cache is not None:
+            self.cache.put_many(entries)
+    
+    def finish(self):
+        """Extracts any pending sections and waits for the pool."""
+        if self._started is None:
+            return
+        # Small remainders are cheaper inline than a round trip to the pool
+        if self._shard and (self._executor is None or len(self._shard) < self.shard_size // 4):
+            shard, self._shard = self._shard, []
+            self._store(shard, extract_shard([(file_path, text) for file_path, text, _ in shard]))
+        self._flush()
+        try:
+            for shard, future in self._futures:
+                self._store(shard, future.result())
+        finally:
+            self._futures = []
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        pruned = self.cache.prune() if self.cache is not None else 0
+        parsed = sum(self.counts.values()) - self.counts["cached"]
+        print(
+            f"🗺️ Repo Map: {self.counts['cached']} sections cached, {parsed} extracted "
+            f"(python {self.counts['python']}, js/ts {self.counts['script']}, regex {self.counts['regex']}) "
+            f"in {time.time() - self._started:.2f}s; {pruned} stale cache entries pruned."
+        )
+        self._started = None
         
-    return final_map
+    def build(self):
+        self.finish()
+        return assemble_repo_map(self.tech_stack_header, list(self.sections.values()))
+
+def update_repo_map(map_text, changed_map, removed_paths):
+    """
+    Splices a saved repo map: drops sections of removed files and replaces the
+    sections of changed files with those collected in `changed_map` (a RepoMapBuilder).
+    The tech stack header is rebuilt from the changed package.json files when any of them changed.
+    """
+    changed_map.finish()
+    header, sections = split_repo_map(map_text)
+    for path in removed_paths:
+        sections.pop(path, None)
+    sections.update(changed_map.sections)
+    return assemble_repo_map(changed_map.tech_stack_header or header, list(sections.values()))
 
 # --- FEATURE B: SWARM ANALYSIS (via SwarmService) ---
 # Swarm analysis now uses local Ollama LLM via swarm_service.py
+SWARM_DISPATCH_BATCH = int(os.getenv("SWARM_DISPATCH_BATCH", 50))
+
+class SwarmDispatcher:
+    """
+    Dispatches swarm jobs in small batches while documents stream past, then
+    collects all replies at the end. Only the current batch is held in memory.
+    """
+    
+    def __init__(self, batch_size=SWARM_DISPATCH_BATCH):
+        self.batch_size = batch_size
+        self.batch = []
+        self.job_map = {}
+        self.enabled = True
+        # Private loop: add() runs on the pipeline's fetch thread
+        self.loop = asyncio.new_event_loop()
+        
+    def add(self, doc):
+        if not self.enabled:
+            return
+        self.batch.append(doc)
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+            
+    def _flush(self):
+        if not self.batch or not self.enabled:
+            self.batch = []
+            return
+        try:
+            job_map = self.loop.run_until_complete(swarm_service.dispatch_jobs(self.batch))
+        except Exception as e:
+            print(f"⚠️ Swarm dispatch failed: {e}")
+            job_map = None
+        self.batch = []
+        if job_map is None:
+            # Swarm unreachable: skip analysis for the rest of this run
+            self.enabled = False
+            return
+        self.job_map.update(job_map)
+        
+    def collect(self):
+        """Flushes the last batch and waits for every reply. Returns the dependency graph dict."""
+        try:
+            self._flush()
+            if not self.job_map:
+                return {}
+            return self.loop.run_until_complete(swarm_service.collect_results(self.job_map))
+        finally:
+            self.loop.close()
+
+def save_dependency_graph(repo_id, repo_graph):
+    os.makedirs("./graphs", exist_ok=True)
+    with open(f"./graphs/{repo_id}.json", "w", encoding="utf-8") as f:
+        json.dump(repo_graph, f, indent=2)
+    print(f"🕸️ Dependency Graph saved to ./graphs/{repo_id}.json")
 
 # --- MAIN INGESTION ---
-def ingest_repo(owner, repo, branch="main"):
+def ingest_repo(owner, repo, branch="main", source=None, local_path=None, parse_workers=None):
     repo_id = f"{owner}-{repo}-{branch}"
     collection_name = get_repo_collection_name(repo_id)
-    persist_dir = "./chroma_db"
     
     print(f"📥 Ingesting repo: {repo_id} into collection: {collection_name}")
     
-    # 1. Fetch
-    docs = fetch_github_files_manual(owner, repo, branch)
-    if not docs:
+    # 1. Fetch (lazily: documents are consumed by the pipeline as they arrive)
+    pruner = FilePruner()
+    docs = iter_documents(owner, repo, branch, source, local_path, pruner)
+    first_doc = next(docs, None)
+    if first_doc is None:
         raise Exception("No documents found or failed to fetch.")
+    docs = itertools.chain([first_doc], docs)
         
-    # --- DUAL-LAYER GENERATION ---
+    # 2. Vector Store (shared client from the registry); the repo's current vectors stay
+    # in place until ingestion succeeds, so a failed ingest leaves the previous index usable
+    print(f"📦 Creating staging vector store (quantization: {VECTOR_QUANTIZATION}, dedup scope: {DEDUP_SCOPE})...", flush=True)
+    vector_store = create_staging_vector_store(repo_id)
+    
+    # Nodes are written straight to a SQLite docstore in a staging dir, so memory does not
+    # grow with the repo; the staging dir replaces the repo's storage dir once ingestion succeeds.
+    repo_storage_dir = get_repo_storage_dir(repo_id)
+    staging_dir = f"{repo_storage_dir}.staging"
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(staging_dir)
+    docstore = SQLiteDocumentStore(os.path.join(staging_dir, DOCSTORE_FILENAME), cache_size=0)
+    
+    print("🛠️ Creating StorageContext...", flush=True)
+    storage_context = StorageContext.from_defaults(docstore=docstore, vector_store=vector_store)
+    
+    # 3. Stream fetch -> parse -> embed -> upsert
+    # --- DUAL-LAYER GENERATION --- happens on the way: the repo map is built and
+    # swarm jobs are dispatched as each document passes the fetch stage.
+    print(f"🧠 Parsing and indexing to {type(vector_store).__name__} ({collection_name})...")
+    repo_map = RepoMapBuilder()
+    swarm = SwarmDispatcher()
+    dedup = ChunkDeduplicator()
+    pipeline = StreamingIngestionPipeline(
+        create_node_parser(), vector_store, docstore,
+        on_document=[repo_map.add, swarm.add],
+        embedding_cache=embedding_cache,
+        deduplicator=dedup,
+        parse_workers=parse_workers,
+        node_parser_factory=create_node_parser
+    )
+    try:
+        pipeline.run(docs)
+    except Exception:
+        # The previous index is untouched; drop what was staged
+        docstore.close()
+        discard_staging_vector_store(repo_id)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    pruner.report(pipeline.embed_batch_size)
+    
+    # Lexical (BM25) index over the same leaves, for hybrid retrieval (read back in batches)
+    bm25 = BM25Index()
+    for nodes in docstore.iter_node_batches():
+        bm25.add_nodes(get_leaf_nodes(nodes))
+    print(f"🔤 BM25 index built over {len(bm25)} chunks.")
     
-    # 2A. Generate Repo Map
-    repo_map_content = generate_repo_map(docs)
+    # 4A. Save Repo Map
     os.makedirs("./maps", exist_ok=True)
     with open(f"./maps/{repo_id}.txt", "w", encoding="utf-8") as f:
-        f.write(repo_map_content)
+        f.write(repo_map.build())
     print(f"🗺️ Repo Map saved to ./maps/{repo_id}.txt")
     
-    # 2B. Run Swarm Analysis (using local Ollama LLM)
+    # 4B. Collect Swarm Analysis (using local Ollama LLM)
     try:
-        # Run async loop via SwarmService
-        repo_graph = asyncio.run(swarm_service.run_swarm_analysis(docs))
-        os.makedirs("./graphs", exist_ok=True)
-        with open(f"./graphs/{repo_id}.json", "w", encoding="utf-8") as f:
-            json.dump(repo_graph, f, indent=2)
-        print(f"🕸️ Dependency Graph saved to ./graphs/{repo_id}.json")
+        save_dependency_graph(repo_id, swarm.collect())
     except Exception as e:
         print(f"⚠️ Swarm Analysis failed: {e}")
         # Continue to indexing logic - robust fallback
         
-    # 3. Parse & Index
-    print("🧠 Parsing Code Structure for Vector Index...")
-    node_parser = HierarchicalNodeParser.from_defaults(chunk_sizes=[1024, 512, 128])
-    nodes = node_parser.get_nodes_from_documents(docs)
-    leaf_nodes = get_leaf_nodes(nodes)
-    print(f"🌿 Created {len(nodes)} total nodes ({len(leaf_nodes)} leaves).")
+    # 5. Index
+    index = VectorStoreIndex(nodes=[], storage_context=storage_context)
     
-    # 3. Vector Store
-    print("🔌 Connecting to ChromaDB PersistentClient...", flush=True)
-    db = chromadb.PersistentClient(path=persist_dir)
+    # Important: Persist! (the docstore is already on disk; the rest persists as JSON)
+    index.storage_context.persist(persist_dir=staging_dir)
+    dedup.save(staging_dir)
+    bm25.save(staging_dir)
+    docstore.close()
+    promote_staging_vector_store(repo_id, vector_store)
+    if os.path.exists(repo_storage_dir):
+        shutil.rmtree(repo_storage_dir)
+    os.replace(staging_dir, repo_storage_dir)
     
-    # --- RESET COLLECTION ---
-    try:
-        print(f"🗑️ Attempting to delete collection: {collection_name}", flush=True)
-        db.delete_collection(collection_name)
-        print(f"🗑️ Cleared existing collection: {collection_name}")
-    except ValueError:
-        print(f"ℹ️ Collection {collection_name} did not exist.", flush=True)
-    except Exception as e:
-        print(f"⚠️ Error deleting collection: {e}", flush=True)
+    print("✅ Ingestion Complete.")
+    return repo_id
 
-    print("📦 Creating/Getting collection...", flush=True)
-    chroma_collection = db.get_or_create_collection(collection_name)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+# --- INCREMENTAL UPDATE ---
+def delete_file_nodes(vector_store, docstore, file_paths):
+    """
+    Removes every vector and docstore node (leaves and hierarchical parents)
+    that belongs to the given files. Returns the number of docstore nodes removed.
+    """
+    file_paths = set(file_paths)
+    if not file_paths:
+        return 0
+        
+    if isinstance(vector_store, (QuantizedVectorStore, SharedChunkVectorStore)):
+        vector_store.delete_file_paths(file_paths)
+    else:
+        for path in file_paths:
+            vector_store.client.delete(where={"file_path": path})
+        
+    before = len(docstore)
     
-    print("🛠️ Creating StorageContext...", flush=True)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    print(f"📝 Adding {len(nodes)} nodes to docstore...", flush=True)
-    storage_context.docstore.add_documents(nodes)
-    print("✅ documents added to docstore.", flush=True)
+    # Ref docs first (drops their node lists), then sweep any untracked nodes
+    for ref_doc_id, info in list((docstore.get_all_ref_doc_info() or {}).items()):
+        if info.metadata.get("file_path") in file_paths:
+            docstore.delete_ref_doc(ref_doc_id, raise_error=False)
+            
+    for node_id in docstore.node_ids_for_files(file_paths):
+        docstore.delete_document(node_id, raise_error=False)
+    return before - len(docstore)
+
+def update_repo(owner, repo, branch, base_sha, head_sha=None, source=None, parse_workers=None):
+    """
+    Incrementally re-ingests a repo from `base_sha` to `head_sha`: only nodes of
+    removed/modified files are deleted and only added/modified files are fetched
+    and embedded. Falls back to a full ingest when there is no usable base.
+    Returns (repo_id, changed); changed is False when the repo was already at head.
+    """
+    repo_id = f"{owner}-{repo}-{branch}"
+    repo_storage_dir = get_repo_storage_dir(repo_id)
     
-    # 4. Index
-    print(f"💾 Indexing to ChromaDB ({collection_name})...")
-    index = VectorStoreIndex(leaf_nodes, storage_context=storage_context)
+    if not base_sha or base_sha == "unknown" or not os.path.exists(repo_storage_dir):
+        print("ℹ️ No previous index to update. Running full ingestion...")
+        return ingest_repo(owner, repo, branch, source, parse_workers=parse_workers), True
+        
+    gh = GithubService()
+    head_sha = head_sha or gh.get_current_sha(owner, repo, branch)
+    if not head_sha:
+        raise Exception(f"Could not resolve HEAD SHA for {owner}/{repo}/{branch}.")
+    if head_sha == base_sha:
+        print(f"✅ {repo_id} is already at {head_sha[:7]}. Nothing to update.")
+        return repo_id, False
+        
+    changes = gh.get_changed_files(owner, repo, base_sha, head_sha)
+    if changes is None:
+        print("⚠️ Could not determine changed files. Running full ingestion...")
+        return ingest_repo(owner, repo, branch, source, parse_workers=parse_workers), True
+        
+    # 1. Classify changes
+    removed_paths = set()
+    changed_files = {}
+    for change in changes:
+        if change["status"] == "renamed" and change.get("previous_filename"):
+            removed_paths.add(change["previous_filename"])
+        if change["status"] == "removed":
+            removed_paths.add(change["filename"])
+        elif is_relevant_file(change["filename"]):
+            changed_files[change["filename"]] = {"path": change["filename"], "sha": change.get("sha")}
+    removed_paths = {p for p in removed_paths if is_relevant_file(p)}
     
-    # Important: Persist!
-    repo_storage_dir = f"./chroma_db/storage_{repo_id}"
-    if os.path.exists(repo_storage_dir):
-        import shutil
-        shutil.rmtree(repo_storage_dir)
-    os.makedirs(repo_storage_dir, exist_ok=True)
+    print(
+        f"🔄 Incremental update {base_sha[:7]}...{head_sha[:7]}: "
+        f"{len(changed_files)} added/modified, {len(removed_paths)} removed."
+    )
     
-    index.storage_context.persist(persist_dir=repo_storage_dir)
+    # 2. Drop stale nodes
+    vector_store = open_vector_store(repo_id)
+    storage_context = StorageContext.from_defaults(
+        docstore=SQLiteDocumentStore.from_persist_dir(repo_storage_dir),
+        vector_store=vector_store, persist_dir=repo_storage_dir
+    )
     
-    print("✅ Ingestion Complete.")
-    return repo_id
+    stale_paths = removed_paths | set(changed_files)
+    stale_ids = storage_context.docstore.node_ids_for_files(stale_paths)
+    dedup = ChunkDeduplicator.load(repo_storage_dir)
+    promoted = dedup.forget(storage_context.docstore, stale_ids)
+    bm25 = BM25Index.load(repo_storage_dir)
+    bm25.remove_nodes(stale_ids)
+    deleted = delete_file_nodes(vector_store, storage_context.docstore, stale_paths)
+    print(f"🗑️ Removed {deleted} stale nodes.")
+    
+    # 3. Stream only the changed files through fetch -> parse -> embed -> upsert
+    changed_map = RepoMapBuilder()
+    swarm = SwarmDispatcher()
+    headers = get_github_headers()
+    pruner = FilePruner(fetch_raw_file(owner, repo, head_sha, ".gitattributes", headers))
+    changed_entries = [entry for entry in changed_files.values() if pruner.check_entry(entry["path"]) is None]
+    docs = pruner.filter_documents(
+        iter_download_github_files(owner, repo, head_sha, changed_entries, headers)
+    )
+    pipeline = StreamingIngestionPipeline(
+        create_node_parser(), vector_store, storage_context.docstore,
+        on_document=[changed_map.add, swarm.add],
+        embedding_cache=embedding_cache,
+        deduplicator=dedup,
+        parse_workers=parse_workers,
+        node_parser_factory=create_node_parser
+    )
+    pipeline.run(docs)
+    pruner.report(pipeline.embed_batch_size)
+    if promoted:
+        # Their canonical copy was deleted, so these duplicates now need their own vectors
+        print(f"🧬 Re-indexed {pipeline.index_nodes(promoted)} duplicate chunks whose canonical copy was removed.")
+    bm25.add_nodes(leaf_nodes_for_files(storage_context.docstore, set(changed_files)))
+    # Files that are now pruned lose their old map section instead of keeping a stale one
+    removed_paths |= {path for path, _, _ in pruner.skipped}
+    
+    # 4. Splice Repo Map (changed sections only)
+    map_path = f"./maps/{repo_id}.txt"
+    if os.path.exists(map_path):
+        with open(map_path, "r", encoding="utf-8") as f:
+            repo_map_content = update_repo_map(f.read(), changed_map, removed_paths)
+        with open(map_path, "w", encoding="utf-8") as f:
+            f.write(repo_map_content)
+        print(f"🗺️ Repo Map updated at {map_path}")
+        
+    # 5. Merge Dependency Graph (swarm runs on changed files only)
+    graph_path = f"./graphs/{repo_id}.json"
+    try:
+        repo_graph = {}
+        if os.path.exists(graph_path):
+            with open(graph_path, "r", encoding="utf-8") as f:
+                repo_graph = json.load(f)
+        for path in removed_paths | set(changed_files):
+            repo_graph.pop(path, None)
+        repo_graph.update(swarm.collect())
+        save_dependency_graph(repo_id, repo_graph)
+    except Exception as e:
+        print(f"⚠️ Swarm Analysis failed: {e}")
+        
+    storage_context.persist(persist_dir=repo_storage_dir)
+    dedup.save(repo_storage_dir)
+    bm25.save(repo_storage_dir)
+    print(f"✅ Incremental update complete ({repo_id} @ {head_sha[:7]}).")
+    return repo_id, True
 
 def load_index_for_repo(repo_id):
-    # Same as before
-    collection_name = get_repo_collection_name(repo_id)
-    repo_storage_dir = f"./chroma_db/storage_{repo_id}"
+    repo_storage_dir = get_repo_storage_dir(repo_id)
     
     if not os.path.exists(repo_storage_dir):
         raise ValueError(f"Storage for {repo_id} not found. Has it been ingested?")
         
     print(f"📂 Loading index for {repo_id}...")
     
-    # Load Chroma
-    db = chromadb.PersistentClient(path="./chroma_db")
-    chroma_collection = db.get_or_create_collection(collection_name)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    # Load Chroma (or the quantized store)
+    vector_store = open_vector_store(repo_id)
     
-    # Load Storage Context (Docstore)
+    # Load Storage Context (Docstore opened lazily from SQLite, nodes read on demand)
     storage_context = StorageContext.from_defaults(
+        docstore=SQLiteDocumentStore.from_persist_dir(repo_storage_dir),
         vector_store=vector_store, persist_dir=repo_storage_dir
     )
     
-    return VectorStoreIndex.from_vector_store(
-        vector_store, storage_context=storage_context
-    )
+    # Not from_vector_store(): it builds its own StorageContext and drops the loaded docstore
+    return VectorStoreIndex(nodes=[], storage_context=storage_context)
 
-def query_module(index, module_name):
+def create_retriever(index, repo_id, similarity_top_k=10):
+    """
+    AutoMergingRetriever over hybrid BM25 + vector retrieval when the repo has a
+    lexical index, else over plain vector retrieval (repos ingested before BM25).
+    """
+    base_retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+    bm25 = BM25Index.load(get_repo_storage_dir(repo_id))
+    if len(bm25):
+        base_retriever = HybridRetriever(
+            base_retriever, bm25, index.storage_context.docstore, similarity_top_k=similarity_top_k
+        )
+    return BatchedAutoMergingRetriever(base_retriever, index.storage_context, verbose=False)
+
+def module_prompt(module_name):
+    return f"Analyze the codebase specifically for '{module_name}'. Describe key files, logic flows, UI, and data interactions. Be technical."
+
+def query_module(index, module_name, retriever=None, nodes=None):
+    """
+    Writes the RAG report for one module. `nodes` are reused when the caller
+    already retrieved them; otherwise the retriever runs here.
+    """
     print(f"🕵️ Investigating '{module_name}'...", flush=True)
-    prompt = f"Analyze the codebase specifically for '{module_name}'. Describe key files, logic flows, UI, and data interactions. Be technical."
+    prompt = module_prompt(module_name)
     
     try:
-        base_retriever = index.as_retriever(similarity_top_k=10)
-        retriever = AutoMergingRetriever(
-            base_retriever, index.storage_context, verbose=False
+        retriever = retriever or BatchedAutoMergingRetriever(
+            index.as_retriever(similarity_top_k=10), index.storage_context, verbose=False
         )
         query_engine = RetrieverQueryEngine.from_args(retriever)
+        if nodes is not None:
+            return str(query_engine.synthesize(QueryBundle(prompt), nodes))
         return str(query_engine.query(prompt))
     except Exception as e:
         print(f"   ⚠️ AMR failed: {e}. Fallback...", flush=True)
         return str(index.as_query_engine(similarity_top_k=10).query(prompt))
 
-def generate_architecture_json(repo_id):
+def investigate_modules(index, retriever, modules, concurrency=ARCHITECTURE_CONCURRENCY, previous=None):
+    """
+    Runs query_module for every module on a bounded thread pool. Retrieval for
+    all modules goes first, so nodes shared between modules are read once into
+    the docstore cache; a failing module yields an error report without
+    holding up the rest. A module whose retrieved node ids equal those recorded
+    in `previous` ({module: {"report", "node_ids"}}) keeps its previous report
+    instead of being synthesized again. Returns {module: {"report", "node_ids"}}
+    in `modules` order; node_ids is None for reports that must not be reused.
+    """
+    previous = previous or {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        def retrieve(mod):
+            t0 = time.perf_counter()
+            try:
+                return retriever.retrieve(module_prompt(mod)), time.perf_counter() - t0
+            except Exception as e:
+                print(f"   ⚠️ Retrieval for '{mod}' failed: {e}. Retrying in query_module...", flush=True)
+                return None, time.perf_counter() - t0
+        retrieved = dict(zip(modules, pool.map(retrieve, modules)))
+        
+        node_ids = [r.node.node_id for nodes, _ in retrieved.values() if nodes for r in nodes]
+        if node_ids:
+            print(f"🔗 {len(node_ids) - len(set(node_ids))} of {len(node_ids)} retrieved nodes were shared between modules.")
+            
+        def report(mod):
+            t0 = time.perf_counter()
+            nodes = retrieved[mod][0]
+            ids = sorted({r.node.node_id for r in nodes}) if nodes is not None else None
+            cached = previous.get(mod) or {}
+            if ids is not None and cached.get("node_ids") == ids:
+                return {"report": cached["report"], "node_ids": ids}, time.perf_counter() - t0
+            try:
+                return {"report": query_module(index, mod, retriever, nodes), "node_ids": ids}, time.perf_counter() - t0
+            except Exception as e:
+                print(f"   ❌ Module '{mod}' failed: {e}", flush=True)
+                return {"report": f"(Report unavailable: {e})", "node_ids": None}, time.perf_counter() - t0
+        reports = dict(zip(modules, pool.map(report, modules)))
+        
+    for mod in modules:
+        ids = reports[mod][0]["node_ids"]
+        reused = ids is not None and ids == (previous.get(mod) or {}).get("node_ids")
+        status = "unchanged, report reused" if reused else f"report {reports[mod][1]:.1f}s"
+        print(f"   ⏱️ {mod}: retrieve {retrieved[mod][1]:.1f}s, {status}")
+    print(f"✅ Investigated {len(modules)} modules in {time.perf_counter() - start:.1f}s ({concurrency} concurrent).")
+    return {mod: reports[mod][0] for mod in modules}
+
+def get_architecture_path(repo_id):
+    return f"./architectures/{repo_id}.json"
+
+def get_module_reports_path(repo_id):
+    return f"./architectures/{repo_id}.reports.json"
+
+def generate_architecture_json(repo_id, reuse_reports=False):
+    """
+    Writes ./architectures/{repo_id}.json from module reports plus the repo map.
+    With `reuse_reports` (after an incremental update), modules whose retrieved
+    nodes did not change keep their saved report, and when none changed the
+    existing architecture JSON is kept without another LLM call.
+    """
     print(f"🏛️ Generating JSON Architecture for {repo_id}...")
     
     try:
         index = load_index_for_repo(repo_id)
+        retriever = create_retriever(index, repo_id)
+        
+        previous = {}
+        reports_path = get_module_reports_path(repo_id)
+        if reuse_reports and os.path.exists(reports_path):
+            with open(reports_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
         
         # Gather reports (keep this RAG logic, it's good)
         modules = ["Authentication", "Admin Dashboard", "Waiter System", "Kitchen Display", "Database Schemas", "Folder Structure", "UI Components", "API Routes"]
-        reports = {}
-        for mod in modules:
-            reports[mod] = query_module(index, mod)
+        results = investigate_modules(index, retriever, modules, previous=previous)
+        os.makedirs("./architectures", exist_ok=True)
+        with open(reports_path, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        
+        output_file = get_architecture_path(repo_id)
+        if previous and os.path.exists(output_file) and all(
+            results[m]["node_ids"] is not None and results[m]["node_ids"] == previous.get(m, {}).get("node_ids")
+            for m in modules
+        ):
+            print(f"⏭️ No module changed; keeping {output_file}")
+            return output_file
+        reports = {m: results[m]["report"] for m in modules}
             
         reports_text = "\n".join([f"\n--- Report: {m} ---\n{c}\n" for m, c in reports.items()])
         
@@ -376,11 +1113,7 @@ def generate_architecture_json(repo_id):
         # Parse to ensure validity
         json_obj = json.loads(text)
         
-        output_dir = "./architectures"
-        os.makedirs(output_dir, exist_ok=True)
         # Save as .json now
-        output_file = f"{output_dir}/{repo_id}.json"
-        
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(json_obj, f, indent=2)
             
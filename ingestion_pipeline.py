@@ -0,0 +1,360 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+from llama_index.core import Settings
+from llama_index.core.schema import MetadataMode
+from llama_index.core.node_parser import get_leaf_nodes
+
+from embedding_cache import describe_embed_model
+from embedding_executor import AdaptiveEmbedder
+from shared_store import SharedChunkVectorStore
+
+load_dotenv()
+
+# In-flight budget: how many documents / leaf nodes may sit between stages at once.
+# Peak memory is bounded by these, not by repository size.
+MAX_INFLIGHT_DOCS = int(os.getenv("INGEST_MAX_INFLIGHT_DOCS", 32))
+MAX_INFLIGHT_NODES = int(os.getenv("INGEST_MAX_INFLIGHT_NODES", 2048))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 100))
+# Parse worker processes (1 = parse on the pipeline thread) and documents per shard
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", 1))
+PARSE_SHARD_SIZE = int(os.getenv("PARSE_SHARD_SIZE", 8))
+# Leaves per vector store write; Chroma handles large bulk adds far better than many small ones
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 2000))
+
+# Marks the end of a stream on a stage queue
+_DONE = object()
+
+# Per-process parser for pool workers, built once by _init_parse_worker
+_worker_parser = None
+
+def _init_parse_worker(node_parser_factory):
+    global _worker_parser
+    _worker_parser = node_parser_factory()
+
+def _parse_shard(documents):
+    """Parses a shard of Documents in a worker process; one node list per document."""
+    return [_worker_parser.get_nodes_from_documents([doc]) for doc in documents]
+
+class StageProgress:
+    """Thread-safe progress counter for one pipeline stage."""
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.count = 0
+        self.done = False
+        self._lock = threading.Lock()
+
+    def add(self, n=1):
+        with self._lock:
+            self.count += n
+
+    def __str__(self):
+        return f"{self.name} {self.count} {self.unit}{' ✓' if self.done else ''}"
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+class StreamingIngestionPipeline:
+    """
+    Streams Documents through fetch -> parse -> embed -> upsert stages, each on
+    its own thread, connected by bounded queues. A slow stage blocks the ones
+    before it (backpressure), so only a bounded number of documents and nodes
+    are alive at any time.
+
+    `on_document` callbacks see every fetched Document exactly once (used for the
+    repo map and swarm dispatch) and must not keep a reference to its text.
+
+    With an `embedding_cache`, leaves whose text was embedded before (same model
+    and dimension) reuse the stored vector and skip the embedding call.
+
+    Embedding runs several batches concurrently through an AdaptiveEmbedder, which
+    tunes batch size and concurrency to latency and 429s; `embed_batch_size` is the
+    starting batch size. Results are written to the vector store in bulk.
+
+    With a `deduplicator`, leaves that duplicate an earlier chunk are kept in the
+    docstore but never embedded or written to the vector store. With a
+    SharedChunkVectorStore, leaves whose content another repo already stored are
+    not embedded either; the store links them to the existing vector.
+
+    With `parse_workers` > 1, documents are parsed in shards on a process pool
+    (parsers are not picklable, so each worker builds one from `node_parser_factory`).
+    Every document is parsed whole inside one worker, so its node hierarchy and
+    relationships come back intact; shards are consumed in submission order.
+    """
+
+    def __init__(self, node_parser, vector_store, docstore, embed_model=None,
+                 max_inflight_docs=None, max_inflight_nodes=None, embed_batch_size=None,
+                 on_document=None, progress_interval=5.0, embedding_cache=None,
+                 embed_concurrency=None, upsert_batch_size=None, deduplicator=None,
+                 parse_workers=None, node_parser_factory=None, parse_shard_size=None):
+        self.node_parser = node_parser
+        self.vector_store = vector_store
+        self.docstore = docstore
+        self.embed_model = embed_model or Settings.embed_model
+        self.max_inflight_docs = max_inflight_docs or MAX_INFLIGHT_DOCS
+        self.max_inflight_nodes = max_inflight_nodes or MAX_INFLIGHT_NODES
+        self.embed_batch_size = embed_batch_size or EMBED_BATCH_SIZE
+        self.on_document = on_document or []
+        self.progress_interval = progress_interval
+        self.embedding_cache = embedding_cache
+        self.embed_model_id = describe_embed_model(self.embed_model)
+        self.embedder = AdaptiveEmbedder(
+            self.embed_model, batch_size=self.embed_batch_size, concurrency=embed_concurrency
+        )
+        self.upsert_batch_size = upsert_batch_size or UPSERT_BATCH_SIZE
+        self.deduplicator = deduplicator
+        self.parse_workers = parse_workers or PARSE_WORKERS
+        self.node_parser_factory = node_parser_factory
+        self.parse_shard_size = parse_shard_size or PARSE_SHARD_SIZE
+        if self.parse_workers > 1 and node_parser_factory is None:
+            print("⚠️ parse_workers > 1 needs a node_parser_factory; parsing on one thread.")
+            self.parse_workers = 1
+
+        self.progress = {
+            "fetch": StageProgress("fetch", "docs"),
+            "parse": StageProgress("parse", "nodes"),
+            "embed": StageProgress("embed", "leaves"),
+            "upsert": StageProgress("upsert", "leaves"),
+        }
+        self._stop = threading.Event()
+        self._errors = []
+
+    # --- queue helpers (abort-aware, so a failed stage never deadlocks the rest) ---
+    def _put(self, q, item):
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+    def _run_stage(self, name, fn):
+        try:
+            fn()
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            print(f"❌ Pipeline stage '{name}' failed: {e}", flush=True)
+            self._errors.append((name, e))
+            self._stop.set()
+        finally:
+            self.progress[name].done = True
+
+    # --- stages ---
+    def _fetch_stage(self, documents, doc_q):
+        for doc in documents:
+            for callback in self.on_document:
+                callback(doc)
+            self._put(doc_q, doc)
+            self.progress["fetch"].add()
+        self._put(doc_q, _DONE)
+
+    def _parse_stage(self, doc_q, leaf_q):
+        if self.parse_workers > 1:
+            self._parse_stage_pooled(doc_q, leaf_q)
+            return
+        while True:
+            doc = self._get(doc_q)
+            if doc is _DONE:
+                break
+            self._forward_nodes(self.node_parser.get_nodes_from_documents([doc]), leaf_q)
+        self._put(leaf_q, _DONE)
+
+    def _parse_stage_pooled(self, doc_q, leaf_q):
+        # spawn, not fork: this process already runs several threads
+        executor = ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parse_worker,
+            initargs=(self.node_parser_factory,)
+        )
+        pending = deque()
+        try:
+            finished = False
+            while not finished:
+                shard = []
+                while len(shard) < self.parse_shard_size:
+                    doc = self._get(doc_q)
+                    if doc is _DONE:
+                        finished = True
+                        break
+                    shard.append(doc)
+                if shard:
+                    pending.append(executor.submit(_parse_shard, shard))
+                # Keep every worker busy, but no more shards in flight than that
+                while pending and (finished or len(pending) > 2 * self.parse_workers):
+                    for nodes in pending.popleft().result():
+                        self._forward_nodes(nodes, leaf_q)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._put(leaf_q, _DONE)
+
+    def _forward_nodes(self, nodes, leaf_q):
+        # Parents go straight to the docstore; only leaves are embedded
+        self.docstore.add_documents(nodes)
+        self.progress["parse"].add(len(nodes))
+        for leaf in get_leaf_nodes(nodes):
+            if self.deduplicator is not None and self.deduplicator.check(leaf) is not None:
+                continue
+            self._put(leaf_q, leaf)
+
+    def _embed_stage(self, leaf_q, upsert_q):
+        batch = []
+        finished = False
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.embedder.max_concurrency, thread_name_prefix="ingest-embed") as executor:
+            while not finished:
+                item = self._get(leaf_q)
+                if item is _DONE:
+                    finished = True
+                else:
+                    batch.append(item)
+                if batch and (finished or len(batch) >= self.embedder.batch_size):
+                    # Hold the batch until a slot frees up under the current concurrency
+                    while len(pending) >= self.embedder.concurrency:
+                        done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                        self._check_futures(done)
+                    pending.add(executor.submit(self._embed_and_forward, batch, upsert_q))
+                    batch = []
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                self._check_futures(done)
+        self._put(upsert_q, _DONE)
+
+    def _check_futures(self, futures):
+        for future in futures:
+            future.result()  # re-raises a failed batch in the embed stage
+        if self._stop.is_set():
+            raise PipelineAborted()
+
+    def _embed_and_forward(self, batch, upsert_q):
+        if self._stop.is_set():
+            raise PipelineAborted()
+        self._embed_batch(batch)
+        self.progress["embed"].add(len(batch))
+        self._put(upsert_q, batch)
+
+    def _embed_batch(self, batch):
+        """Sets node.embedding on every node that needs one, serving what it can from the embedding cache."""
+        if isinstance(self.vector_store, SharedChunkVectorStore):
+            batch = self.vector_store.missing_vectors(batch)
+            if not batch:
+                return
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        if self.embedding_cache is None:
+            for node, embedding in zip(batch, self.embedder.embed(texts)):
+                node.embedding = embedding
+            return
+
+        model_name, dimension = self.embed_model_id
+        keys = [self.embedding_cache.make_key(text, model_name, dimension) for text in texts]
+        cached = self.embedding_cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            embeddings = self.embedder.embed([texts[i] for i in missing])
+            self.embedding_cache.put_many([(keys[i], emb) for i, emb in zip(missing, embeddings)])
+            for i, embedding in zip(missing, embeddings):
+                batch[i].embedding = embedding
+        for node, key in zip(batch, keys):
+            if key in cached:
+                node.embedding = cached[key]
+
+    def index_nodes(self, nodes):
+        """Embeds and upserts already-parsed nodes outside a streaming run (e.g. promoted duplicates)."""
+        nodes = list(nodes)
+        for i in range(0, len(nodes), self.embedder.batch_size):
+            batch = nodes[i:i + self.embedder.batch_size]
+            self._embed_batch(batch)
+            self.vector_store.add(batch)
+        return len(nodes)
+
+    def _upsert_stage(self, upsert_q):
+        pending = []
+        while True:
+            batch = self._get(upsert_q)
+            if batch is not _DONE:
+                pending.extend(batch)
+            if pending and (batch is _DONE or len(pending) >= self.upsert_batch_size):
+                self.vector_store.add(pending)
+                self.progress["upsert"].add(len(pending))
+                pending = []
+            if batch is _DONE:
+                break
+
+    def _report_progress(self):
+        while not self._stop.wait(self.progress_interval):
+            print("⏳ Pipeline: " + " | ".join(str(p) for p in self.progress.values()), flush=True)
+
+    def run(self, documents):
+        """
+        Consumes an iterable of Documents end to end. Returns the progress counters;
+        raises the first stage error if any stage failed.
+        """
+        # Batches in the upsert queue each hold up to embed_batch_size leaves
+        doc_q = queue.Queue(maxsize=self.max_inflight_docs)
+        leaf_q = queue.Queue(maxsize=self.max_inflight_nodes)
+        upsert_q = queue.Queue(maxsize=max(1, self.max_inflight_nodes // self.embed_batch_size))
+
+        stages = [
+            ("fetch", lambda: self._fetch_stage(documents, doc_q)),
+            ("parse", lambda: self._parse_stage(doc_q, leaf_q)),
+            ("embed", lambda: self._embed_stage(leaf_q, upsert_q)),
+            ("upsert", lambda: self._upsert_stage(upsert_q)),
+        ]
+        print(
+            f"🚰 Streaming pipeline started (in-flight budget: {self.max_inflight_docs} docs, "
+            f"{self.max_inflight_nodes} leaves, embed batch {self.embedder.batch_size} x "
+            f"{self.embedder.concurrency} concurrent, upsert batch {self.upsert_batch_size}, "
+            f"{self.parse_workers} parse worker(s))",
+            flush=True
+        )
+        if self.embedding_cache is not None:
+            self.embedding_cache.reset_stats()
+        start_time = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_stage, args=(name, fn), name=f"ingest-{name}", daemon=True)
+            for name, fn in stages
+        ]
+        reporter = threading.Thread(target=self._report_progress, daemon=True)
+        for t in threads:
+            t.start()
+        reporter.start()
+        for t in threads:
+            t.join()
+        self._stop.set()
+
+        if self._errors:
+            name, error = self._errors[0]
+            raise Exception(f"Ingestion pipeline failed in '{name}' stage: {error}") from error
+
+        elapsed = time.perf_counter() - start_time
+        print(
+            "✅ Pipeline finished in "
+            f"{elapsed:.2f}s: " + " | ".join(str(p) for p in self.progress.values()),
+            flush=True
+        )
+        print(self.embedder.report(elapsed), flush=True)
+        if self.embedding_cache is not None:
+            print(self.embedding_cache.report(), flush=True)
+        if self.deduplicator is not None and self.deduplicator.enabled:
+            print(self.deduplicator.report(), flush=True)
+        return self.progress
@@ -0,0 +1,325 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from llama_index.core.retrievers import AutoMergingRetriever
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+from llama_index.core.storage.docstore.types import DEFAULT_PERSIST_FNAME
+from llama_index.core.storage.docstore.utils import json_to_doc
+from llama_index.core.storage.kvstore.types import BaseKVStore, DEFAULT_COLLECTION, DEFAULT_BATCH_SIZE
+
+load_dotenv()
+
+DOCSTORE_FILENAME = "docstore.sqlite3"
+# Parsed nodes kept in memory per repo (parents fetched by auto-merging, hot leaves)
+CACHE_NODES = int(os.getenv("DOCSTORE_CACHE_NODES", 2048))
+# SQLite caps bound parameters per statement; larger lookups are chunked
+MAX_SQL_PARAMS = 900
+FILE_PATH_EXPR = "json_extract(value, '$.__data__.metadata.file_path')"
+
+class SQLiteKVStore(BaseKVStore):
+    """
+    Key-value store in a single SQLite file (one row per key, JSON values).
+    Nothing is loaded on open; reads hit the B-tree index, so opening is
+    constant-time regardless of how many nodes the repo has.
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (collection, key))"
+        )
+        # Lets incremental updates find a file's nodes without scanning every value
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_kv_file_path ON kv(collection, {FILE_PATH_EXPR})")
+        self._conn.commit()
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put_all([(key, val)], collection=collection)
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put(key, val, collection)
+
+    def put_all(
+        self,
+        kv_pairs: List[Tuple[str, dict]],
+        collection: str = DEFAULT_COLLECTION,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        # One transaction for the whole batch, whatever batch_size the docstore asks for
+        rows = [(collection, key, json.dumps(val)) for key, val in kv_pairs]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO kv (collection, key, value) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    async def aput_all(
+        self,
+        kv_pairs: List[Tuple[str, dict]],
+        collection: str = DEFAULT_COLLECTION,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        self.put_all(kv_pairs, collection, batch_size)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get_many([key], collection).get(key)
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get(key, collection)
+
+    def get_many(self, keys, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        """Fetches several keys in as few queries as possible. Missing keys are omitted."""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), MAX_SQL_PARAMS):
+                chunk = keys[start:start + MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                for key, value in self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE collection = ? AND key IN ({placeholders})",
+                    [collection, *chunk]
+                ):
+                    found[key] = json.loads(value)
+        return found
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM kv WHERE collection = ?", (collection,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return self.get_all(collection)
+
+    def iter_batches(self, collection: str = DEFAULT_COLLECTION, batch_size: int = 512):
+        """Yields {key: value} dicts of at most batch_size rows, so a full scan never loads the whole table."""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, key, value FROM kv WHERE collection = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (collection, last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield {key: json.loads(value) for _, key, value in rows}
+
+    def keys_for_file_paths(self, file_paths, collection: str = DEFAULT_COLLECTION) -> List[str]:
+        file_paths = list(file_paths)
+        keys = []
+        with self._lock:
+            for start in range(0, len(file_paths), MAX_SQL_PARAMS):
+                chunk = file_paths[start:start + MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                keys.extend(key for (key,) in self._conn.execute(
+                    f"SELECT key FROM kv WHERE collection = ? AND {FILE_PATH_EXPR} IN ({placeholders})",
+                    [collection, *chunk]
+                ))
+        return keys
+
+    def count(self, collection: str = DEFAULT_COLLECTION) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM kv WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self.delete(key, collection)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class SQLiteDocumentStore(KVDocumentStore):
+    """
+    Docstore backed by SQLiteKVStore, replacing the repo's docstore.json. Nodes
+    are read on demand (in batches via get_nodes/prefetch) and the most
+    recently used ones are kept in a bounded LRU, so memory follows what
+    queries actually touch instead of the size of the repo.
+    """
+
+    def __init__(self, db_path, cache_size=None):
+        super().__init__(SQLiteKVStore(db_path))
+        self.cache_size = CACHE_NODES if cache_size is None else cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- node cache ---
+    def _remember(self, nodes):
+        with self._cache_lock:
+            for node in nodes:
+                self._cache[node.node_id] = node
+                self._cache.move_to_end(node.node_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, node_ids):
+        with self._cache_lock:
+            for node_id in node_ids:
+                self._cache.pop(node_id, None)
+
+    def prefetch(self, node_ids):
+        """
+        Loads any of `node_ids` not already cached in one batched read. Returns
+        {node_id: node} for those found, even if the cache is too small to keep them all.
+        """
+        found = {}
+        with self._cache_lock:
+            missing = []
+            for node_id in dict.fromkeys(node_ids):
+                node = self._cache.get(node_id)
+                if node is not None:
+                    self._cache.move_to_end(node_id)
+                    found[node_id] = node
+                    self.hits += 1
+                else:
+                    missing.append(node_id)
+            self.misses += len(missing)
+        if missing:
+            values = self._kvstore.get_many(missing, collection=self._node_collection)
+            loaded = [json_to_doc(values[node_id]) for node_id in missing if node_id in values]
+            self._remember(loaded)
+            found.update((node.node_id, node) for node in loaded)
+        return found
+
+    # --- reads ---
+    def get_document(self, doc_id: str, raise_error: bool = True):
+        node = self.prefetch([doc_id]).get(doc_id)
+        if node is None and raise_error:
+            raise ValueError(f"doc_id {doc_id} not found.")
+        return node
+
+    def get_nodes(self, node_ids: List[str], raise_error: bool = True):
+        found = self.prefetch(node_ids)
+        nodes = []
+        for node_id in node_ids:
+            node = found.get(node_id)
+            if node is None and raise_error:
+                raise ValueError(f"doc_id {node_id} not found.")
+            if node is not None:
+                nodes.append(node)
+        return nodes
+
+    def node_ids_for_files(self, file_paths):
+        """Ids of every node (leaves and parents) whose metadata file_path is in `file_paths`."""
+        return self._kvstore.keys_for_file_paths(file_paths, collection=self._node_collection)
+
+    def nodes_for_files(self, file_paths):
+        ids = self.node_ids_for_files(file_paths)
+        found = self._kvstore.get_many(ids, collection=self._node_collection)
+        return [json_to_doc(found[node_id]) for node_id in ids if node_id in found]
+
+    def iter_node_batches(self, batch_size=512):
+        """Every node in the store, in lists of at most batch_size, bypassing the cache."""
+        for batch in self._kvstore.iter_batches(self._node_collection, batch_size):
+            yield [json_to_doc(value) for value in batch.values()]
+
+    def __len__(self):
+        return self._kvstore.count(self._node_collection)
+
+    def __bool__(self):
+        # StorageContext.from_defaults does `docstore or SimpleDocumentStore()`; an empty store must not be swapped out
+        return True
+
+    # --- writes (keep the cache coherent) ---
+    def add_documents(self, docs, allow_update: bool = True, batch_size: Optional[int] = None, store_text: bool = True) -> None:
+        self._forget([doc.node_id for doc in docs])
+        super().add_documents(docs, allow_update=allow_update, batch_size=batch_size, store_text=store_text)
+
+    def delete_document(self, doc_id: str, raise_error: bool = True) -> None:
+        self._forget([doc_id])
+        super().delete_document(doc_id, raise_error=raise_error)
+
+    def persist(self, persist_path=None, fs=None) -> None:
+        """Writes are committed as they happen; nothing to flush."""
+
+    def report(self):
+        total = self.hits + self.misses
+        if total:
+            print(
+                f"📚 Docstore: {self.hits}/{total} node reads from cache ({self.hits / total:.0%}), "
+                f"{len(self._cache)} nodes resident."
+            )
+
+    def close(self):
+        self._kvstore.close()
+
+    # --- construction ---
+    @classmethod
+    def from_docstore(cls, docstore, storage_dir):
+        """Writes an in-memory SimpleDocumentStore (e.g. from a fresh ingest) to storage_dir."""
+        store = cls(os.path.join(storage_dir, DOCSTORE_FILENAME))
+        for collection, data in docstore._kvstore.to_dict().items():
+            store._kvstore.put_all(list(data.items()), collection=collection)
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, storage_dir):
+        """
+        Opens a repo's SQLite docstore. Repos persisted with a docstore.json are
+        migrated once (the JSON file is removed afterwards).
+        """
+        db_path = os.path.join(storage_dir, DOCSTORE_FILENAME)
+        json_path = os.path.join(storage_dir, DEFAULT_PERSIST_FNAME)
+        if os.path.exists(db_path) or not os.path.exists(json_path):
+            return cls(db_path)
+        print(f"🔁 Migrating {json_path} to {DOCSTORE_FILENAME}...")
+        store = cls.from_docstore(SimpleDocumentStore.from_persist_path(json_path), storage_dir)
+        os.remove(json_path)
+        return store
+
+class BatchedAutoMergingRetriever(AutoMergingRetriever):
+    """
+    AutoMergingRetriever that fetches every parent (and fill-in neighbour) of
+    a merge round in one docstore read instead of one read per node.
+    """
+
+    @staticmethod
+    def _merge_candidates(nodes):
+        wanted = [r.node.parent_node.node_id for r in nodes if r.node.parent_node is not None]
+        # Same condition _fill_in_nodes uses to pull in the node between two hits
+        for current, following in zip(nodes, nodes[1:]):
+            if current.node.next_node is not None and current.node.next_node == following.node.prev_node:
+                wanted.append(current.node.next_node.node_id)
+        return wanted
+
+    def _try_merging(self, nodes):
+        docstore = self._storage_context.docstore
+        if isinstance(docstore, SQLiteDocumentStore):
+            docstore.prefetch(self._merge_candidates(nodes))
+        return super()._try_merging(nodes)
+
+    def retrieve_many(self, query_bundles):
+        """
+        Retrieves several queries as one batch: the base hits of every query come
+        first, then the parents and neighbours of all of them are read in a single
+        prefetch, so queries with overlapping hits share those reads and the
+        merged parent nodes. Returns one node list per query, in order.
+        """
+        initial = [self._vector_retriever.retrieve(query_bundle) for query_bundle in query_bundles]
+        docstore = self._storage_context.docstore
+        if isinstance(docstore, SQLiteDocumentStore):
+            docstore.prefetch([node_id for nodes in initial for node_id in self._merge_candidates(nodes)])
+        results = []
+        for nodes in initial:
+            nodes, is_changed = self._try_merging(nodes)
+            while is_changed:
+                nodes, is_changed = self._try_merging(nodes)
+            nodes.sort(key=lambda x: x.get_score(), reverse=True)
+            results.append(nodes)
+        return results
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+from typing import List
+from dotenv import load_dotenv
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.utils import get_tokenizer
+from llama_index.core.schema import NodeWithScore, QueryBundle, NodeRelationship
+
+load_dotenv()
+
+BM25_FILENAME = "bm25.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal-rank fusion constant (standard value from the RRF paper)
+RRF_K = int(os.getenv("HYBRID_RRF_K", 60))
+# A symbol in at most this many chunks is selective enough to answer from BM25 alone
+SYMBOL_MAX_DF = int(os.getenv("BM25_SYMBOL_MAX_DF", 5))
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def is_code_symbol(identifier):
+    """snake_case, camelCase/PascalCase or mixed letters+digits: looks like code, not prose."""
+    return (
+        "_" in identifier.strip("_")
+        or re.search(r"[a-z][A-Z]", identifier) is not None
+        or (re.search(r"\d", identifier) is not None and re.search(r"[A-Za-z]", identifier) is not None)
+    )
+
+def tokenize(text):
+    """
+    Code-aware tokens: every identifier in lowercase, plus its snake_case and
+    camelCase parts, so `getUserById` matches both itself and "user".
+    """
+    tokens = []
+    for identifier in IDENTIFIER_PATTERN.findall(text):
+        lowered = identifier.lower()
+        tokens.append(lowered)
+        parts = [p.lower() for chunk in identifier.split("_") for p in CAMEL_PATTERN.findall(chunk)]
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if len(p) > 1 and p != lowered)
+    return tokens
+
+def count_tokens(text):
+    """LLM tokens in a text, by the tokenizer llama_index budgets prompts with."""
+    return len(get_tokenizer()(text)) if text else 0
+
+def _index_text(node):
+    # The path is searchable too, so file names in a question hit their chunks
+    return f"{node.metadata.get('file_path', '')}\n{node.get_content()}"
+
+class BM25Index:
+    """
+    Per-repo BM25 inverted index over leaf chunks, persisted as bm25.json next to
+    the docstore. Only the forward index (term counts per node) is stored; the
+    inverted postings are rebuilt on load, which keeps incremental updates simple.
+    """
+
+    def __init__(self):
+        self.doc_terms = {}  # node_id -> {term: tf}
+        self.doc_lengths = {}
+        self._postings = None
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add_nodes(self, nodes):
+        for node in nodes:
+            counts = Counter(tokenize(_index_text(node)))
+            self.remove_nodes([node.node_id])
+            self.doc_terms[node.node_id] = dict(counts)
+            self.doc_lengths[node.node_id] = sum(counts.values())
+            self._total_length += self.doc_lengths[node.node_id]
+        self._postings = None
+
+    def remove_nodes(self, node_ids):
+        for node_id in node_ids:
+            if self.doc_terms.pop(node_id, None) is not None:
+                self._total_length -= self.doc_lengths.pop(node_id)
+                self._postings = None
+
+    def _build_postings(self):
+        if self._postings is None:
+            postings = {}
+            for node_id, terms in self.doc_terms.items():
+                for term, tf in terms.items():
+                    postings.setdefault(term, []).append((node_id, tf))
+            self._postings = postings
+        return self._postings
+
+    def document_frequency(self, term):
+        return len(self._build_postings().get(term, ()))
+
+    def search(self, query, top_k=10):
+        """Returns [(node_id, score)] best first."""
+        postings = self._build_postings()
+        n_docs = len(self.doc_terms)
+        if not n_docs:
+            return []
+        avg_length = self._total_length / n_docs
+        scores = Counter()
+        for term in set(tokenize(query)):
+            matches = postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (n_docs - len(matches) + 0.5) / (len(matches) + 0.5))
+            for node_id, tf in matches:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[node_id] / avg_length)
+                scores[node_id] += idf * tf * (BM25_K1 + 1) / norm
+        return scores.most_common(top_k)
+
+    def confident_hits(self, query, top_k=10):
+        """
+        Returns lexical hits when the query names a selective code symbol
+        (e.g. `get_user_by_id`, `AuthProvider`) found in only a few chunks and
+        BM25 ranks every one of those chunks; otherwise None and the caller
+        should consult the vector index.
+        """
+        symbols = [
+            s.lower() for s in IDENTIFIER_PATTERN.findall(query)
+            if is_code_symbol(s) and 0 < self.document_frequency(s.lower()) <= min(SYMBOL_MAX_DF, top_k)
+        ]
+        if not symbols:
+            return None
+        hits = self.search(query, top_k)
+        symbol_hits = [(node_id, score) for node_id, score in hits if any(s in self.doc_terms[node_id] for s in symbols)]
+        expected = {node_id for s in symbols for node_id, _ in self._build_postings()[s]}
+        if not symbol_hits or len(symbol_hits) < len(expected) or hits[0] not in symbol_hits:
+            return None
+        return symbol_hits
+
+    def save(self, storage_dir):
+        with open(os.path.join(storage_dir, BM25_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(self.doc_terms, f)
+
+    @classmethod
+    def load(cls, storage_dir):
+        """Loads the index from a storage dir; empty if the repo predates BM25."""
+        index = cls()
+        path = os.path.join(storage_dir, BM25_FILENAME)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                index.doc_terms = json.load(f)
+            index.doc_lengths = {node_id: sum(terms.values()) for node_id, terms in index.doc_terms.items()}
+            index._total_length = sum(index.doc_lengths.values())
+        return index
+
+def leaf_nodes_for_files(docstore, file_paths=None):
+    """Leaf nodes in a docstore, optionally limited to some files."""
+    if file_paths is not None and hasattr(docstore, "nodes_for_files"):
+        # Disk-backed docstore: read just those files' nodes
+        nodes = docstore.nodes_for_files(file_paths)
+    else:
+        nodes = docstore.docs.values()
+    return [
+        node for node in nodes
+        if NodeRelationship.CHILD not in node.relationships
+        and (file_paths is None or node.metadata.get("file_path") in file_paths)
+    ]
+
+def needs_query_embedding(retriever, query_str):
+    """
+    False when the retriever (or the retriever it wraps, e.g. under auto-merging)
+    is a HybridRetriever that will answer this query from BM25 alone.
+    """
+    while retriever is not None:
+        if isinstance(retriever, HybridRetriever):
+            return not retriever.skips_vector_search(query_str)
+        retriever = getattr(retriever, "_vector_retriever", None)
+    return True
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses BM25 and vector results with reciprocal-rank fusion. When the query
+    names a selective code symbol and BM25 is confident, the vector retriever
+    (and so the query embedding round trip) is skipped entirely.
+    Meant to sit under AutoMergingRetriever in place of the vector retriever.
+    """
+
+    def __init__(self, vector_retriever, bm25_index, docstore, similarity_top_k=10, **kwargs):
+        self._vector_retriever = vector_retriever
+        self._bm25 = bm25_index
+        self._docstore = docstore
+        self._top_k = similarity_top_k
+        super().__init__(**kwargs)
+
+    def _lexical_nodes(self, hits):
+        nodes = {node.node_id: node for node in self._docstore.get_nodes([node_id for node_id, _ in hits], raise_error=False)}
+        return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in hits if node_id in nodes]
+
+    def skips_vector_search(self, query_str):
+        return bool(self._bm25.confident_hits(query_str, self._top_k))
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        confident = self._bm25.confident_hits(query_bundle.query_str, self._top_k)
+        if confident:
+            print(f"🔤 Lexical hit for '{query_bundle.query_str[:60]}': skipped vector search.")
+            return self._lexical_nodes(confident)
+
+        lexical = self._lexical_nodes(self._bm25.search(query_bundle.query_str, self._top_k))
+        vector = self._vector_retriever.retrieve(query_bundle)
+
+        fused = {}
+        for ranking in (vector, lexical):
+            for rank, result in enumerate(ranking):
+                entry = fused.setdefault(result.node.node_id, [result.node, 0.0])
+                entry[1] += 1.0 / (RRF_K + rank + 1)
+        ranked = sorted(fused.values(), key=lambda item: item[1], reverse=True)[:self._top_k]
+        return [NodeWithScore(node=node, score=score) for node, score in ranked]
@@ -0,0 +1,143 @@
+import os
+import mmap
+import subprocess
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Files at least this large are decoded straight from a memory map instead of read() into a bytes copy
+MMAP_THRESHOLD = int(os.getenv("LOCAL_MMAP_THRESHOLD_KB", 256)) * 1024
+
+# Never descend into these when walking a plain (non-git) directory
+SKIPPED_DIRS = {".git", "node_modules", "venv", ".venv", "__pycache__", "dist", "build"}
+
+def _read_text(path, size):
+    """Reads a file as UTF-8, memory-mapping large files."""
+    with open(path, "rb") as f:
+        if size >= MMAP_THRESHOLD and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # str() decodes directly from the mapped buffer
+                return str(mm, "utf-8", "replace")
+        return f.read().decode("utf-8", errors="replace")
+
+def _git(repo_path, *args):
+    return subprocess.run(
+        ["git", "-C", repo_path, *args], capture_output=True, check=True
+    ).stdout
+
+def is_git_repo(path):
+    """True for a working tree or a bare repository."""
+    try:
+        return _git(path, "rev-parse", "--git-dir").strip() != b""
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+def _list_directory_files(root):
+    """
+    Lists candidate files relative to `root`. Inside a git working tree this is
+    tracked plus untracked-but-not-ignored files (what would be pushed);
+    otherwise a plain walk that skips dependency and build folders.
+    """
+    if os.path.isdir(os.path.join(root, ".git")):
+        try:
+            out = _git(root, "ls-files", "-z", "--cached", "--others", "--exclude-standard")
+            return sorted({p.decode("utf-8", errors="replace") for p in out.split(b"\0") if p})
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            pass
+
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIPPED_DIRS)
+        for name in sorted(filenames):
+            paths.append(os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/"))
+    return paths
+
+def iter_local_directory(root, is_relevant, make_document, url_prefix=None, pruner=None):
+    """
+    Yields Documents for every relevant file under a local directory.
+    `url_prefix` (e.g. the raw.githubusercontent.com base of the same repo) keeps
+    metadata identical to a remote ingest; defaults to a file:// URL.
+    An optional FilePruner skips files by path/size before they are read.
+    """
+    root = os.path.abspath(root)
+    print(f"📂 Reading local directory {root}...")
+    gitattributes_path = os.path.join(root, ".gitattributes")
+    if pruner is not None and os.path.isfile(gitattributes_path):
+        with open(gitattributes_path, "r", encoding="utf-8", errors="replace") as f:
+            pruner.load_gitattributes(f.read())
+    count = 0
+    total_bytes = 0
+    for rel_path in _list_directory_files(root):
+        if not is_relevant(rel_path):
+            continue
+        abs_path = os.path.join(root, rel_path)
+        try:
+            size = os.path.getsize(abs_path)
+            if pruner is not None and pruner.check_entry(rel_path, size) is not None:
+                continue
+            text = _read_text(abs_path, size)
+        except OSError as e:
+            print(f"   ⚠️ Error processing {rel_path}: {e}")
+            continue
+        count += 1
+        total_bytes += size
+        url = f"{url_prefix}/{rel_path}" if url_prefix else f"file://{abs_path}"
+        yield make_document(rel_path, text, url)
+    print(f"📊 Read {count} local files ({total_bytes / 1024 / 1024:.2f} MB).")
+
+def iter_local_git(repo_path, ref, is_relevant, make_document, url_prefix=None, pruner=None):
+    """
+    Yields Documents for every relevant blob of `ref` in a local (bare or
+    working-tree) git repository, streaming contents through one
+    `git cat-file --batch` process instead of a checkout.
+    An optional FilePruner skips blobs by path/size before they are read.
+    """
+    repo_path = os.path.abspath(repo_path)
+    print(f"📂 Reading local git repo {repo_path} at {ref}...")
+    listing = _git(repo_path, "ls-tree", "-r", "-l", "-z", ref)
+
+    if pruner is not None:
+        try:
+            pruner.load_gitattributes(_git(repo_path, "show", f"{ref}:.gitattributes").decode("utf-8", errors="replace"))
+        except subprocess.CalledProcessError:
+            pass
+
+    blobs = []
+    for entry in listing.split(b"\0"):
+        if not entry:
+            continue
+        meta, path = entry.split(b"\t", 1)
+        _, obj_type, sha, size = meta.split()
+        path = path.decode("utf-8", errors="replace")
+        if obj_type != b"blob" or not is_relevant(path):
+            continue
+        if pruner is not None and pruner.check_entry(path, int(size)) is not None:
+            continue
+        blobs.append((sha, path))
+
+    proc = subprocess.Popen(
+        ["git", "-C", repo_path, "cat-file", "--batch"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    count = 0
+    total_bytes = 0
+    try:
+        for sha, path in blobs:
+            proc.stdin.write(sha + b"\n")
+            proc.stdin.flush()
+            header = proc.stdout.readline().split()
+            if len(header) < 3 or header[1] != b"blob":
+                print(f"   ❌ Failed: {path}")
+                continue
+            size = int(header[2])
+            data = proc.stdout.read(size)
+            proc.stdout.read(1)  # trailing newline
+            count += 1
+            total_bytes += size
+            url = f"{url_prefix}/{path}" if url_prefix else f"git://{repo_path}@{ref}/{path}"
+            yield make_document(path, data.decode("utf-8", errors="replace"), url)
+    finally:
+        proc.stdin.close()
+        proc.stdout.close()
+        proc.wait()
+    print(f"📊 Read {count} blobs from git ({total_bytes / 1024 / 1024:.2f} MB).")
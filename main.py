@@ -3,19 +3,32 @@ import os
 import sys
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Optional, List
+import asyncio
 import subprocess
 import json
+import threading
+import time
 
 # Import only retrieval basics
-from indexer_robust import load_index_for_repo
-from llama_index.core import Settings, PromptTemplate
-from llama_index.core.retrievers import AutoMergingRetriever
-from llama_index.core.query_engine import RetrieverQueryEngine
+from indexer_robust import load_index_for_repo, create_retriever, get_repo_storage_dir, get_quantized_store_path
+from llama_index.core import Settings, PromptTemplate, get_response_synthesizer
+from llama_index.core.schema import QueryBundle
 
 from database import db
 from github_service import GithubService
+from github_client import github_client
+from chroma_client import chroma_registry
+from engine_cache import EngineCache, estimate_engine_bytes, ENGINE_CACHE_PRELOAD
+from answer_cache import answer_cache, normalize_question
+from context_budget import ContextBudgeter, BudgetedQueryEngine
+from embedding_executor import embed_queries
+from reranker import create_node_postprocessors, retrieval_top_k
+from lexical_index import needs_query_embedding
 
 app = FastAPI(title="CodeAtlas Multi-Tenant API")
 
@@ -28,12 +41,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory cache for query engines
-QUERY_ENGINE_CACHE = {}
+# /api/chat/batch limits: questions per request and completions in flight
+BATCH_CHAT_MAX_QUESTIONS = int(os.getenv("BATCH_CHAT_MAX_QUESTIONS", 32))
+BATCH_CHAT_CONCURRENCY = int(os.getenv("BATCH_CHAT_CONCURRENCY", 4))
+
+# In-memory LRU of query engines (entry and memory budgets from ENGINE_CACHE_* env)
+QUERY_ENGINE_CACHE = EngineCache()
 
 class IngestRequest(BaseModel):
     url: str
     branch: str = "main"
+    source: Optional[str] = None  # "api" (per-file) or "archive" (single tarball)
+    full_rebuild: bool = False  # Ignore the previous SHA and re-index everything
 
 class BranchRequest(BaseModel):
     url: str
@@ -42,10 +61,51 @@ class ChatRequest(BaseModel):
     repo_id: str
     message: str
 
+class BatchChatRequest(BaseModel):
+    repo_id: str
+    questions: List[str]
+
+@app.on_event("startup")
+def start_chroma():
+    # Start the shared Chroma client now, not on the first chat request
+    chroma_registry.health_check()
+    if ENGINE_CACHE_PRELOAD > 0:
+        threading.Thread(target=preload_query_engines, args=(ENGINE_CACHE_PRELOAD,), daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_chroma():
+    chroma_registry.shutdown()
+
+@app.on_event("shutdown")
+def flush_chat_counts():
+    db.flush_chats()
+
 @app.get("/")
 def home():
     return {"status": "online", "system": "Multi-Tenant CodeAtlas"}
 
+@app.get("/api/health")
+def health():
+    """
+    Checks the shared Chroma client (reconnecting on failure).
+    """
+    chroma = chroma_registry.health_check()
+    return {"status": "online" if chroma["ok"] else "degraded", "chroma": chroma}
+
+@app.get("/api/cache/engines")
+def engine_cache_stats():
+    """
+    Hit/miss/eviction counters and per-repo estimated sizes of loaded query engines.
+    """
+    return QUERY_ENGINE_CACHE.stats()
+
+@app.get("/api/cache/answers")
+def answer_cache_stats():
+    """
+    Exact/semantic hit counters of the chat answer cache.
+    """
+    return answer_cache.stats()
+
 @app.post("/api/github/branches")
 def get_branches(request: BranchRequest):
     """
@@ -62,10 +122,70 @@ def get_branches(request: BranchRequest):
     branches = gh.get_branches(owner, repo)
     return branches
 
+def run_ingestion(owner, repo, branch, url, current_sha, extra_args=None):
+    """
+    Spawns cli_ingest.py to handle ingestion robustly, avoiding async conflicts,
+    then records the ingested SHA in RepoDB. Returns the repo_id.
+    """
+    # Construct command
+    cmd = [sys.executable, "cli_ingest.py", owner, repo, branch] + (extra_args or [])
+    
+    # Ensure subprocess can print emojis regardless of Windows console encoding
+    env = os.environ.copy()
+    env["PYTHONIOENCODING"] = "utf-8"
+    
+    # Run blocking
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env, encoding="utf-8")
+    
+    print("📜 Subprocess Output:", result.stdout)
+    if result.stderr:
+        print("⚠️ Subprocess Error Output:", result.stderr)
+        
+    if result.returncode != 0:
+        raise Exception(f"Subprocess failed with code {result.returncode}. check server logs.")
+        
+    # Parse Repo ID from output
+    repo_id = f"{owner}-{repo}-{branch}" # Fallback guess
+    for line in result.stdout.splitlines():
+        if "Repo ID:" in line:
+            repo_id = line.split("Repo ID:")[1].strip()
+    
+    # Update RepoDB (State Management)
+    # Load the generated architecture to get metadata
+    meta = {}
+    arch_path = f"./architectures/{repo_id}.json"
+    if os.path.exists(arch_path):
+        try:
+            with open(arch_path, "r", encoding="utf-8") as f:
+                arch_data = json.load(f)
+                meta = arch_data.get("meta", {})
+        except Exception as e:
+            print(f"⚠️ Failed to load metadata for DB update: {e}")
+    
+    repo_data = {
+        "repo_id": repo_id,
+        "url": url,
+        "branch": branch,
+        "current_sha": current_sha,
+        "meta": meta
+    }
+    db.upsert(repo_data)
+    print(f"💾 Repo State Saved: {repo_id} (SHA: {current_sha})")
+    return repo_id
+
+@app.get("/api/github/rate-limit")
+def get_rate_limit():
+    """
+    Returns the GitHub rate budget as last reported by the API, plus how many
+    requests were answered with a free 304 from the ETag cache.
+    """
+    return github_client.rate_limit_status()
+
 @app.post("/api/ingest")
 def api_ingest(request: IngestRequest):
     """
     Spawns a subprocess to handle ingestion robustly, avoiding async conflicts.
+    Repos that were ingested before are updated incrementally unless full_rebuild is set.
     Updates RepoDB with the new state.
     """
     try:
@@ -84,141 +204,169 @@ def api_ingest(request: IngestRequest):
 
     print(f"🔄 Spawning ingestion subprocess for {owner}/{repo} (SHA: {current_sha})...")
     
-    # Construct command
-    cmd = [sys.executable, "cli_ingest.py", owner, repo, request.branch]
-    
-    # Ensure subprocess can print emojis regardless of Windows console encoding
-    env = os.environ.copy()
-    env["PYTHONIOENCODING"] = "utf-8"
+    extra_args = []
+    if request.source:
+        extra_args += ["--source", request.source]
+        
+    # Known previous SHA -> only re-index what changed since then
+    existing = db.get(f"{owner}-{repo}-{request.branch}")
+    base_sha = existing.get("current_sha") if existing else None
+    if not request.full_rebuild and base_sha and base_sha != "unknown" and current_sha != "unknown":
+        extra_args += ["--base-sha", base_sha, "--head-sha", current_sha]
     
     try:
-        # Run blocking
-        result = subprocess.run(cmd, capture_output=True, text=True, env=env, encoding="utf-8")
-        
-        print("📜 Subprocess Output:", result.stdout)
-        if result.stderr:
-            print("⚠️ Subprocess Error Output:", result.stderr)
-            
-        if result.returncode != 0:
-            raise Exception(f"Subprocess failed with code {result.returncode}. check server logs.")
-            
-        # Parse Repo ID from output
-        repo_id = f"{owner}-{repo}-{request.branch}" # Fallback guess
-        for line in result.stdout.splitlines():
-            if "Repo ID:" in line:
-                repo_id = line.split("Repo ID:")[1].strip()
-        
-        # 2. Update RepoDB (State Management)
-        # Load the generated architecture to get metadata
-        meta = {}
-        arch_path = f"./architectures/{repo_id}.json"
-        if os.path.exists(arch_path):
-            try:
-                with open(arch_path, "r", encoding="utf-8") as f:
-                    arch_data = json.load(f)
-                    meta = arch_data.get("meta", {})
-            except Exception as e:
-                print(f"⚠️ Failed to load metadata for DB update: {e}")
-        
-        repo_data = {
-            "repo_id": repo_id,
-            "url": request.url,
-            "branch": request.branch,
-            "current_sha": current_sha,
-            "meta": meta
-        }
-        db.upsert(repo_data)
-        print(f"💾 Repo State Saved: {repo_id} (SHA: {current_sha})")
-        
+        repo_id = run_ingestion(owner, repo, request.branch, request.url, current_sha, extra_args)
+        forget_repo_state(repo_id)
         return {"status": "success", "repo_id": repo_id}
         
     except Exception as e:
         print(f"❌ Ingestion Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def load_repo_context(repo_id):
+def forget_repo_state(repo_id):
     """
-    Loads the standard artifacts (Repo Map and Dependency Graph) for the Dual-Layer Engine.
+    Drops everything this process holds for a repo after cli_ingest rewrote its
+    index: the query engine, cached answers and the open quantized store.
     """
-    map_file = f"./maps/{repo_id}.txt"
-    graph_file = f"./graphs/{repo_id}.json"
+    QUERY_ENGINE_CACHE.pop(repo_id, None)
+    answer_cache.invalidate(repo_id)
+    chroma_registry.forget_quantized_store(get_quantized_store_path(repo_id))
+
+def build_query_engine(repo_id):
+    """
+    Loads a repo's index and Dual-Layer context and builds its chat engine.
+    Returns (engine, estimated size in bytes) for the engine cache.
+    """
+    index = load_index_for_repo(repo_id)
+    
+    # --- DUAL-LAYER CONTEXT LOADING ---
+    # Map and graph are loaded once; per query only the relevant slices fill the template
+    budgeter = ContextBudgeter.for_repo(repo_id)
+    
+    # Create Custom Prompt Template
+    # {repo_map} and {dependency_graph} are filled per query by the engine's ContextBudgeter
+    
+    qa_template_str = (
+        "You are an AI Architect. \n"
+        "I have provided the relevant parts of the Repo Map and Dependency Graph below to give you global understanding.\n\n"
+        "=== REPO MAP ===\n"
+        "{repo_map}\n\n"
+        "=== DEPENDENCY GRAPH ===\n"
+        "{dependency_graph}\n\n"
+        "---------------------\n"
+        "Context information from specific files is below.\n"
+        "{context_str}\n"
+        "---------------------\n"
+        "Given the global map, graph, and specific context, answer the user question: {query_str}\n\n"
+        "CRITICAL INSTRUCTIONS:\n"
+        "1. TECH STACK: Look at the top of the Repo Map for '--- TECH STACK ---'. Use this to determine the exact frameworks (e.g., Next.js, Tailwind).\n"
+        "2. MERMAID: If asked for diagrams, you MUST use `graph TD` or `graph LR`. Enclose ALL labels in double quotes (e.g., A[\"Login Page\"]). No special chars in Node IDs.\n"
+    )
     
-    repo_map = "(No Repo Map found)"
-    if os.path.exists(map_file):
-        with open(map_file, "r", encoding="utf-8") as f:
-            repo_map = f.read()
+    # Create Template Object
+    text_qa_template = PromptTemplate(qa_template_str)
+    
+    # Setup Engine (hybrid BM25 + vector, auto-merged; over-fetched when a reranker trims it)
+    retriever = create_retriever(index, repo_id, similarity_top_k=retrieval_top_k())
+    
+    # Create Engine with the budgeted prompt and the rerank stage
+    query_engine = BudgetedQueryEngine(
+        retriever, text_qa_template, budgeter, repo_id=repo_id,
+        node_postprocessors=create_node_postprocessors(repo_id, budgeter.section_terms)
+    )
+    
+    query_engine.fallback_index = index 
+    size_bytes = estimate_engine_bytes(
+        repo_id, get_repo_storage_dir(repo_id), index.storage_context.docstore, index.vector_store
+    )
+    return query_engine, size_bytes
+
+# One lock per repo, so concurrent first requests for a cold repo build its engine once.
+# repo_id -> [lock, threads holding or waiting for it]; the entry goes when the last one leaves.
+ENGINE_BUILD_LOCKS = {}
+ENGINE_BUILD_LOCKS_GUARD = threading.Lock()
 
-    dependency_graph = "(No Dependency Graph found)"
-    if os.path.exists(graph_file):
-        with open(graph_file, "r", encoding="utf-8") as f:
-            dependency_graph = f.read()
-            
-    # Truncate graph if excessively large to avoid blowing context (simple safety)
-    if len(dependency_graph) > 50000:
-         dependency_graph = dependency_graph[:50000] + "\n...(truncated)..."
-            
-    return repo_map, dependency_graph
+def load_query_engine(repo_id):
+    """
+    Builds and caches a repo's engine unless another thread already did while
+    this one waited for the repo's build lock. Returns (engine, built).
+    """
+    with ENGINE_BUILD_LOCKS_GUARD:
+        entry = ENGINE_BUILD_LOCKS.setdefault(repo_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            query_engine = QUERY_ENGINE_CACHE.peek(repo_id)
+            if query_engine is not None:
+                return query_engine, False
+            query_engine, size_bytes = build_query_engine(repo_id)
+            QUERY_ENGINE_CACHE.put(repo_id, query_engine, size_bytes)
+            print(f"📦 Loaded query engine for {repo_id} ({size_bytes / 1024 / 1024:.1f} MB).")
+            return query_engine, True
+    finally:
+        with ENGINE_BUILD_LOCKS_GUARD:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del ENGINE_BUILD_LOCKS[repo_id]
+
+def get_query_engine(repo_id):
+    """Returns the cached engine for a repo, loading (and caching) it on a miss."""
+    query_engine = QUERY_ENGINE_CACHE.get(repo_id)
+    if query_engine is None:
+        print(f"📦 Cache miss for {repo_id}. Loading index and contexts...")
+        query_engine, _ = load_query_engine(repo_id)
+    return query_engine
+
+def preload_query_engines(limit):
+    """Loads engines for the most-chatted repos so the first chats after a deploy are warm."""
+    for repo_id in db.most_used(limit):
+        try:
+            _, built = load_query_engine(repo_id)
+            if built:
+                print(f"🔥 Preloaded query engine for {repo_id}.")
+        except Exception as e:
+            print(f"⚠️ Preload failed for {repo_id}: {e}")
+
+def query_embedder(query_engine, query):
+    """
+    Callable that embeds `query` once and keeps the vector on the bundle, so a
+    semantic answer-cache lookup and retrieval share one embedding call. None
+    when retrieval will answer from BM25 alone and never needs the embedding.
+    """
+    if not needs_query_embedding(query_engine.retriever, query.query_str):
+        return None
+    def embed():
+        if query.embedding is None:
+            query.embedding = Settings.embed_model.get_query_embedding(query.query_str)
+        return query.embedding
+    return embed
 
 @app.post("/api/chat")
 def api_chat(request: ChatRequest):
     repo_id = request.repo_id
     
-    query_engine = QUERY_ENGINE_CACHE.get(repo_id)
+    try:
+        query_engine = get_query_engine(repo_id)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Repo {repo_id} not found or load failed: {e}")
+    repo = db.record_chat(repo_id)
     
-    if not query_engine:
-        print(f"📦 Cache miss for {repo_id}. Loading index and contexts...")
-        try:
-            index = load_index_for_repo(repo_id)
-            
-            # --- DUAL-LAYER CONTEXT LOADING ---
-            repo_map, dependency_graph = load_repo_context(repo_id)
-            
-            # Create Custom Prompt Template
-            # We hardcode the map/graph into the template string so LlamaIndex only sees {context_str} and {query_str}
-            # Note: We escape curly braces in the map/graph if any? Ideally yes, but rare in these formats.
-            # Safe approach: replace double braces if needed, but simple string injection is usually ok.
-            
-            qa_template_str = (
-                "You are an AI Architect. \n"
-                "I have provided the Repo Map and Dependency Graph below to give you global understanding.\n\n"
-                "=== REPO MAP ===\n"
-                f"{repo_map}\n\n"
-                "=== DEPENDENCY GRAPH ===\n"
-                f"{dependency_graph}\n\n"
-                "---------------------\n"
-                "Context information from specific files is below.\n"
-                "{context_str}\n"
-                "---------------------\n"
-                "Given the global map, graph, and specific context, answer the user question: {query_str}\n\n"
-                "CRITICAL INSTRUCTIONS:\n"
-                "1. TECH STACK: Look at the top of the Repo Map for '--- TECH STACK ---'. Use this to determine the exact frameworks (e.g., Next.js, Tailwind).\n"
-                "2. MERMAID: If asked for diagrams, you MUST use `graph TD` or `graph LR`. Enclose ALL labels in double quotes (e.g., A[\"Login Page\"]). No special chars in Node IDs.\n"
-            )
-            
-            # Create Template Object
-            text_qa_template = PromptTemplate(qa_template_str)
-            
-            # Setup Engine
-            base_retriever = index.as_retriever(similarity_top_k=10)
-            retriever = AutoMergingRetriever(
-                base_retriever, index.storage_context, verbose=False
-            )
-            
-            # Create Engine and UPDATE PROMPT
-            query_engine = RetrieverQueryEngine.from_args(
-                retriever, 
-                text_qa_template=text_qa_template
-            )
-            
-            query_engine.fallback_index = index 
-            QUERY_ENGINE_CACHE[repo_id] = query_engine
-            
-        except Exception as e:
-            raise HTTPException(status_code=404, detail=f"Repo {repo_id} not found or load failed: {e}")
+    # Answer cache: only for repos with a known SHA, so answers never outlive their code
+    sha = repo.get("current_sha") if repo else None
+    use_cache = answer_cache.enabled and sha not in (None, "unknown")
+    query = QueryBundle(request.message)
     
     try:
-        response = query_engine.query(request.message)
-        return {"response": str(response)}
+        if use_cache:
+            cached, kind = answer_cache.get(
+                repo_id, sha, request.message, embed=query_embedder(query_engine, query)
+            )
+            if cached is not None:
+                return {"response": cached, "cached": kind}
+        response = str(query_engine.query(query))
+        if use_cache:
+            answer_cache.put(repo_id, sha, request.message, response, query.embedding)
+        return {"response": response}
     except Exception as e:
         print(f"⚠️ Primary engine failed: {e}")
         if hasattr(query_engine, 'fallback_index'):
@@ -232,6 +380,206 @@ def api_chat(request: ChatRequest):
                  raise HTTPException(status_code=500, detail=f"Fallback failed: {fe}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(data, event=None):
+    """Formats one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_completion(retrieve, make_synthesizer, query):
+    """Retrieves off the event loop, then yields the completion token by token."""
+    nodes = await run_in_threadpool(retrieve, query)
+    response = await make_synthesizer(query, nodes).asynthesize(query, nodes)
+    async for token in response.async_response_gen():
+        yield token
+
+@app.post("/api/chat/stream")
+async def api_chat_stream(request: ChatRequest):
+    """
+    Same as /api/chat, but streams the answer as Server-Sent Events. Blocking work
+    (engine load, retrieval) runs in the threadpool; the completion is streamed
+    from the LLM's async API, so a slow answer does not hold a server thread.
+    """
+    repo_id = request.repo_id
+    
+    try:
+        query_engine = await run_in_threadpool(get_query_engine, repo_id)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Repo {repo_id} not found or load failed: {e}")
+    repo = await run_in_threadpool(db.record_chat, repo_id)
+    
+    sha = repo.get("current_sha") if repo else None
+    use_cache = answer_cache.enabled and sha not in (None, "unknown")
+    query = QueryBundle(request.message)
+    cached = None
+    if use_cache:
+        try:
+            # Embeds (in the threadpool) only after an exact miss; retrieval reuses the vector
+            cached, kind = await run_in_threadpool(
+                lambda: answer_cache.get(repo_id, sha, request.message, embed=query_embedder(query_engine, query))
+            )
+        except Exception as e:
+            print(f"⚠️ Answer cache lookup failed: {e}")
+        if cached is not None:
+            async def replay():
+                yield sse_event({"token": cached})
+                yield sse_event({"cached": kind}, event="done")
+            return StreamingResponse(replay(), media_type="text/event-stream")
+    
+    async def events():
+        start = time.perf_counter()
+        first_token_ms = None
+        answer = ""
+        try:
+            async for token in stream_completion(
+                query_engine.retrieve,
+                lambda q, nodes: query_engine.synthesizer_for(q, nodes, streaming=True), query
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                answer += token
+                yield sse_event({"token": token})
+        except Exception as e:
+            print(f"⚠️ Primary engine failed: {e}")
+            if answer:
+                # Tokens already went out; switching engines mid-answer would garble it
+                yield sse_event({"detail": str(e)}, event="error")
+                return
+            try:
+                # Fallback logic: plain vector retrieval and the default prompt
+                async for token in stream_completion(
+                    query_engine.fallback_index.as_retriever(similarity_top_k=10).retrieve,
+                    lambda q, nodes: get_response_synthesizer(streaming=True), query
+                ):
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                    yield sse_event({"token": token})
+                yield sse_event({"fallback": True}, event="done")
+            except Exception as fe:
+                yield sse_event({"detail": f"Fallback failed: {fe}"}, event="error")
+            return
+        if use_cache:
+            answer_cache.put(repo_id, sha, request.message, answer, query.embedding)
+        print(
+            f"⏱️ Streamed chat for {repo_id}: first token {first_token_ms or 0:.0f}ms, "
+            f"total {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        yield sse_event({"first_token_ms": round(first_token_ms or 0)}, event="done")
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/api/chat/batch")
+async def api_chat_batch(request: BatchChatRequest):
+    """
+    Answers several questions about one repo. The engine is looked up once, the
+    questions that need a query embedding are embedded in one batched call, and
+    questions identical after normalization are answered once. Questions the
+    answer cache cannot serve are retrieved as one batch, so hits shared between
+    questions have their parents read and merged once; completions then run
+    concurrently (bounded by BATCH_CHAT_CONCURRENCY). Results come back in
+    request order; latency_ms counts from the start of the batch.
+    """
+    repo_id = request.repo_id
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty.")
+    if len(request.questions) > BATCH_CHAT_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_CHAT_MAX_QUESTIONS} questions per batch.")
+    start = time.perf_counter()
+    
+    try:
+        query_engine = await run_in_threadpool(get_query_engine, repo_id)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Repo {repo_id} not found or load failed: {e}")
+    repo = await run_in_threadpool(db.record_chat, repo_id)
+    sha = repo.get("current_sha") if repo else None
+    use_cache = answer_cache.enabled and sha not in (None, "unknown")
+    
+    # Identical questions (after normalization) are answered once
+    unique = list(dict.fromkeys(normalize_question(q) for q in request.questions))
+    first_asked = {}
+    for question in request.questions:
+        first_asked.setdefault(normalize_question(question), question)
+    
+    # Embed up front only what an exact cache hit or the BM25 fast path would not spare
+    to_embed = [
+        key for key in unique
+        if not (use_cache and answer_cache.contains(repo_id, sha, first_asked[key]))
+        and needs_query_embedding(query_engine.retriever, first_asked[key])
+    ]
+    embeddings = {}
+    if to_embed:
+        try:
+            vectors = await run_in_threadpool(embed_queries, Settings.embed_model, [first_asked[key] for key in to_embed])
+            embeddings = dict(zip(to_embed, vectors))
+        except Exception as e:
+            # Each question then embeds on its own, so one bad question cannot fail the batch
+            print(f"⚠️ Batched query embedding failed ({e}); embedding questions one by one.")
+    queries = {key: QueryBundle(first_asked[key], embedding=embeddings.get(key)) for key in unique}
+    
+    semaphore = asyncio.Semaphore(BATCH_CHAT_CONCURRENCY)
+    answers = {}
+    
+    def finish(key, result):
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000)
+        answers[key] = result
+    
+    async def lookup(key):
+        query = queries[key]
+        async with semaphore:
+            try:
+                cached, kind = await run_in_threadpool(
+                    lambda: answer_cache.get(repo_id, sha, query.query_str, query.embedding, query_embedder(query_engine, query))
+                )
+            except Exception as e:
+                print(f"⚠️ Answer cache lookup failed: {e}")
+                return
+        if cached is not None:
+            finish(key, {"response": cached, "cached": kind})
+    
+    if use_cache:
+        await asyncio.gather(*(lookup(key) for key in unique))
+    
+    # Everything the cache did not answer is retrieved in one batch
+    pending = [key for key in unique if key not in answers]
+    retrieved = {}
+    if pending:
+        try:
+            node_lists = await run_in_threadpool(query_engine.retrieve_many, [queries[key] for key in pending])
+            retrieved = dict(zip(pending, node_lists))
+        except Exception as e:
+            print(f"⚠️ Batched retrieval failed ({e}); retrieving questions one by one.")
+    
+    async def answer(key):
+        query = queries[key]
+        async with semaphore:
+            try:
+                nodes = retrieved.get(key)
+                if nodes is None:
+                    nodes = await run_in_threadpool(query_engine.retrieve, query)
+                response = str(await query_engine.synthesizer_for(query, nodes).asynthesize(query, nodes))
+                if use_cache:
+                    answer_cache.put(repo_id, sha, query.query_str, response, query.embedding)
+                result = {"response": response}
+            except Exception as e:
+                print(f"⚠️ Primary engine failed for '{query.query_str[:60]}': {e}")
+                try:
+                    fallback_engine = query_engine.fallback_index.as_query_engine(similarity_top_k=10)
+                    result = {"response": str(await fallback_engine.aquery(query)), "fallback": True}
+                except Exception as fe:
+                    result = {"error": f"Fallback failed: {fe}"}
+        finish(key, result)
+    
+    await asyncio.gather(*(answer(key) for key in pending))
+    total_ms = round((time.perf_counter() - start) * 1000)
+    print(
+        f"📦 Batch chat for {repo_id}: {len(request.questions)} questions ({len(unique)} unique, "
+        f"{len(unique) - len(pending)} cached) in {total_ms}ms"
+    )
+    return {
+        "repo_id": repo_id,
+        "results": [{"question": q, **answers[normalize_question(q)]} for q in request.questions],
+        "total_ms": total_ms,
+    }
+
 @app.get("/api/architecture/{repo_id}")
 def get_architecture(repo_id: str):
     file_path = f"./architectures/{repo_id}.json"
@@ -366,6 +714,50 @@ def audit_updates(repo_id: str):
         "audit_report": report
     }
 
+@app.post("/api/updates/sync/{repo_id}")
+def sync_updates(repo_id: str):
+    """
+    Brings the local twin up to the remote HEAD by re-indexing only the files
+    changed since the recorded SHA, then advances current_sha in RepoDB.
+    """
+    repo = db.get(repo_id)
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repo not found.")
+        
+    local_sha = repo.get("current_sha")
+    branch = repo.get("branch")
+    
+    url = repo.get("url", "")
+    try:
+        parts = url.rstrip("/").split("/")
+        repo_name = parts[-1]
+        owner_str = parts[-2]
+    except:
+        raise HTTPException(status_code=400, detail="Invalid Repo URL in DB.")
+        
+    gh = GithubService()
+    remote_sha = gh.get_current_sha(owner_str, repo_name, branch)
+    if not remote_sha:
+        raise HTTPException(status_code=500, detail="Failed to fetch remote SHA.")
+        
+    if local_sha == remote_sha:
+        return {"status": "UP_TO_DATE", "repo_id": repo_id, "current_sha": local_sha}
+        
+    extra_args = []
+    if local_sha and local_sha != "unknown":
+        extra_args = ["--base-sha", local_sha, "--head-sha", remote_sha]
+        
+    try:
+        run_ingestion(owner_str, repo_name, branch, url, remote_sha, extra_args)
+    except Exception as e:
+        print(f"❌ Sync Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+        
+    # Drop the stale engine so the next chat reloads the updated index
+    forget_repo_state(repo_id)
+    
+    return {"status": "UPDATED", "repo_id": repo_id, "previous_sha": local_sha, "current_sha": remote_sha}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
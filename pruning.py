@@ -0,0 +1,149 @@
+import os
+import re
+import math
+import fnmatch
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Size cap applied from the tree `size` field, before anything is downloaded
+MAX_FILE_BYTES = int(os.getenv("PRUNE_MAX_FILE_KB", 512)) * 1024
+# Tighter cap for data files (fixtures, dumps), which chunk into many low-value leaves
+MAX_DATA_FILE_BYTES = int(os.getenv("PRUNE_MAX_DATA_FILE_KB", 128)) * 1024
+DATA_SUFFIXES = (".json", ".txt")
+# Content heuristics applied after download
+MAX_LINE_LENGTH = int(os.getenv("PRUNE_MAX_LINE_LENGTH", 1000))
+MAX_AVG_LINE_LENGTH = int(os.getenv("PRUNE_MAX_AVG_LINE_LENGTH", 200))
+MAX_ENTROPY = float(os.getenv("PRUNE_MAX_ENTROPY", 5.9))
+
+# Chars per leaf chunk (128 tokens at ~4 chars/token), used to estimate embedding savings
+CHARS_PER_LEAF = 128 * 4
+
+GENERATED_SUFFIXES = (".min.js", ".min.css", ".bundle.js", ".chunk.js", ".map")
+GENERATED_DIRS = ("dist/", "build/", "vendor/", "generated/", "__generated__/", ".next/", "out/")
+# Only in a comment line, so code that merely mentions these phrases is kept
+GENERATED_MARKERS = re.compile(
+    r"^\s*(?://|#|/?\*|<!--).*(?:@generated|DO NOT EDIT|[Aa]uto-?generated|Code generated by|This file was automatically generated)",
+    re.MULTILINE
+)
+
+def shannon_entropy(text):
+    """Bits per character; ~4.5 for source code, ~6 for base64/minified blobs."""
+    if not text:
+        return 0.0
+    counts = Counter(text)
+    total = len(text)
+    return -sum(c / total * math.log2(c / total) for c in counts.values())
+
+def parse_gitattributes(text):
+    """
+    Returns [(pattern, generated_bool)] for linguist-generated / linguist-vendored
+    attributes in a .gitattributes file. Later lines win, as in git.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        pattern, attrs = parts[0], parts[1:]
+        for attr in attrs:
+            name, _, value = attr.lstrip("-!").partition("=")
+            if name not in ("linguist-generated", "linguist-vendored"):
+                continue
+            generated = not attr.startswith(("-", "!")) and value.lower() not in ("false", "0")
+            rules.append((pattern, generated))
+    return rules
+
+def _gitattributes_match(pattern, path):
+    pattern = pattern.lstrip("/")
+    if pattern.endswith("/"):
+        pattern += "**"
+    if "/" not in pattern:
+        # No slash: matches the basename at any depth
+        return fnmatch.fnmatch(path.split("/")[-1], pattern)
+    return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path, pattern.replace("/**/", "/"))
+
+class FilePruner:
+    """
+    Drops files that are not worth embedding: oversized (from the tree size, before
+    download), minified, high-entropy, generated (markers, paths, or
+    `.gitattributes linguist-generated`). Keeps a report of what was skipped.
+    """
+
+    def __init__(self, gitattributes_text=None):
+        self.rules = parse_gitattributes(gitattributes_text) if gitattributes_text else []
+        self.skipped = []  # (path, reason, size_bytes)
+
+    def load_gitattributes(self, text):
+        self.rules = parse_gitattributes(text)
+
+    def _linguist_generated(self, path):
+        generated = False
+        for pattern, value in self.rules:
+            if _gitattributes_match(pattern, path):
+                generated = value
+        return generated
+
+    def _skip(self, path, reason, size):
+        self.skipped.append((path, reason, size))
+        return reason
+
+    def check_entry(self, path, size=None):
+        """
+        Pre-download check from path and tree size. Returns a skip reason or None.
+        """
+        if size is not None:
+            limit = MAX_DATA_FILE_BYTES if path.endswith(DATA_SUFFIXES) else MAX_FILE_BYTES
+            if size > limit:
+                return self._skip(path, f"size {size / 1024:.0f} KB > {limit // 1024} KB", size)
+        if path.endswith(GENERATED_SUFFIXES):
+            return self._skip(path, "minified/bundled file", size or 0)
+        if path.startswith(GENERATED_DIRS) or any(f"/{d}" in path for d in GENERATED_DIRS):
+            return self._skip(path, "generated/vendored directory", size or 0)
+        if self._linguist_generated(path):
+            return self._skip(path, ".gitattributes linguist-generated", size or 0)
+        return None
+
+    def check_content(self, path, text):
+        """Post-download content heuristics. Returns a skip reason or None."""
+        size = len(text)
+        if not text.strip():
+            return self._skip(path, "empty file", size)
+        if GENERATED_MARKERS.search(text[:2048]):
+            return self._skip(path, "generated-file marker", size)
+
+        lines = text.splitlines() or [text]
+        longest = max(len(line) for line in lines)
+        if longest > MAX_LINE_LENGTH and size / len(lines) > MAX_AVG_LINE_LENGTH:
+            return self._skip(path, f"minified (avg line {size / len(lines):.0f} chars)", size)
+
+        # Entropy of a bounded sample is enough to spot base64/packed payloads.
+        # Only for mostly-ASCII text: non-Latin prose is naturally high-entropy.
+        sample = text[:65536]
+        if sum(1 for c in sample if ord(c) < 128) > 0.95 * len(sample):
+            entropy = shannon_entropy(sample)
+            if entropy > MAX_ENTROPY:
+                return self._skip(path, f"high entropy ({entropy:.2f} bits/char)", size)
+        return None
+
+    def filter_documents(self, documents):
+        """Yields only the Documents that pass the content checks."""
+        for doc in documents:
+            if self.check_content(doc.metadata.get("file_path", "unknown"), doc.text) is None:
+                yield doc
+
+    def report(self, embed_batch_size=100):
+        """Prints every skipped file and the estimated embedding calls saved."""
+        if not self.skipped:
+            print("✂️ Pruning: no files skipped.")
+            return
+        total_bytes = sum(size for _, _, size in self.skipped)
+        leaves_saved = sum(math.ceil(size / CHARS_PER_LEAF) for _, _, size in self.skipped)
+        print(
+            f"✂️ Pruned {len(self.skipped)} files ({total_bytes / 1024 / 1024:.2f} MB) before embedding: "
+            f"~{leaves_saved} leaf embeddings (~{math.ceil(leaves_saved / embed_batch_size)} batched calls) saved."
+        )
+        for path, reason, size in self.skipped:
+            print(f"   ✂️ {path} ({size / 1024:.1f} KB): {reason}")
@@ -0,0 +1,188 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+load_dotenv()
+
+# Candidates scored with int8 codes per requested result, then re-scored in full precision
+RESCORE_FACTOR = int(os.getenv("QUANTIZED_RESCORE_FACTOR", 4))
+# Rows per block when scanning int8 codes, bounding the float32 scratch space of a query
+SCAN_BLOCK_ROWS = 16384
+
+def quantize_int8(vectors):
+    """
+    Symmetric per-vector int8 scalar quantization of L2-normalized vectors.
+    Returns (codes int8 [n, d], scales float32 [n]); codes * scale ~= unit vector.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.maximum(norms, 1e-12)
+    scales = np.maximum(np.abs(unit).max(axis=1), 1e-12) / 127.0
+    codes = np.clip(np.rint(unit / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def int8_scores(codes, scales, query):
+    """Approximate cosine similarity of a unit query against int8 codes, scanned in blocks."""
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+        block = codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+        scores[start:start + SCAN_BLOCK_ROWS] = (block @ query) * scales[start:start + SCAN_BLOCK_ROWS]
+    return scores
+
+class QuantizedVectorStore(BasePydanticVectorStore):
+    """
+    Vector store that keeps only int8 codes (~4x smaller than float32) in memory.
+    Full-precision vectors, text and metadata live in one SQLite file on disk and
+    are read only for the top `k * rescore_factor` candidates, which are re-scored
+    exactly (cosine) before the top k are returned.
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = True
+
+    db_path: str
+    rescore_factor: int = RESCORE_FACTOR
+
+    _conn: Any = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _codes: Any = PrivateAttr(default=None)
+    _scales: Any = PrivateAttr(default=None)
+    _rows: Any = PrivateAttr(default=None)
+
+    def __init__(self, db_path: str, rescore_factor: Optional[int] = None, **kwargs: Any) -> None:
+        super().__init__(db_path=db_path, rescore_factor=rescore_factor or RESCORE_FACTOR, **kwargs)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " row INTEGER PRIMARY KEY AUTOINCREMENT, node_id TEXT UNIQUE NOT NULL,"
+            " ref_doc_id TEXT, file_path TEXT, metadata TEXT NOT NULL, text TEXT NOT NULL,"
+            " vector BLOB NOT NULL, code BLOB NOT NULL, scale REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_file_path ON vectors(file_path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_ref_doc ON vectors(ref_doc_id)")
+        self._conn.commit()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "QuantizedVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return self._conn
+
+    # --- in-memory code matrix (rebuilt lazily after writes) ---
+    def _invalidate(self):
+        self._codes = self._scales = self._rows = None
+
+    def _load_codes(self):
+        if self._codes is not None:
+            return
+        rows, codes, scales = [], [], []
+        for row, code, scale in self._conn.execute("SELECT row, code, scale FROM vectors ORDER BY row"):
+            rows.append(row)
+            codes.append(np.frombuffer(code, dtype=np.int8))
+            scales.append(scale)
+        self._rows = np.array(rows, dtype=np.int64)
+        self._codes = np.vstack(codes) if codes else np.zeros((0, 0), dtype=np.int8)
+        self._scales = np.array(scales, dtype=np.float32)
+
+    def memory_bytes(self):
+        """Resident size of the in-memory codes, for reporting."""
+        with self._lock:
+            self._load_codes()
+            return self._codes.nbytes + self._scales.nbytes + self._rows.nbytes
+
+    # --- writes ---
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = np.array([node.get_embedding() for node in nodes], dtype=np.float32)
+        codes, scales = quantize_int8(vectors)
+        rows = []
+        for node, vector, code, scale in zip(nodes, vectors, codes, scales):
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=self.flat_metadata)
+            rows.append((
+                node.node_id, node.ref_doc_id, node.metadata.get("file_path"), json.dumps(metadata),
+                node.get_content(), vector.tobytes(), code.tobytes(), float(scale)
+            ))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (node_id, ref_doc_id, file_path, metadata, text, vector, code, scale)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._invalidate()
+        return [node.node_id for node in nodes]
+
+    def _delete_where(self, clause, params):
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM vectors WHERE {clause}", params)
+            self._conn.commit()
+            self._invalidate()
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._delete_where("ref_doc_id = ?", [(ref_doc_id,)])
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Any = None, **kwargs: Any) -> None:
+        if filters is not None:
+            raise NotImplementedError("QuantizedVectorStore only deletes by node id, ref doc or file path.")
+        self._delete_where("node_id = ?", [(node_id,) for node_id in node_ids or []])
+
+    def delete_file_paths(self, file_paths):
+        self._delete_where("file_path = ?", [(path,) for path in file_paths])
+
+    def clear(self) -> None:
+        self._delete_where("1 = 1", [()])
+
+    # --- search ---
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise NotImplementedError("QuantizedVectorStore does not support metadata filters.")
+        top_k = query.similarity_top_k
+        q = np.asarray(query.query_embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+        with self._lock:
+            self._load_codes()
+            if not len(self._rows):
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            approx = int8_scores(self._codes, self._scales, q)
+            n_candidates = min(len(approx), top_k * self.rescore_factor)
+            candidates = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+            candidate_rows = [int(r) for r in self._rows[candidates]]
+            placeholders = ",".join("?" * len(candidate_rows))
+            records = self._conn.execute(
+                f"SELECT node_id, metadata, text, vector FROM vectors WHERE row IN ({placeholders})",
+                candidate_rows
+            ).fetchall()
+
+        # Exact cosine on full-precision vectors for the shortlist only
+        vectors = np.array([np.frombuffer(r[3], dtype=np.float32) for r in records])
+        exact = (vectors @ q) / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+        order = np.argsort(-exact)[:top_k]
+
+        nodes, similarities, ids = [], [], []
+        for i in order:
+            node_id, metadata, text, _ = records[i]
+            node = metadata_dict_to_node(json.loads(metadata), text=text)
+            nodes.append(node)
+            similarities.append(float(exact[i]))
+            ids.append(node_id)
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
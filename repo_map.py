@@ -0,0 +1,430 @@
+import os
+import re
+import ast
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+# Kept free of llama_index imports: map workers are spawned processes and import only this module
+
+load_dotenv()
+
+# Bump when extraction output changes, so cached sections of the old format are ignored
+EXTRACTOR_VERSION = 3
+# Signatures longer than this are cut (multi-line signatures are joined onto one line first)
+MAP_SIGNATURE_MAX_CHARS = 120
+
+# File selection shared by every ingestion source
+ALLOWED_EXTS = (".py", ".js", ".jsx", ".ts", ".tsx", ".md", ".json", ".css", ".html", ".txt")
+
+PYTHON_EXTS = (".py",)
+SCRIPT_EXTS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+
+# Line-based fallback for other files, and for sources the parsers reject
+REPO_MAP_PATTERN = re.compile('|'.join([
+    r'^\s*(import\s+.+)',
+    r'^\s*(from\s+.+\s+import\s+.+)',
+    r'^\s*(class\s+\w+)',
+    r'^\s*(def\s+\w+)',
+    r'^\s*(async\s+def\s+\w+)',
+    r'^\s*(function\s+\w+)',
+    r'^\s*(export\s+.+)',
+    r'^\s*(interface\s+\w+)',
+]), re.MULTILINE)
+
+def _clip(signature):
+    """Joins a (possibly multi-line) signature onto one line and caps its length."""
+    signature = re.sub(r"\s+", " ", signature).strip()
+    # Multi-line argument and import lists leave padding and trailing commas behind
+    signature = re.sub(r"([(\[]) ", r"\1", signature)
+    signature = re.sub(r",? ([)\]])", r"\1", signature)
+    signature = re.sub(r", }", " }", signature)
+    if len(signature) > MAP_SIGNATURE_MAX_CHARS:
+        signature = signature[:MAP_SIGNATURE_MAX_CHARS - 3] + "..."
+    return signature
+
+def regex_signatures(text):
+    signatures = []
+    for match_tuple in REPO_MAP_PATTERN.findall(text):
+        # findall returns tuple of groups, filter empty
+        signature = next((m for m in match_tuple if m), "")
+        if signature.strip():
+            signatures.append((0, _clip(signature)))
+    return signatures
+
+# --- Python (stdlib ast) ---
+
+def _python_function(node):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+def _python_class(node):
+    bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(keyword) for keyword in node.keywords]
+    return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+
+def python_signatures(text):
+    """Imports, classes with their methods, and functions with full argument lists; raises SyntaxError."""
+    signatures = []
+    for node in ast.parse(text).body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            signatures.append((0, _clip(ast.unparse(node))))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            signatures.append((0, _clip(_python_function(node))))
+        elif isinstance(node, ast.ClassDef):
+            signatures.append((0, _clip(_python_class(node))))
+            for member in node.body:
+                if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    signatures.append((1, _clip(_python_function(member))))
+                elif isinstance(member, ast.ClassDef):
+                    signatures.append((1, _clip(_python_class(member))))
+    return signatures
+
+# --- JavaScript / TypeScript (statement scanner) ---
+
+_SCRIPT_DECLARATION = re.compile(
+    r"^(export\s+)?(default\s+)?(declare\s+)?(abstract\s+)?(async\s+)?"
+    r"(function\b|class\b|interface\b|enum\b|const\s+enum\b|namespace\s|module\s)"
+)
+_SCRIPT_CLASS = re.compile(r"^(export\s+)?(default\s+)?(declare\s+)?(abstract\s+)?class\b")
+_SCRIPT_ARROW = re.compile(
+    r"^(export\s+)?(const|let|var)\s+[\w$]+\s*(:[^=]+)?=\s*(async\s+)?"
+    r"(function\b|(<[^>]*>\s*)?\([^)]*\)\s*(:[^=]+)?=>|[\w$]+\s*=>)"
+)
+_SCRIPT_TYPE = re.compile(r"^(export\s+)?(declare\s+)?type\s+[\w$]+")
+_SCRIPT_EXPORTED_VALUE = re.compile(r"^(export\s+(?:declare\s+)?(?:const|let|var)\s+[\w$]+)")
+# `import {`, `import type {`, `import React, {`, `export {`: the brace opens a name list, not a body
+_SCRIPT_NAME_LIST = re.compile(r"^(import|export)(\s+type)?(\s+[\w$]+\s*,)?$")
+_SCRIPT_MEMBER = re.compile(
+    r"^(?:(?:public|private|protected|static|readonly|abstract|async|override|declare|get|set)\s+)*\*?\s*"
+    r"([#\w$]+)\s*\??\s*(?:<[^>]*>\s*)?(?:\(|(?::[^=]+)?=\s*(?:async\s+)?(?:\([^)]*\)|[\w$]+)\s*(?::[^=]+)?=>)"
+)
+_SCRIPT_DECORATORS = re.compile(r"^(@[\w$.]+(\([^)]*\))?\s*)+")
+_SCRIPT_CONTROL = {"if", "for", "while", "switch", "catch", "return", "super"}
+# A line break does not end a statement when its line ends, or the next one starts, with one of these
+_SCRIPT_OPEN_ENDINGS = ("=>", "=", ",", "(", "|", "&", ":", "?", "+", "-", "<", "extends", "implements")
+_SCRIPT_CONTINUATION = re.compile(r"^([.,?:=&|+\-*/%<>{(\[]|extends\b|implements\b|from\b|as\b)")
+
+# A quote or slash after one of these words starts a string or regex, not JSX text or a division
+_SCRIPT_EXPRESSION_KEYWORDS = {
+    "return", "typeof", "case", "in", "of", "instanceof", "void", "delete", "throw", "yield", "await",
+    "else", "do", "new", "import", "from", "export", "default", "extends",
+}
+
+def _follows_value(code, i, closers):
+    """
+    True when the last token before position i ends a value (an identifier,
+    number or one of `closers`), i.e. i is not where an expression can start.
+    """
+    j = i - 1
+    while j >= 0 and code[j].isspace():
+        j -= 1
+    if j < 0:
+        return False
+    c = code[j]
+    if c in closers:
+        return not (c == ">" and j > 0 and code[j - 1] == "=")  # `=>` opens an expression
+    if not (c.isalnum() or c in "_$"):
+        return False
+    k = j
+    while k > 0 and (code[k - 1].isalnum() or code[k - 1] in "_$"):
+        k -= 1
+    return "".join(code[k:j + 1]) not in _SCRIPT_EXPRESSION_KEYWORDS
+
+def _regex_end(text, i):
+    """End of the regex literal starting at the slash at i, or None if the line ends first."""
+    j, n, in_class = i + 1, len(text), False
+    while j < n and text[j] != "\n":
+        c = text[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            return j + 1
+        j += 1
+    return None
+
+def _mask_script(text):
+    """
+    Returns (code, structure), both the length of `text`: `code` has comments
+    blanked, `structure` additionally blanks string, template and regex
+    contents, so brackets can be counted on it while signatures are cut from `code`.
+    A quote right after a value (`it's` in JSX text) is text, not a string; a
+    slash starts a regex only where an expression can start (so not `</div>`).
+    """
+    code, structure = list(text), list(text)
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            end = n if end == -1 else end
+        elif c == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+        elif c == "/" and not _follows_value(code, i, ")]}<>"):
+            end = _regex_end(text, i)
+            if end is None:
+                i += 1
+                continue
+            for j in range(i + 1, end - 1):
+                structure[j] = " "
+            i = end
+            continue
+        elif c == "`" or (c in "'\"" and not _follows_value(code, i, ")]}")):
+            end = i + 1
+            while end < n and text[end] != c:
+                # Plain quotes end at the line break, so a stray quote cannot swallow the file
+                if text[end] == "\n" and c != "`":
+                    break
+                end += 2 if text[end] == "\\" else 1
+            for j in range(i + 1, min(end, n)):
+                if text[j] != "\n":
+                    structure[j] = " "
+            i = end + 1
+            continue
+        else:
+            i += 1
+            continue
+        for j in range(i, end):
+            if text[j] != "\n":
+                code[j] = structure[j] = " "
+        i = end
+    return "".join(code), "".join(structure)
+
+def _classify_script(head, in_class):
+    """The signature a statement head declares, or None for anything else."""
+    head = _SCRIPT_DECORATORS.sub("", re.sub(r"\s+", " ", head).strip())
+    if not head:
+        return None
+    if in_class:
+        match = _SCRIPT_MEMBER.match(head)
+        if match and match.group(1) not in _SCRIPT_CONTROL:
+            return head.rstrip("{;=: ")
+        return None
+    if re.match(r"^import\b", head) or re.match(r"^export\s*(type\s*)?(\{|\*)", head):
+        return head.rstrip("; ")
+    if _SCRIPT_DECLARATION.match(head) or _SCRIPT_ARROW.match(head) or _SCRIPT_TYPE.match(head):
+        return head.rstrip("{;=: ")
+    match = _SCRIPT_EXPORTED_VALUE.match(head)
+    if match:
+        return match.group(1)
+    if head.startswith("export default"):
+        return head.rstrip("; ")
+    return None
+
+def _ends_statement(head, rest):
+    """Automatic semicolon insertion, roughly: does the line break after `head` end its statement?"""
+    if head.endswith(_SCRIPT_OPEN_ENDINGS):
+        return False
+    following = rest.lstrip()
+    return not following or not _SCRIPT_CONTINUATION.match(following)
+
+def script_signatures(text):
+    """
+    Top-level imports, exports and declarations of a JS/TS source, plus class
+    members, with multi-line heads (argument lists, import lists) joined.
+    Raises SyntaxError when brackets do not balance, so the caller falls back.
+    """
+    code, structure = _mask_script(text)
+    signatures = []
+    depth = 0  # braces
+    nesting = 0  # parentheses and square brackets
+    collected = {0: False}  # brace depths whose statements are collected -> is a class body
+    name_list = None  # depth of an open `import {`/`export {` name list
+    head_start = 0
+
+    def emit(end, in_class):
+        signature = _classify_script(code[head_start:end], in_class)
+        if signature:
+            signatures.append((1 if in_class else 0, _clip(signature)))
+
+    for i, c in enumerate(structure):
+        collecting = depth in collected and name_list is None and nesting == 0
+        if c in "([":
+            nesting += 1
+        elif c in ")]":
+            nesting -= 1
+        elif c == "{":
+            if collecting:
+                head = re.sub(r"\s+", " ", code[head_start:i]).strip()
+                if _SCRIPT_NAME_LIST.match(head):
+                    name_list = depth
+                else:
+                    emit(i, collected[depth])
+                    if not collected[depth] and _SCRIPT_CLASS.match(head):
+                        collected[depth + 1] = True
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth < 0:
+                raise SyntaxError("unbalanced braces")
+            collected.pop(depth + 1, None)
+            if name_list == depth:
+                name_list = None
+            elif depth in collected and name_list is None and nesting == 0:
+                head_start = i + 1
+        elif c == ";" and collecting:
+            emit(i, collected[depth])
+            head_start = i + 1
+        elif c == "\n" and collecting:
+            head = code[head_start:i].strip()
+            if not head:
+                head_start = i + 1
+            elif _ends_statement(head, code[i + 1:i + 200]):
+                emit(i, collected[depth])
+                head_start = i + 1
+    if depth != 0 or nesting != 0:
+        raise SyntaxError("unbalanced brackets")
+    if name_list is None:
+        emit(len(code), collected[0])
+    return signatures
+
+def extract_signatures(path, text):
+    """Returns ([(indent level, signature)], method) with method 'python', 'script' or 'regex'."""
+    try:
+        if path.endswith(PYTHON_EXTS):
+            return python_signatures(text), "python"
+        if path.endswith(SCRIPT_EXTS):
+            return script_signatures(text), "script"
+    except (SyntaxError, ValueError, RecursionError):
+        pass
+    return regex_signatures(text), "regex"
+
+def extract_shard(items):
+    """Pool worker: extracts signatures for a shard of (path, text) pairs."""
+    return [extract_signatures(path, text) for path, text in items]
+
+def format_section(path, signatures):
+    """Repo map lines of one file: its header and one line per signature."""
+    lines = [f"\n📄 File: {path}"]
+    for level, signature in signatures:
+        lines.append(f"{'    ' * level}  └─ {signature}")
+    if not signatures:
+        lines.append("  (No signatures found)")
+    return lines
+
+def assemble_repo_map(tech_stack_header, sections):
+    """Joins the tech stack header and per-file sections into the final map text."""
+    map_lines = [line for section in sections for line in section]
+
+    # Prepend Tech Stack if found
+    if tech_stack_header:
+        return "\n".join(tech_stack_header) + "\n" + "\n".join(map_lines)
+    return "\n".join(map_lines)
+
+def split_repo_map(map_text):
+    """
+    Parses a saved repo map back into (tech_stack_header_lines, {file_path: section_lines}),
+    the inverse of assemble_repo_map.
+    """
+    header = []
+    sections = {}
+    current = None
+    for line in map_text.split("\n"):
+        if line.startswith("📄 File: "):
+            current = line[len("📄 File: "):]
+            sections[current] = [f"\n{line}"]
+        elif current is None:
+            header.append(line)
+        elif line:
+            sections[current].append(line)
+    # Drop the blank separator line before the first section
+    while header and not header[-1]:
+        header.pop()
+    return header, sections
+
+def section_key(path, text):
+    """Cache key of a file's section: extractor version, parser for its extension, git blob SHA of its content."""
+    data = text.encode("utf-8")
+    blob_sha = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+    parser = "python" if path.endswith(PYTHON_EXTS) else "script" if path.endswith(SCRIPT_EXTS) else "regex"
+    return f"{EXTRACTOR_VERSION}:{parser}:{blob_sha}"
+
+class MapSectionCache:
+    """
+    Persistent SQLite cache of extracted signatures keyed by section_key, so
+    files whose blob is unchanged are not parsed again on the next ingest.
+    prune() drops sections not used for REPO_MAP_CACHE_MAX_AGE_DAYS, then the
+    least recently used ones beyond REPO_MAP_CACHE_MAX_ENTRIES. Thread-safe.
+    """
+
+    def __init__(self, db_path=None, max_age_days=None, max_entries=None):
+        self.db_path = db_path or os.getenv("REPO_MAP_CACHE_PATH", "./map_cache/sections.sqlite3")
+        self.max_age_days = max_age_days if max_age_days is not None else float(os.getenv("REPO_MAP_CACHE_MAX_AGE_DAYS", 30))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("REPO_MAP_CACHE_MAX_ENTRIES", 200000))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._touched = set()  # keys read since the last prune; their last_used is written in one go
+
+    def _connect(self):
+        """Opens the database once; callers hold the lock."""
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            "key TEXT PRIMARY KEY, signatures TEXT NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+        )
+        if "last_used" not in [row[1] for row in conn.execute("PRAGMA table_info(sections)")]:
+            conn.execute("ALTER TABLE sections ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sections_last_used ON sections(last_used)")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def get(self, key):
+        """Returns the cached [(level, signature)] for a key, or None."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT signatures FROM sections WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched.add(key)
+            return [tuple(item) for item in json.loads(row[0])]
+
+    def put_many(self, entries):
+        """Stores (key, signatures) pairs."""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO sections (key, signatures, last_used) VALUES (?, ?, ?)",
+                [(key, json.dumps(signatures), now) for key, signatures in entries]
+            )
+            conn.commit()
+
+    def prune(self):
+        """Records pending reads, then evicts stale and excess sections. Returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            touched, self._touched = list(self._touched), set()
+            conn.executemany("UPDATE sections SET last_used = ? WHERE key = ?", [(now, key) for key in touched])
+            removed = conn.execute(
+                "DELETE FROM sections WHERE last_used < ?", (now - self.max_age_days * 86400,)
+            ).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM sections").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM sections WHERE key IN (SELECT key FROM sections ORDER BY last_used LIMIT ?)", (excess,)
+                ).rowcount
+            conn.commit()
+        return removed
+
+# Singleton instance
+map_section_cache = MapSectionCache()
@@ -0,0 +1,120 @@
+import os
+import re
+import math
+from typing import Dict, List, Optional, Set
+from dotenv import load_dotenv
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from lexical_index import tokenize, count_tokens, is_code_symbol, IDENTIFIER_PATTERN
+
+load_dotenv()
+
+# 'local' reranks over-fetched candidates on CPU; 'none' passes retrieval through
+RERANKER = os.getenv("RERANKER", "local")
+# Candidates retrieved per question, and how many of them reach the LLM after reranking
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 30))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 6))
+# Token savings are reported against what reached the LLM before reranking: the top 10 hits
+BASELINE_TOP_K = 10
+
+# Feature weights of the local scorer
+WEIGHT_RETRIEVAL = 0.35
+WEIGHT_LEXICAL = 0.35
+WEIGHT_SYMBOL = 0.2
+WEIGHT_PATH = 0.1
+# BM25-style length normalization, so merged parent chunks don't win on size alone
+LENGTH_NORM_B = 0.5
+# Subtracted for tests, docs and lockfile-like paths unless the question asks about them
+LOW_PRIOR_PENALTY = 0.15
+LOW_PRIOR_PATH = re.compile(r"(^|/)(tests?|__tests__|spec|docs?|examples?|fixtures?)/|\.(md|txt|json)$|\.(test|spec)\.")
+LOW_PRIOR_QUESTION_TERMS = {"test", "tests", "spec", "doc", "docs", "readme", "example", "config", "json", "fixture"}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "me", "of", "on", "or", "show", "that", "the", "this", "to", "what", "when", "where",
+    "which", "who", "why", "with", "explain", "describe", "work", "works", "used", "use",
+}
+
+class LocalReranker(BaseNodePostprocessor):
+    """
+    CPU-only reranker for over-fetched candidates. Each node is scored on its
+    retrieval rank, IDF-weighted term overlap with the question, question
+    symbols defined in its file per the repo map, and path priors. Only the
+    `top_n` best are passed on to synthesis.
+    """
+
+    top_n: int = Field(default=RERANK_TOP_N)
+    repo_id: str = Field(default="")
+    # file_path -> terms of its repo map section (symbols and path parts); shared, not validated/copied
+    _symbol_terms: Dict[str, Set[str]] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, symbol_terms=None, **kwargs):
+        super().__init__(**kwargs)
+        self._symbol_terms = symbol_terms or {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalReranker"
+
+    def _postprocess_nodes(self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None) -> List[NodeWithScore]:
+        if query_bundle is None or len(nodes) <= self.top_n:
+            return nodes
+        question = query_bundle.query_str
+        question_terms = {t for t in tokenize(question) if t not in STOPWORDS}
+        question_symbols = {s.lower() for s in IDENTIFIER_PATTERN.findall(question) if is_code_symbol(s)}
+        wants_low_prior = bool(question_terms & LOW_PRIOR_QUESTION_TERMS)
+
+        node_tokens = [tokenize(n.node.get_content(metadata_mode=MetadataMode.NONE)) for n in nodes]
+        node_terms = [set(tokens) for tokens in node_tokens]
+        avg_length = sum(len(tokens) for tokens in node_tokens) / len(nodes) or 1.0
+        idf = {
+            term: math.log(1 + len(nodes) / (1 + sum(term in terms for terms in node_terms)))
+            for term in question_terms
+        }
+        total_idf = sum(idf.values()) or 1.0
+
+        scored = []
+        for rank, (result, tokens, terms) in enumerate(zip(nodes, node_tokens, node_terms)):
+            path = result.node.metadata.get("file_path", "")
+            file_terms = self._symbol_terms.get(path, set())
+            path_terms = set(tokenize(path))
+            length_norm = 1 - LENGTH_NORM_B + LENGTH_NORM_B * len(tokens) / avg_length
+            lexical = sum(idf[t] for t in question_terms & terms) / total_idf / length_norm
+            # Code symbols named in the question, else any question term, found in the file's map section
+            wanted = question_symbols or question_terms
+            symbol = len(wanted & file_terms) / len(wanted) if wanted else 0.0
+            path_match = 1.0 if question_terms & path_terms else 0.0
+            score = (
+                WEIGHT_RETRIEVAL / (rank + 1)
+                + WEIGHT_LEXICAL * lexical
+                + WEIGHT_SYMBOL * symbol
+                + WEIGHT_PATH * path_match
+            )
+            if not wants_low_prior and LOW_PRIOR_PATH.search(path):
+                score -= LOW_PRIOR_PENALTY
+            scored.append((score, rank, result))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        kept = [NodeWithScore(node=result.node, score=score) for score, _, result in scored[:self.top_n]]
+        baseline = sum(count_tokens(n.node.get_content(metadata_mode=MetadataMode.LLM)) for n in nodes[:BASELINE_TOP_K])
+        after = sum(count_tokens(n.node.get_content(metadata_mode=MetadataMode.LLM)) for n in kept)
+        print(
+            f"🎯 Rerank ({self.repo_id}): kept {len(kept)}/{len(nodes)} candidates, {after} context tokens "
+            f"vs {baseline} for the top {BASELINE_TOP_K} by retrieval ({1 - after / max(baseline, 1):.0%} saved)"
+        )
+        return kept
+
+def create_node_postprocessors(repo_id, symbol_terms=None):
+    """Rerank stage selected by RERANKER, as a list for RetrieverQueryEngine."""
+    if RERANKER == "none":
+        return []
+    if RERANKER != "local":
+        raise ValueError(f"Unknown RERANKER '{RERANKER}'. Use 'local' or 'none'.")
+    return [LocalReranker(top_n=RERANK_TOP_N, symbol_terms=symbol_terms or {}, repo_id=repo_id)]
+
+def retrieval_top_k(default=10):
+    """How many candidates to retrieve: over-fetch when a reranker trims them afterwards."""
+    return RERANK_CANDIDATES if RERANKER != "none" else default
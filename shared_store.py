@@ -0,0 +1,259 @@
+import os
+import json
+import math
+import sqlite3
+import threading
+from typing import Any, List, Optional
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+from dedup import content_hash
+
+# One Chroma collection holds the chunks of every repo ingested with DEDUP_SCOPE=global
+SHARED_COLLECTION_NAME = "kiwi_shared_chunks"
+# Chroma ids per get/update call when rewriting repo membership
+MEMBERSHIP_BATCH = 1000
+
+# Membership lists are read, modified and written back; serialize that within the process
+_membership_lock = threading.Lock()
+
+def _batches(items, size=MEMBERSHIP_BATCH):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class SharedChunkVectorStore(BasePydanticVectorStore):
+    """
+    One repo's view of a Chroma collection shared by all repos. Entries are keyed
+    by content hash, so a chunk that several repos (or several files of one repo)
+    contain is embedded and stored once; its `repos` metadata lists the repos
+    that reference it and queries filter on it. Chroma disk grows with unique
+    content, not with the number of copies.
+
+    The repo's own node metadata (file path, relationships for auto-merging) and
+    its node id -> content hash map live in a small per-repo SQLite file, so
+    query results are the repo's nodes. An entry is deleted once no repo
+    references it any more.
+
+    Membership updates are serialized within a process only; run concurrent
+    ingests of different repos from one process (or one at a time).
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = True
+
+    map_path: str
+    repo_tag: str
+
+    _collection: Any = PrivateAttr()
+    _conn: Any = PrivateAttr()
+    _lock: Any = PrivateAttr()
+
+    def __init__(self, collection: Any, map_path: str, repo_tag: str, **kwargs: Any) -> None:
+        super().__init__(map_path=map_path, repo_tag=repo_tag, **kwargs)
+        os.makedirs(os.path.dirname(os.path.abspath(map_path)), exist_ok=True)
+        self._collection = collection
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(map_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " node_id TEXT PRIMARY KEY, hash TEXT NOT NULL, ref_doc_id TEXT, file_path TEXT,"
+            " metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_path ON chunks(file_path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_ref_doc ON chunks(ref_doc_id)")
+        self._conn.commit()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SharedChunkVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return self._collection
+
+    def close(self):
+        self._conn.close()
+
+    # --- membership of shared entries ---
+    def _get_repos(self, hashes):
+        """{hash: [repo tags]} for the hashes already in the shared collection."""
+        found = {}
+        for batch in _batches(hashes):
+            result = self._collection.get(ids=batch, include=["metadatas"])
+            for entry_id, metadata in zip(result["ids"], result["metadatas"]):
+                found[entry_id] = list((metadata or {}).get("repos") or [])
+        return found
+
+    def _set_repos(self, repos_by_hash):
+        """Writes new membership lists; entries left with no repo are deleted."""
+        emptied = [h for h, repos in repos_by_hash.items() if not repos]
+        kept = [(h, repos) for h, repos in repos_by_hash.items() if repos]
+        for batch in _batches(emptied):
+            self._collection.delete(ids=batch)
+        for batch in _batches(kept):
+            self._collection.update(ids=[h for h, _ in batch], metadatas=[{"repos": repos} for _, repos in batch])
+
+    def _release(self, hashes):
+        """Drops this repo from the entries of `hashes` it no longer has any node for."""
+        hashes = set(hashes)
+        if not hashes:
+            return
+        still_used = set()
+        for batch in _batches(hashes):
+            placeholders = ",".join("?" * len(batch))
+            still_used.update(h for (h,) in self._conn.execute(
+                f"SELECT DISTINCT hash FROM chunks WHERE hash IN ({placeholders})", batch
+            ))
+        released = hashes - still_used
+        with _membership_lock:
+            current = self._get_repos(released)
+            self._set_repos({h: [r for r in repos if r != self.repo_tag] for h, repos in current.items()})
+
+    def missing_vectors(self, nodes):
+        """Nodes whose content is not in the shared collection yet; only these need embedding."""
+        hashes = [content_hash(node.get_content()) for node in nodes]
+        stored = set()
+        for batch in _batches(set(hashes)):
+            stored.update(self._collection.get(ids=batch, include=[])["ids"])
+        return [node for node, h in zip(nodes, hashes) if h not in stored]
+
+    # --- writes ---
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        hashes = [content_hash(node.get_content()) for node in nodes]
+        rows = [
+            (node.node_id, h, node.ref_doc_id, node.metadata.get("file_path"),
+             json.dumps(node_to_metadata_dict(node, remove_text=True, flat_metadata=self.flat_metadata)))
+            for node, h in zip(nodes, hashes)
+        ]
+        with self._lock:
+            # Nodes re-added with new content give up their old entry below
+            node_ids = [node.node_id for node in nodes]
+            replaced = set()
+            for batch in _batches(node_ids):
+                placeholders = ",".join("?" * len(batch))
+                replaced.update(h for (h,) in self._conn.execute(
+                    f"SELECT hash FROM chunks WHERE node_id IN ({placeholders})", batch
+                ))
+            with _membership_lock:
+                existing = self._get_repos(set(hashes))
+                new_entries = {}
+                for node, h in zip(nodes, hashes):
+                    if h in existing or h in new_entries:
+                        continue
+                    if node.embedding is None:
+                        raise ValueError(f"Node {node.node_id} has no embedding and its content is not stored yet.")
+                    new_entries[h] = node
+                for batch in _batches(new_entries.items()):
+                    self._collection.add(
+                        ids=[h for h, _ in batch],
+                        embeddings=[node.get_embedding() for _, node in batch],
+                        documents=[node.get_content() for _, node in batch],
+                        metadatas=[{"repos": [self.repo_tag]} for _ in batch]
+                    )
+                self._set_repos({h: repos + [self.repo_tag] for h, repos in existing.items() if self.repo_tag not in repos})
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (node_id, hash, ref_doc_id, file_path, metadata) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._release(replaced - set(hashes))
+        return node_ids
+
+    def _delete_where(self, clause, params):
+        with self._lock:
+            hashes = set()
+            for param in params:
+                hashes.update(h for (h,) in self._conn.execute(f"SELECT hash FROM chunks WHERE {clause}", param))
+            self._conn.executemany(f"DELETE FROM chunks WHERE {clause}", params)
+            self._conn.commit()
+            self._release(hashes)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._delete_where("ref_doc_id = ?", [(ref_doc_id,)])
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Any = None, **kwargs: Any) -> None:
+        if filters is not None:
+            raise NotImplementedError("SharedChunkVectorStore only deletes by node id, ref doc or file path.")
+        self._delete_where("node_id = ?", [(node_id,) for node_id in node_ids or []])
+
+    def delete_file_paths(self, file_paths):
+        self._delete_where("file_path = ?", [(path,) for path in file_paths])
+
+    def clear(self) -> None:
+        """Drops all of this repo's nodes; found through the shared collection, so no stray membership survives."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+            with _membership_lock:
+                while True:
+                    result = self._collection.get(
+                        where={"repos": {"$contains": self.repo_tag}}, limit=MEMBERSHIP_BATCH, include=["metadatas"]
+                    )
+                    if not result["ids"]:
+                        break
+                    self._set_repos({
+                        h: [r for r in metadata["repos"] if r != self.repo_tag]
+                        for h, metadata in zip(result["ids"], result["metadatas"])
+                    })
+
+    def retag(self, repo_tag):
+        """Moves this view's membership to another tag (a staged ingest taking over the repo's name)."""
+        with self._lock, _membership_lock:
+            while True:
+                result = self._collection.get(
+                    where={"repos": {"$contains": self.repo_tag}}, limit=MEMBERSHIP_BATCH, include=["metadatas"]
+                )
+                if not result["ids"]:
+                    break
+                self._set_repos({
+                    h: [r for r in metadata["repos"] if r not in (self.repo_tag, repo_tag)] + [repo_tag]
+                    for h, metadata in zip(result["ids"], result["metadatas"])
+                })
+            self.repo_tag = repo_tag
+
+    # --- search ---
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise NotImplementedError("SharedChunkVectorStore does not support metadata filters.")
+        results = self._collection.query(
+            query_embeddings=[query.query_embedding],
+            n_results=query.similarity_top_k,
+            where={"repos": {"$contains": self.repo_tag}},
+            include=["documents", "distances"]
+        )
+        hashes = results["ids"][0]
+        if not hashes:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        # Several nodes of this repo may share an entry (DEDUP_MODE=off); the first one answers
+        placeholders = ",".join("?" * len(hashes))
+        with self._lock:
+            records = self._conn.execute(
+                f"SELECT hash, node_id, metadata FROM chunks WHERE hash IN ({placeholders}) ORDER BY rowid",
+                hashes
+            ).fetchall()
+        by_hash = {}
+        for h, node_id, metadata in records:
+            by_hash.setdefault(h, (node_id, metadata))
+
+        nodes, similarities, ids = [], [], []
+        for h, text, distance in zip(hashes, results["documents"][0], results["distances"][0]):
+            if h not in by_hash:
+                continue
+            node_id, metadata = by_hash[h]
+            nodes.append(metadata_dict_to_node(json.loads(metadata), text=text))
+            # Same distance -> similarity mapping as ChromaVectorStore
+            similarities.append(math.exp(-distance))
+            ids.append(node_id)
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
@@ -39,13 +39,23 @@ class SwarmService:
         """
         print(f"🐝[Client] Starting Swarm Analysis for {len(documents)} files...")
         
+        job_map = await self.dispatch_jobs(documents)
+        if job_map is None:
+            return {}
+        return await self.collect_results(job_map)
+
+    async def dispatch_jobs(self, documents) -> dict:
+        """
+        Pushes one analysis job per document onto the queue.
+        Returns {job_id: file_name}, or None if Redis is unreachable.
+        """
         r = await self.get_redis()
         try:
             await r.ping()
         except Exception as e:
             print(f"❌[Client] Redis connection failed: {e}")
             print("   Ensure 'kubectl port-forward' is running if on host.")
-            return {}
+            return None
 
         job_map = {} # job_id -> file_name
         
@@ -67,8 +77,17 @@ class SwarmService:
             job_map[job_id] = file_name
             
         await pipe.execute()
+        await r.aclose()
         print(f"✅[Client] Dispatched {len(job_map)} jobs.")
+        return job_map
 
+    async def collect_results(self, job_map: dict) -> dict:
+        """
+        Waits for the replies of previously dispatched jobs.
+        Returns {file_name: analysis}.
+        """
+        r = await self.get_redis()
+        
         # 2. Await Results (Scatter-Gather)
         # We poll for results or use blpop on specific reply keys?
         # Workers push to `reply:{job_id}`. 
@@ -109,7 +128,7 @@ class SwarmService:
         if pending_jobs:
             print(f"⚠️[Client] Timed out waiting for {len(pending_jobs)} files.")
         
-        print(f"✅[Client] Swarm analysis complete. Received {len(results)}/{len(documents)}.")
+        print(f"✅[Client] Swarm analysis complete. Received {len(results)}/{len(job_map)}.")
         return results
 
 # Singleton instance
@@ -0,0 +1,94 @@
+import time
+
+from answer_cache import AnswerCache, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  How does   AUTH work?? ") == "how does auth work"
+
+
+def test_exact_hit_ignores_case_whitespace_and_punctuation():
+    cache = AnswerCache(max_entries=8, ttl=60, similarity=0.95)
+    cache.put("repo", "sha1", "How does auth work?", "With tokens.")
+
+    assert cache.get("repo", "sha1", "how does auth   work") == ("With tokens.", "exact")
+    assert cache.contains("repo", "sha1", "HOW DOES AUTH WORK?")
+    assert cache.get("repo", "sha1", "How is auth tested?") == (None, None)
+    assert (cache.exact_hits, cache.misses) == (1, 1)
+
+
+def test_semantic_hit_above_threshold_only():
+    cache = AnswerCache(max_entries=8, ttl=60, similarity=0.95)
+    cache.put("repo", "sha1", "How does auth work?", "With tokens.", embedding=[1.0, 0.0])
+
+    assert cache.get("repo", "sha1", "Explain authentication", embedding=[0.99, 0.05]) == ("With tokens.", "semantic")
+    assert cache.get("repo", "sha1", "How are orders stored?", embedding=[0.5, 0.5]) == (None, None)
+    assert cache.get("other", "sha1", "Explain authentication", embedding=[1.0, 0.0]) == (None, None)
+
+
+def test_embed_is_only_called_after_an_exact_miss_with_candidates():
+    calls = []
+
+    def embed():
+        calls.append(1)
+        return [1.0, 0.0]
+
+    cache = AnswerCache(max_entries=8, ttl=60, similarity=0.95)
+    assert cache.get("repo", "sha1", "anything", embed=embed) == (None, None)
+    cache.put("repo", "sha1", "How does auth work?", "With tokens.", embedding=[1.0, 0.0])
+    cache.get("repo", "sha1", "How does auth work?", embed=embed)
+    assert calls == []
+
+    assert cache.get("repo", "sha1", "Explain authentication", embed=embed) == ("With tokens.", "semantic")
+    assert calls == [1]
+
+
+def test_entries_without_embedding_match_exactly_only():
+    cache = AnswerCache(max_entries=8, ttl=60, similarity=0.5)
+    cache.put("repo", "sha1", "Where is get_user_by_id?", "users.py")
+
+    assert cache.get("repo", "sha1", "get_user_by_id location", embedding=[1.0, 0.0]) == (None, None)
+
+
+def test_new_sha_invalidates_repo_entries():
+    cache = AnswerCache(max_entries=8, ttl=60, similarity=0.95)
+    cache.put("repo", "sha1", "q", "old answer")
+    cache.put("other", "sha9", "q", "other answer")
+
+    assert cache.get("repo", "sha2", "q") == (None, None)
+    assert cache.get("repo", "sha1", "q") == (None, None)
+    assert cache.get("other", "sha9", "q") == ("other answer", "exact")
+    assert cache.invalidations == 2
+
+    cache.invalidate("other")
+    assert cache.get("other", "sha9", "q") == (None, None)
+
+
+def test_ttl_expires_entries():
+    cache = AnswerCache(max_entries=8, ttl=60, similarity=0.95)
+    cache.put("repo", "sha1", "q", "answer")
+    key = next(iter(cache._entries))
+    answer, embedding, _ = cache._entries[key]
+    cache._entries[key] = (answer, embedding, time.time() - 61)
+
+    assert cache.get("repo", "sha1", "q") == (None, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = AnswerCache(max_entries=2, ttl=60, similarity=0.95)
+    cache.put("repo", "sha1", "q1", "a1")
+    cache.put("repo", "sha1", "q2", "a2")
+    cache.get("repo", "sha1", "q1")
+    cache.put("repo", "sha1", "q3", "a3")
+
+    assert cache.contains("repo", "sha1", "q1")
+    assert not cache.contains("repo", "sha1", "q2")
+    assert cache.contains("repo", "sha1", "q3")
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(max_entries=0, ttl=60, similarity=0.95)
+    cache.put("repo", "sha1", "q", "a")
+    assert cache.get("repo", "sha1", "q") == (None, None)
+    assert not cache.contains("repo", "sha1", "q")
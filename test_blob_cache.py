@@ -0,0 +1,73 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from blob_cache import BlobCache
+
+
+@pytest.mark.parametrize("data", [b"", b"hello\n", bytes(range(256)) * 3])
+def test_git_blob_sha_matches_git_hash_object(tmp_path, data):
+    if shutil.which("git") is None:
+        pytest.skip("git not installed")
+    path = tmp_path / "blob"
+    path.write_bytes(data)
+    expected = subprocess.run(
+        ["git", "hash-object", "--no-filters", str(path)], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert BlobCache.git_blob_sha(data) == expected
+
+
+def test_put_get_counts_hits_and_misses(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=1024)
+    sha = BlobCache.git_blob_sha(b"print(1)\n")
+
+    assert cache.get(sha) is None
+    cache.put(sha, b"print(1)\n")
+    assert cache.get(sha) == b"print(1)\n"
+    assert cache.get(None) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert "1 hits, 1 misses" in cache.report()
+
+    cache.reset_stats()
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_survives_restart(tmp_path):
+    BlobCache(str(tmp_path), max_bytes=1024).put("ab12", b"data")
+    reopened = BlobCache(str(tmp_path), max_bytes=1024)
+    assert reopened.get("ab12") == b"data"
+    assert reopened._total_bytes == 4
+
+
+def test_evicts_least_recently_used_over_max_bytes(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=250)
+    cache.put("aa01", b"a" * 100)
+    cache.put("bb02", b"b" * 100)
+    for entry in cache._index.values():
+        entry[1] = 0
+    # Reading aa01 makes bb02 the least recently used
+    assert cache.get("aa01") is not None
+    cache.put("cc03", b"c" * 100)
+
+    assert cache.get("bb02") is None
+    assert not os.path.exists(cache._path("bb02"))
+    assert cache.get("aa01") == b"a" * 100
+    assert cache.get("cc03") == b"c" * 100
+    assert cache._total_bytes == 200
+
+
+def test_blob_larger_than_cap_is_not_stored(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=10)
+    cache.put("dd04", b"x" * 11)
+    assert cache.get("dd04") is None
+    assert cache._total_bytes == 0
+
+
+def test_missing_file_counts_as_miss(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=1024)
+    cache.put("ee05", b"data")
+    os.remove(cache._path("ee05"))
+    assert cache.get("ee05") is None
+    assert cache.misses == 1 and cache._total_bytes == 0
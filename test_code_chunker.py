@@ -0,0 +1,74 @@
+from llama_index.core import Document
+from llama_index.core.node_parser import get_leaf_nodes, get_root_nodes
+from llama_index.core.schema import NodeRelationship
+
+from code_chunker import CodeHierarchyNodeParser, _split_at, detect_language, TOP_LEVEL_PATTERNS
+
+SOURCE = '''import os
+
+
+# Adds two numbers
+@cache
+def add(a, b):
+    return a + b
+
+
+class Greeter:
+    def hello(self):
+        return "hello"
+
+    def bye(self):
+        return "bye"
+'''
+
+
+def _function(name, lines):
+    body = "".join(f"    value_{i} = compute_{name}({i}, 'padding text to use up tokens')\n" for i in range(lines))
+    return f"def {name}():\n{body}    return value_0\n\n"
+
+
+def test_detect_language():
+    assert detect_language("pkg/mod.py") == "python"
+    assert detect_language("web/App.tsx") == "js"
+    assert detect_language("README.md") is None
+
+
+def test_split_at_keeps_comments_and_decorators_with_definition():
+    blocks = _split_at(SOURCE.splitlines(keepends=True), TOP_LEVEL_PATTERNS["python"])
+    texts = ["".join(block) for block in blocks]
+
+    assert texts[0].startswith("import os")
+    assert texts[1].startswith("# Adds two numbers\n@cache\ndef add")
+    assert texts[2].startswith("class Greeter")
+    assert "".join(texts) == SOURCE
+
+
+def test_leaves_follow_function_boundaries_under_parents():
+    parser = CodeHierarchyNodeParser(leaf_chunk_tokens=200, parent_chunk_tokens=450)
+    source = "".join(_function(name, 6) for name in ("alpha", "beta", "gamma", "delta"))
+    nodes = parser.get_nodes_from_documents([Document(text=source, metadata={"file_path": "m.py"})])
+
+    leaves = get_leaf_nodes(nodes)
+    assert len(leaves) >= 2 and len(nodes) > len(leaves)
+    assert all(leaf.get_content().lstrip().startswith("def ") for leaf in leaves)
+    assert "".join(leaf.get_content() for leaf in leaves).replace("\n", "") == source.replace("\n", "")
+    for root in get_root_nodes(nodes):
+        children = root.relationships.get(NodeRelationship.CHILD, [])
+        assert len(children) != 1
+    for leaf in leaves:
+        assert parser._tokens(leaf.get_content()) <= 200
+
+
+def test_oversized_function_is_split_by_lines():
+    parser = CodeHierarchyNodeParser(leaf_chunk_tokens=100, parent_chunk_tokens=300)
+    nodes = parser.get_nodes_from_documents([Document(text=_function("huge", 40), metadata={"file_path": "m.py"})])
+
+    leaves = get_leaf_nodes(nodes)
+    assert len(leaves) > 1
+    assert all(parser._tokens(leaf.get_content()) <= 100 for leaf in leaves)
+
+
+def test_non_code_files_use_hierarchical_fallback():
+    parser = CodeHierarchyNodeParser()
+    nodes = parser.get_nodes_from_documents([Document(text="# Title\n\nSome prose.\n", metadata={"file_path": "README.md"})])
+    assert nodes and "Some prose." in get_leaf_nodes(nodes)[0].get_content()
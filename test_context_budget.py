@@ -0,0 +1,76 @@
+import json
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from context_budget import ContextBudgeter, _module_key, count_tokens
+
+REPO_MAP = "\n".join([
+    "🛠️ Tech Stack: Python, FastAPI",
+    "",
+    "📄 File: app/auth.py",
+    "  def login(user, password)",
+    "  def logout(session)",
+    "📄 File: app/users.py",
+    "  def get_user_by_id(user_id)",
+    "📄 File: app/orders.py",
+    "  def list_orders(user)",
+    "  def cancel_order(order_id)",
+])
+GRAPH = json.dumps({
+    "app/auth.py": {"dependencies": ["./users"], "summary": "Login and sessions"},
+    "app/users.py": {"dependencies": [], "summary": "User lookups"},
+    "app/orders.py": {"dependencies": [], "error": "boom", "summary": "Analysis failed"},
+})
+
+
+def _hit(path):
+    return NodeWithScore(node=TextNode(text="...", metadata={"file_path": path}), score=1.0)
+
+
+def test_module_key_normalizes_paths_and_imports():
+    assert _module_key("./ui/Nav") == "ui/nav"
+    assert _module_key("src/ui/Nav.tsx") == "src/ui/nav"
+    assert _module_key("app.ui.nav") == "app/ui/nav"
+    assert _module_key("../components/index") == "components"
+
+
+def test_imports_link_graph_neighbours():
+    budgeter = ContextBudgeter(REPO_MAP, GRAPH)
+    assert budgeter.neighbours["app/auth.py"] == {"app/users.py"}
+    assert budgeter.neighbours["app/users.py"] == {"app/auth.py"}
+
+
+def test_select_prefers_retrieved_files_and_their_neighbours():
+    budgeter = ContextBudgeter(REPO_MAP, GRAPH, budget_tokens=10000)
+    repo_map, graph, used = budgeter.select("how does login work?", [_hit("app/auth.py")])
+
+    assert repo_map.startswith("🛠️ Tech Stack")
+    assert "📄 File: app/auth.py" in repo_map and "📄 File: app/users.py" in repo_map
+    assert "📄 File: app/orders.py" not in repo_map
+    assert "(Showing 2 of 3 files" in repo_map
+    assert '"app/auth.py"' in graph and '"app/orders.py"' not in graph
+    assert 0 < used <= budgeter.legacy_tokens
+
+
+def test_select_stays_within_budget():
+    budgeter = ContextBudgeter(REPO_MAP, GRAPH)
+    budget = budgeter.header_tokens + budgeter.section_tokens["app/auth.py"]
+    budgeter.budget_tokens = budget
+
+    repo_map, graph, used = budgeter.select("login", [_hit("app/auth.py")])
+
+    assert used <= budget
+    assert "📄 File: app/auth.py" in repo_map and "app/users.py" not in repo_map
+    assert graph == "(No Dependency Graph found)"
+
+
+def test_failed_analyses_drop_error_fields():
+    budgeter = ContextBudgeter(REPO_MAP, GRAPH)
+    assert budgeter.graph_entries["app/orders.py"] == '"app/orders.py": {}'
+
+
+def test_missing_map_and_graph():
+    budgeter = ContextBudgeter("", "not json")
+    repo_map, graph, used = budgeter.select("anything", [])
+    assert (repo_map, graph, used) == ("(No Repo Map found)", "(No Dependency Graph found)", 0)
+    assert count_tokens("") == 0
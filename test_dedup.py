@@ -0,0 +1,76 @@
+from llama_index.core.schema import TextNode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from dedup import ChunkDeduplicator, content_hash
+
+LICENSE = "# Copyright (c) Example Corp.\n# Licensed under the MIT License. See LICENSE for details.\n"
+FUNCTION = " ".join(f"total = total + values[{i}] * weights[{i}]" for i in range(40))
+
+
+def _node(node_id, text):
+    return TextNode(id_=node_id, text=text)
+
+
+def test_content_hash_ignores_trailing_whitespace_and_line_endings():
+    assert content_hash("a = 1  \r\nb = 2\n") == content_hash("a = 1\nb = 2")
+    assert content_hash("a = 1") != content_hash("a = 2")
+
+
+def test_exact_duplicates_point_to_first_occurrence():
+    dedup = ChunkDeduplicator(mode="exact")
+
+    assert dedup.check(_node("a", LICENSE)) is None
+    assert dedup.check(_node("b", LICENSE + "   ")) == "a"
+    assert dedup.check(_node("c", FUNCTION)) is None
+    assert dedup.duplicates == {"b": "a"}
+    assert (dedup.checked, dedup.exact_hits) == (3, 1)
+
+
+def test_near_duplicates_only_in_near_mode():
+    edited = FUNCTION.replace("values[39]", "values[40]")
+
+    exact = ChunkDeduplicator(mode="exact")
+    exact.check(_node("a", FUNCTION))
+    assert exact.check(_node("b", edited)) is None
+
+    near = ChunkDeduplicator(mode="near", near_threshold=0.8)
+    near.check(_node("a", FUNCTION))
+    assert near.check(_node("b", edited)) == "a"
+    assert near.check(_node("c", "def unrelated(x):\n    return sorted(x, key=len)[::-1]\n")) is None
+    assert near.near_hits == 1
+
+
+def test_off_mode_checks_nothing():
+    dedup = ChunkDeduplicator(mode="off")
+    dedup.check(_node("a", LICENSE))
+    assert dedup.check(_node("b", LICENSE)) is None
+    assert dedup.checked == 0
+
+
+def test_forget_promotes_first_surviving_duplicate():
+    docstore = SimpleDocumentStore()
+    nodes = [_node(node_id, LICENSE) for node_id in ("a", "b", "c")]
+    docstore.add_documents(nodes)
+    dedup = ChunkDeduplicator(mode="exact")
+    for node in nodes:
+        dedup.check(node)
+
+    promoted = dedup.forget(docstore, ["a"])
+
+    assert [node.node_id for node in promoted] == ["b"]
+    assert dedup.canonical_by_hash == {content_hash(LICENSE): "b"}
+    assert dedup.duplicates == {"c": "b"}
+
+
+def test_save_load_round_trip(tmp_path):
+    dedup = ChunkDeduplicator(mode="exact")
+    dedup.check(_node("a", LICENSE))
+    dedup.check(_node("b", LICENSE))
+    dedup.save(str(tmp_path))
+
+    loaded = ChunkDeduplicator.load(str(tmp_path), mode="exact")
+
+    assert loaded.canonical_by_hash == dedup.canonical_by_hash
+    assert loaded.duplicates == {"b": "a"}
+    assert loaded.check(_node("c", LICENSE)) == "a"
+    assert ChunkDeduplicator.load(str(tmp_path / "missing")).duplicates == {}
@@ -0,0 +1,55 @@
+from embedding_cache import EmbeddingCache, describe_embed_model
+
+
+def test_key_depends_on_model_dimension_and_text():
+    key = EmbeddingCache.make_key("def f(): pass", "text-embedding-004", 768)
+    assert key == EmbeddingCache.make_key("def f(): pass", "text-embedding-004", "768")
+    assert key != EmbeddingCache.make_key("def f(): pass", "text-embedding-004", 256)
+    assert key != EmbeddingCache.make_key("def f(): pass", "other-model", 768)
+    assert key != EmbeddingCache.make_key("def g(): pass", "text-embedding-004", 768)
+
+
+def test_round_trip_and_stats(tmp_path):
+    cache = EmbeddingCache(db_path=str(tmp_path / "embeddings.sqlite3"), max_bytes=1024 * 1024)
+    cache.put_many([("a", [0.5, -1.0, 2.0]), ("b", [1.0, 1.0, 1.0])])
+
+    found = cache.get_many(["a", "missing"])
+
+    assert found == {"a": [0.5, -1.0, 2.0]}
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    first = EmbeddingCache(db_path=path, max_bytes=1024 * 1024)
+    first.put_many([("a", [1.0, 2.0])])
+    first.close()
+
+    second = EmbeddingCache(db_path=path, max_bytes=1024 * 1024)
+    assert second.get_many(["a"]) == {"a": [1.0, 2.0]}
+    second.close()
+
+
+def test_evicts_least_recently_used_over_cap(tmp_path):
+    # Each 4-float vector is 16 bytes; the cap fits four of them
+    cache = EmbeddingCache(db_path=str(tmp_path / "embeddings.sqlite3"), max_bytes=64)
+    cache.put_many([("old", [0.0] * 4)])
+    cache._connect().execute("UPDATE embeddings SET last_used = 0 WHERE key = 'old'")
+    cache.put_many([(f"k{i}", [float(i)] * 4) for i in range(4)])
+
+    assert "old" not in cache.get_many(["old"])
+    assert cache._total_bytes <= 64
+    cache.close()
+
+
+def test_describe_embed_model_prefers_output_dimensionality():
+    class Model:
+        model_name = "text-embedding-004"
+        embedding_config = {"output_dimensionality": 256}
+
+    class Native:
+        model_name = "text-embedding-004"
+
+    assert describe_embed_model(Model()) == ("text-embedding-004", "256")
+    assert describe_embed_model(Native()) == ("text-embedding-004", "native")
@@ -0,0 +1,122 @@
+import pytest
+
+import embedding_executor
+from embedding_executor import AdaptiveEmbedder, is_rate_limit_error
+
+
+class _Clock:
+    """Stands in for the time module: each embed call advances it by `latency`."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+
+class _EmbedModel:
+    def __init__(self, clock, latency=0.1, errors=()):
+        self.clock = clock
+        self.latency = latency
+        self.errors = list(errors)
+        self.batches = []
+
+    def get_text_embedding_batch(self, texts):
+        self.clock.now += self.latency
+        if self.errors:
+            raise self.errors.pop(0)
+        self.batches.append(len(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class _QuotaError(Exception):
+    code = 429
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(embedding_executor, "time", clock)
+    return clock
+
+
+def _embedder(model, **kwargs):
+    kwargs = {"batch_size": 64, "concurrency": 4, "max_batch_size": 100, "max_concurrency": 8,
+              "target_latency": 5.0, **kwargs}
+    return AdaptiveEmbedder(model, **kwargs)
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(_QuotaError())
+    assert is_rate_limit_error(Exception("429 RESOURCE_EXHAUSTED"))
+    assert is_rate_limit_error(Exception("Quota exceeded for embed requests"))
+    assert not is_rate_limit_error(ValueError("bad input"))
+
+
+def test_rate_limit_halves_and_retries(clock):
+    model = _EmbedModel(clock, errors=[_QuotaError()])
+    embedder = _embedder(model)
+
+    assert embedder.embed(["a", "bb"]) == [[1.0], [2.0]]
+    assert (embedder.batch_size, embedder.concurrency) == (32, 2)
+    assert embedder.rate_limited == 1
+    assert len(clock.slept) == 1 and 1 <= clock.slept[0] <= 2
+    assert (embedder.calls, embedder.texts) == (1, 2)
+
+
+def test_halving_stops_at_the_minimums(clock):
+    model = _EmbedModel(clock, errors=[_QuotaError()] * 6)
+    embedder = _embedder(model, batch_size=16, concurrency=2)
+    embedder.embed(["a"])
+    assert (embedder.batch_size, embedder.concurrency) == (embedder.min_batch_size, 1)
+
+
+def test_other_errors_are_raised_without_retry(clock):
+    model = _EmbedModel(clock, errors=[ValueError("bad input")])
+    embedder = _embedder(model)
+    with pytest.raises(ValueError):
+        embedder.embed(["a"])
+    assert clock.slept == [] and embedder.rate_limited == 0
+
+
+def test_rate_limit_gives_up_after_max_retries(clock, monkeypatch):
+    monkeypatch.setattr(embedding_executor, "EMBED_MAX_RETRIES", 2)
+    model = _EmbedModel(clock, errors=[_QuotaError()] * 3)
+    with pytest.raises(_QuotaError):
+        _embedder(model).embed(["a"])
+    assert len(clock.slept) == 2
+
+
+def test_slow_batches_shrink_the_batch_size(clock):
+    embedder = _embedder(_EmbedModel(clock, latency=9.0))
+    embedder.embed(["a"])
+    assert (embedder.batch_size, embedder.concurrency) == (48, 4)
+
+
+def test_fast_streak_grows_batch_then_concurrency(clock):
+    embedder = _embedder(_EmbedModel(clock), batch_size=96, concurrency=2)
+
+    # A full round of fast batches (one per concurrent slot) adds one step
+    embedder.embed(["a"])
+    assert embedder.batch_size == 96
+    embedder.embed(["a"])
+    assert (embedder.batch_size, embedder.concurrency) == (100, 2)
+    # Batch size is at its cap, so the next round raises concurrency
+    embedder.embed(["a"])
+    embedder.embed(["a"])
+    assert (embedder.batch_size, embedder.concurrency) == (100, 3)
+
+
+def test_slow_batch_resets_the_fast_streak(clock):
+    model = _EmbedModel(clock)
+    embedder = _embedder(model, batch_size=96, concurrency=2)
+    embedder.embed(["a"])
+    model.latency = 9.0
+    embedder.embed(["a"])
+    model.latency = 0.1
+    embedder.embed(["a"])
+    assert embedder.batch_size == 72
@@ -0,0 +1,59 @@
+from engine_cache import EngineCache
+
+MB = 1024 * 1024
+
+
+def test_evicts_least_recently_used_over_entry_limit():
+    cache = EngineCache(max_entries=2, max_bytes=100 * MB)
+    cache.put("a", "engine-a")
+    cache.put("b", "engine-b")
+    cache.get("a")
+    cache.put("c", "engine-c")
+
+    assert "b" not in cache
+    assert cache.get("a") == "engine-a" and cache.get("c") == "engine-c"
+    assert cache.evictions == 1
+
+
+def test_evicts_until_estimated_sizes_fit():
+    cache = EngineCache(max_entries=10, max_bytes=100 * MB)
+    cache.put("a", "engine-a", 40 * MB)
+    cache.put("b", "engine-b", 40 * MB)
+    cache.put("c", "engine-c", 50 * MB)
+
+    assert "a" not in cache and "b" in cache and "c" in cache
+    assert cache.stats()["size_mb"] == 90
+
+
+def test_newest_entry_is_kept_even_over_budget():
+    cache = EngineCache(max_entries=10, max_bytes=100 * MB)
+    cache.put("a", "engine-a", 10 * MB)
+    cache.put("huge", "engine-huge", 500 * MB)
+
+    assert len(cache) == 1
+    assert cache.get("huge") == "engine-huge"
+
+
+def test_peek_does_not_touch_recency_or_stats():
+    cache = EngineCache(max_entries=2, max_bytes=100 * MB)
+    cache.put("a", "engine-a")
+    cache.put("b", "engine-b")
+
+    assert cache.peek("a") == "engine-a"
+    assert cache.peek("missing") is None
+    cache.put("c", "engine-c")
+
+    assert "a" not in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_pop_and_stats():
+    cache = EngineCache(max_entries=2, max_bytes=100 * MB)
+    cache.put("a", "engine-a", MB)
+    cache.get("a")
+    cache.get("missing")
+
+    assert cache.pop("a") == "engine-a"
+    assert cache.pop("a", "gone") == "gone"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"]) == (0, 1, 1, 0.5)
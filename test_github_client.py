@@ -0,0 +1,160 @@
+import os
+import json
+import time
+
+import github_client
+from github_client import GithubClient, CachedResponse
+
+API_URL = "https://api.github.com/repos/o/r/git/trees/main"
+
+
+class _Response:
+    def __init__(self, status_code=200, text="{}", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        pass
+
+
+class _Session:
+    """Answers requests from a queue of responses and records the headers sent."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.sent.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def _client(tmp_path, monkeypatch, *responses, **env):
+    for name, value in env.items():
+        monkeypatch.setenv(name, str(value))
+    client = GithubClient(token="t", cache_dir=str(tmp_path / "cache"), pool_size=1)
+    client.session = _Session(*responses)
+    return client
+
+
+def _sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(github_client.time, "sleep", slept.append)
+    return slept
+
+
+def test_no_wait_without_rate_limit_headers(tmp_path, monkeypatch):
+    slept = _sleeps(monkeypatch)
+    client = _client(tmp_path, monkeypatch)
+    client._wait_for_budget(conditional=False)
+    assert slept == []
+
+
+def test_waits_for_reset_below_reserve(tmp_path, monkeypatch):
+    slept = _sleeps(monkeypatch)
+    client = _client(tmp_path, monkeypatch, GITHUB_RATE_LIMIT_RESERVE=50)
+    client.remaining, client.reset_at = 10, time.time() + 100
+
+    client._wait_for_budget(conditional=False)
+    assert len(slept) == 1 and 99 <= slept[0] <= 101
+    # Revalidations are only held back once the budget is fully spent
+    client._wait_for_budget(conditional=True)
+    assert len(slept) == 1
+
+
+def test_sends_anyway_when_reset_is_beyond_max_wait(tmp_path, monkeypatch):
+    slept = _sleeps(monkeypatch)
+    client = _client(tmp_path, monkeypatch, GITHUB_RATE_LIMIT_MAX_WAIT=60)
+    client.remaining, client.reset_at = 0, time.time() + 600
+    client._wait_for_budget(conditional=True)
+    assert slept == []
+
+
+def test_paces_requests_below_pace_threshold(tmp_path, monkeypatch):
+    slept = _sleeps(monkeypatch)
+    client = _client(tmp_path, monkeypatch, GITHUB_RATE_LIMIT_RESERVE=50, GITHUB_RATE_LIMIT_PACE_BELOW=500)
+    client.remaining, client.reset_at = 250, time.time() + 200
+
+    client._wait_for_budget(conditional=False)
+    # 200 requests above the reserve spread over a 200s window
+    assert len(slept) == 1 and 0.95 <= slept[0] <= 1.0
+    client._wait_for_budget(conditional=True)
+    client.remaining = 1000
+    client._wait_for_budget(conditional=False)
+    assert len(slept) == 1
+
+
+def test_retry_after(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    assert client._retry_after(_Response(200)) is None
+    assert client._retry_after(_Response(404)) is None
+    assert client._retry_after(_Response(429, headers={"Retry-After": "7"})) == 7
+    reset = _Response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time()) + 30)})
+    assert 29 <= client._retry_after(reset) <= 31
+    # A 403 that is not about the rate limit is not retried
+    assert client._retry_after(_Response(403, headers={"X-RateLimit-Remaining": "12"})) is None
+
+
+def test_rate_limited_request_is_retried_once(tmp_path, monkeypatch):
+    slept = _sleeps(monkeypatch)
+    client = _client(
+        tmp_path, monkeypatch,
+        _Response(429, headers={"Retry-After": "3"}),
+        _Response(200, text='{"ok": true}', headers={"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "0"}),
+    )
+    resp = client.request("GET", API_URL)
+    assert resp.status_code == 200 and slept == [3]
+    assert client.rate_limit_status()["remaining"] == 4999
+
+
+def test_not_modified_is_served_from_etag_cache(tmp_path, monkeypatch):
+    client = _client(
+        tmp_path, monkeypatch,
+        _Response(200, text='{"sha": "abc"}', headers={"ETag": '"v1"', "Content-Type": "application/json"}),
+        _Response(304),
+    )
+    assert client.get(API_URL).json() == {"sha": "abc"}
+
+    # A fresh client (empty memory cache) revalidates from the disk copy
+    fresh = _client(tmp_path, monkeypatch, _Response(304))
+    resp = fresh.get(API_URL)
+    assert isinstance(resp, CachedResponse)
+    assert resp.json() == {"sha": "abc"} and resp.status_code == 200
+    assert fresh.session.sent[0]["If-None-Match"] == '"v1"'
+    assert fresh.rate_limit_status()["conditional_hits"] == 1
+
+
+def test_memory_cache_keeps_most_recent_entries(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch, GITHUB_CACHE_MEMORY_ENTRIES=2)
+    for url in ("a", "b", "c"):
+        client._remember(url, {"body": url})
+    assert list(client._memory_cache) == ["b", "c"]
+    client._load_cached("b")
+    client._remember("d", {"body": "d"})
+    assert list(client._memory_cache) == ["b", "d"]
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    body = "x" * 400
+    responses = [_Response(200, text=body, headers={"ETag": f'"{i}"'}) for i in range(3)]
+    client = _client(tmp_path, monkeypatch, *responses, GITHUB_CACHE_MAX_MB=1)
+    client.cache_max_bytes = 1000
+    urls = [f"{API_URL}?page={i}" for i in range(3)]
+
+    client.get(urls[0])
+    client.get(urls[1])
+    for entry in client._disk_index.values():
+        entry[1] = 0
+    # Reading page 0 back from disk makes page 1 the least recently used
+    client._memory_cache.clear()
+    client._load_cached(urls[0])
+    client.get(urls[2])
+
+    assert os.path.exists(client._cache_path(urls[0]))
+    assert not os.path.exists(client._cache_path(urls[1]))
+    assert os.path.exists(client._cache_path(urls[2]))
+    assert client._disk_bytes <= client.cache_max_bytes
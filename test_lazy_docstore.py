@@ -0,0 +1,139 @@
+import os
+
+from llama_index.core import StorageContext
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeRelationship, NodeWithScore, QueryBundle, TextNode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.types import DEFAULT_PERSIST_FNAME
+
+from lazy_docstore import DOCSTORE_FILENAME, SQLiteDocumentStore, BatchedAutoMergingRetriever
+
+
+def _nodes():
+    return [
+        TextNode(id_="a1", text="def a(): pass", metadata={"file_path": "a.py"}),
+        TextNode(id_="a2", text="def a2(): pass", metadata={"file_path": "a.py"}),
+        TextNode(id_="b1", text="def b(): pass", metadata={"file_path": "b.py"}),
+    ]
+
+
+def _store(tmp_path, cache_size=None):
+    return SQLiteDocumentStore(str(tmp_path / DOCSTORE_FILENAME), cache_size=cache_size)
+
+
+def test_reads_nodes_on_demand_through_a_bounded_cache(tmp_path):
+    store = _store(tmp_path, cache_size=2)
+    store.add_documents(_nodes())
+
+    assert len(store) == 3
+    assert [node.node_id for node in store.get_nodes(["a1", "a2", "b1"])] == ["a1", "a2", "b1"]
+    assert len(store._cache) == 2
+    assert store.get_node("b1").get_content() == "def b(): pass"
+    assert store.get_document("missing", raise_error=False) is None
+    store.close()
+
+
+def test_reads_work_without_a_cache(tmp_path):
+    store = _store(tmp_path, cache_size=0)
+    store.add_documents(_nodes())
+
+    assert store.get_node("a1").get_content() == "def a(): pass"
+    assert len(store.get_nodes(["a1", "b1"])) == 2
+    assert len(store._cache) == 0
+    store.close()
+
+
+def test_empty_store_is_truthy(tmp_path):
+    store = _store(tmp_path)
+    assert len(store) == 0
+    assert store
+    store.close()
+
+
+def test_node_ids_for_files(tmp_path):
+    store = _store(tmp_path)
+    store.add_documents(_nodes())
+
+    assert sorted(store.node_ids_for_files(["a.py"])) == ["a1", "a2"]
+    assert sorted(node.node_id for node in store.nodes_for_files(["b.py", "c.py"])) == ["b1"]
+    assert store.node_ids_for_files([]) == []
+    store.close()
+
+
+def test_cache_stays_coherent_on_delete_and_add(tmp_path):
+    store = _store(tmp_path)
+    store.add_documents(_nodes())
+    store.get_nodes(["a1", "b1"])
+
+    store.delete_document("a1")
+    store.add_documents([TextNode(id_="b1", text="def b(): return 2", metadata={"file_path": "b.py"})])
+
+    assert store.get_node("a1", raise_error=False) is None
+    assert store.get_node("b1").get_content() == "def b(): return 2"
+    store.close()
+
+
+def test_iter_node_batches_covers_every_node(tmp_path):
+    store = _store(tmp_path)
+    store.add_documents(_nodes())
+
+    batches = list(store.iter_node_batches(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert sorted(node.node_id for batch in batches for node in batch) == ["a1", "a2", "b1"]
+    store.close()
+
+
+def test_migrates_docstore_json_once(tmp_path):
+    legacy = SimpleDocumentStore()
+    legacy.add_documents(_nodes())
+    legacy.persist(str(tmp_path / DEFAULT_PERSIST_FNAME))
+
+    store = SQLiteDocumentStore.from_persist_dir(str(tmp_path))
+
+    assert not os.path.exists(tmp_path / DEFAULT_PERSIST_FNAME)
+    assert len(store) == 3
+    assert sorted(store.node_ids_for_files(["a.py"])) == ["a1", "a2"]
+    store.close()
+
+    reopened = SQLiteDocumentStore.from_persist_dir(str(tmp_path))
+    assert reopened.get_node("b1").get_content() == "def b(): pass"
+    reopened.close()
+
+
+class _FixedRetriever(BaseRetriever):
+    def __init__(self, hits):
+        super().__init__()
+        self.hits = hits
+
+    def _retrieve(self, query_bundle):
+        return [NodeWithScore(node=node, score=1.0) for node in self.hits[query_bundle.query_str]]
+
+
+def _hierarchy():
+    parent = TextNode(id_="p", text="def a(): pass\ndef a2(): pass", metadata={"file_path": "a.py"})
+    children = [
+        TextNode(id_="a1", text="def a(): pass", metadata={"file_path": "a.py"}),
+        TextNode(id_="a2", text="def a2(): pass", metadata={"file_path": "a.py"}),
+    ]
+    parent.relationships[NodeRelationship.CHILD] = [child.as_related_node_info() for child in children]
+    for child in children:
+        child.relationships[NodeRelationship.PARENT] = parent.as_related_node_info()
+    return parent, children
+
+
+def test_retrieve_many_reads_shared_parents_once(tmp_path):
+    store = _store(tmp_path)
+    parent, children = _hierarchy()
+    store.add_documents([parent, *children])
+    retriever = BatchedAutoMergingRetriever(
+        _FixedRetriever({"first": children, "second": children}),
+        StorageContext.from_defaults(docstore=store), verbose=False
+    )
+
+    results = retriever.retrieve_many([QueryBundle("first"), QueryBundle("second")])
+
+    assert [[r.node.node_id for r in nodes] for nodes in results] == [["p"], ["p"]]
+    assert store.misses == 1
+    assert results[0][0].node is results[1][0].node
+    store.close()
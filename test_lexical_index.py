@@ -0,0 +1,85 @@
+from llama_index.core.schema import TextNode
+
+from lexical_index import BM25Index, HybridRetriever, is_code_symbol, needs_query_embedding, tokenize
+
+
+def _node(node_id, path, text):
+    return TextNode(id_=node_id, text=text, metadata={"file_path": path})
+
+
+def _index():
+    index = BM25Index()
+    index.add_nodes([
+        _node("users", "app/users.py", "def get_user_by_id(user_id):\n    return db.users.find(user_id)\n"),
+        _node("auth", "app/auth.ts", "export class AuthProvider {\n  login(user) { return token(user) }\n}\n"),
+        _node("orders", "app/orders.py", "def list_orders(user):\n    return db.orders.filter(user=user)\n"),
+        _node("readme", "README.md", "The user service stores every user and their orders.\n"),
+    ])
+    return index
+
+
+def test_tokenize_splits_snake_and_camel_case():
+    assert tokenize("getUserById") == ["getuserbyid", "get", "user", "by", "id"]
+    assert tokenize("get_user_by_id") == ["get_user_by_id", "get", "user", "by", "id"]
+    assert tokenize("HTTPServer v2") == ["httpserver", "http", "server", "v2"]
+    assert tokenize("plain words") == ["plain", "words"]
+
+
+def test_is_code_symbol():
+    assert is_code_symbol("get_user_by_id")
+    assert is_code_symbol("AuthProvider")
+    assert is_code_symbol("sha256")
+    assert not is_code_symbol("user")
+    assert not is_code_symbol("_private")
+
+
+def test_search_ranks_matching_chunks_and_paths():
+    index = _index()
+
+    assert index.search("get_user_by_id")[0][0] == "users"
+    assert index.search("auth.ts")[0][0] == "auth"
+    assert index.search("nothing matches this") == []
+    assert index.document_frequency("user") == 4
+
+
+def test_confident_hits_only_for_selective_symbols():
+    index = _index()
+
+    hits = index.confident_hits("where is get_user_by_id defined?")
+    assert [node_id for node_id, _ in hits] == ["users"]
+    # Prose and common terms fall through to the vector index
+    assert index.confident_hits("how are users stored?") is None
+    assert index.confident_hits("what does missing_symbol do?") is None
+
+
+def test_remove_nodes_updates_postings():
+    index = _index()
+    index.search("orders")
+    index.remove_nodes(["orders", "unknown"])
+
+    assert len(index) == 3
+    assert all(node_id != "orders" for node_id, _ in index.search("list_orders"))
+
+
+def test_save_load_round_trip(tmp_path):
+    index = _index()
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert loaded.doc_terms == index.doc_terms
+    assert loaded.doc_lengths == index.doc_lengths
+    assert loaded.search("get_user_by_id", 2) == index.search("get_user_by_id", 2)
+    assert len(BM25Index.load(str(tmp_path / "missing"))) == 0
+
+
+def test_needs_query_embedding_unwraps_hybrid_retriever():
+    class Wrapper:
+        def __init__(self, inner):
+            self._vector_retriever = inner
+
+    retriever = Wrapper(HybridRetriever(vector_retriever=None, bm25_index=_index(), docstore=None))
+
+    assert needs_query_embedding(retriever, "where is get_user_by_id?") is False
+    assert needs_query_embedding(retriever, "how are users stored?") is True
+    assert needs_query_embedding(object(), "where is get_user_by_id?") is True
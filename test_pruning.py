@@ -0,0 +1,55 @@
+import base64
+import os
+
+from llama_index.core import Document
+
+from pruning import FilePruner, MAX_FILE_BYTES, parse_gitattributes, shannon_entropy
+
+
+def test_check_entry_skips_oversized_and_generated_paths():
+    pruner = FilePruner()
+
+    assert pruner.check_entry("src/app.py", MAX_FILE_BYTES + 1).startswith("size")
+    assert pruner.check_entry("data/fixtures.json", 200 * 1024).startswith("size")
+    assert pruner.check_entry("static/app.min.js", 10) == "minified/bundled file"
+    assert pruner.check_entry("web/dist/index.js", 10) == "generated/vendored directory"
+    assert pruner.check_entry("src/app.py", 1024) is None
+    assert [path for path, _, _ in pruner.skipped] == ["src/app.py", "data/fixtures.json", "static/app.min.js", "web/dist/index.js"]
+
+
+def test_gitattributes_later_rules_win():
+    rules = parse_gitattributes("# comment\napi/*.pb.go linguist-generated\napi/keep.pb.go -linguist-generated\n")
+    assert rules == [("api/*.pb.go", True), ("api/keep.pb.go", False)]
+
+    pruner = FilePruner("api/*.pb.go linguist-generated\napi/keep.pb.go -linguist-generated\n*.lock linguist-vendored=true\n")
+    assert pruner.check_entry("api/user.pb.go") == ".gitattributes linguist-generated"
+    assert pruner.check_entry("api/keep.pb.go") is None
+    assert pruner.check_entry("deep/dir/poetry.lock") == ".gitattributes linguist-generated"
+
+
+def test_check_content_heuristics():
+    pruner = FilePruner()
+
+    assert pruner.check_content("a.py", "  \n") == "empty file"
+    assert pruner.check_content("a.go", "// Code generated by protoc. DO NOT EDIT.\npackage a\n") == "generated-file marker"
+    # Merely mentioning the phrase outside a comment is fine
+    assert pruner.check_content("a.py", "MARKER = 'DO NOT EDIT'\n") is None
+    assert pruner.check_content("a.js", "var a=1;" * 300).startswith("minified")
+    blob = base64.b64encode(os.urandom(6000)).decode()
+    assert pruner.check_content("a.txt", "\n".join(blob[i:i + 76] for i in range(0, len(blob), 76))).startswith("high entropy")
+    assert pruner.check_content("a.py", "def add(a, b):\n    return a + b\n") is None
+
+
+def test_filter_documents_keeps_passing_documents():
+    docs = [
+        Document(text="def ok():\n    return 1\n", metadata={"file_path": "ok.py"}),
+        Document(text="", metadata={"file_path": "empty.py"}),
+    ]
+    kept = list(FilePruner().filter_documents(docs))
+    assert [doc.metadata["file_path"] for doc in kept] == ["ok.py"]
+
+
+def test_shannon_entropy():
+    assert shannon_entropy("") == 0.0
+    assert shannon_entropy("aaaa") == 0.0
+    assert shannon_entropy("abab") == 1.0
@@ -0,0 +1,94 @@
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+import quantized_store
+from quantized_store import QuantizedVectorStore, quantize_int8, int8_scores
+
+
+def _node(node_id, embedding, path="a.py"):
+    return TextNode(id_=node_id, text=f"text of {node_id}", metadata={"file_path": path}, embedding=list(embedding))
+
+
+def _query(store, embedding, k):
+    return store.query(VectorStoreQuery(query_embedding=list(embedding), similarity_top_k=k))
+
+
+def test_quantize_int8_round_trips_unit_vectors():
+    vectors = np.random.RandomState(0).normal(size=(20, 16)).astype(np.float32)
+    codes, scales = quantize_int8(vectors * 5)
+
+    assert codes.dtype == np.int8 and scales.dtype == np.float32
+    assert np.abs(codes).max() == 127
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(codes * scales[:, None], unit, atol=scales.max())
+
+
+def test_int8_scores_approximate_cosine_across_blocks(monkeypatch):
+    monkeypatch.setattr(quantized_store, "SCAN_BLOCK_ROWS", 7)
+    rng = np.random.RandomState(1)
+    vectors = rng.normal(size=(30, 32)).astype(np.float32)
+    query = rng.normal(size=32).astype(np.float32)
+    query /= np.linalg.norm(query)
+    codes, scales = quantize_int8(vectors)
+
+    exact = (vectors @ query) / np.linalg.norm(vectors, axis=1)
+    assert np.allclose(int8_scores(codes, scales, query), exact, atol=0.02)
+
+
+def test_query_on_empty_store(tmp_path):
+    store = QuantizedVectorStore(str(tmp_path / "q.sqlite3"))
+    result = _query(store, [1.0, 0.0], 5)
+    assert (result.nodes, result.similarities, result.ids) == ([], [], [])
+
+
+def test_query_rescores_int8_shortlist_exactly(tmp_path):
+    store = QuantizedVectorStore(str(tmp_path / "q.sqlite3"), rescore_factor=2)
+    rng = np.random.RandomState(2)
+    vectors = rng.normal(size=(50, 16)).astype(np.float32)
+    store.add([_node(f"n{i}", v) for i, v in enumerate(vectors)])
+    query = vectors[7] + rng.normal(scale=0.01, size=16).astype(np.float32)
+
+    result = _query(store, query, 3)
+
+    exact = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    assert result.ids == [f"n{i}" for i in np.argsort(-exact)[:3]]
+    assert np.allclose(result.similarities, np.sort(exact)[::-1][:3], atol=1e-5)
+    assert result.nodes[0].get_content() == "text of n7"
+    assert result.nodes[0].metadata["file_path"] == "a.py"
+
+
+def test_shortlist_is_k_times_rescore_factor(tmp_path, monkeypatch):
+    store = QuantizedVectorStore(str(tmp_path / "q.sqlite3"), rescore_factor=3)
+    store.add([_node(f"n{i}", v) for i, v in enumerate(np.eye(10, dtype=np.float32))])
+    shortlists = []
+    original = np.argpartition
+
+    def spy(scores, kth):
+        shortlists.append(kth + 1)
+        return original(scores, kth)
+
+    monkeypatch.setattr(np, "argpartition", spy)
+    assert len(_query(store, np.ones(10), 2).ids) == 2
+    assert shortlists == [6]
+    # Never more candidates than rows
+    _query(store, np.ones(10), 5)
+    assert shortlists[-1] == 10
+
+
+def test_delete_file_paths_and_nodes(tmp_path):
+    store = QuantizedVectorStore(str(tmp_path / "q.sqlite3"))
+    store.add([
+        _node("a1", [1.0, 0.0], "a.py"),
+        _node("a2", [0.9, 0.1], "a.py"),
+        _node("b1", [0.0, 1.0], "b.py"),
+        _node("c1", [0.5, 0.5], "c.py"),
+    ])
+
+    store.delete_file_paths({"a.py", "missing.py"})
+    assert sorted(_query(store, [1.0, 0.0], 10).ids) == ["b1", "c1"]
+
+    store.delete_nodes(["c1"])
+    assert _query(store, [1.0, 0.0], 10).ids == ["b1"]
+    # A reopened store sees the same rows
+    assert _query(QuantizedVectorStore(str(tmp_path / "q.sqlite3")), [0.0, 1.0], 10).ids == ["b1"]
@@ -0,0 +1,157 @@
+import pytest
+
+from repo_map import (
+    MAP_SIGNATURE_MAX_CHARS, MapSectionCache, assemble_repo_map, extract_signatures, format_section,
+    python_signatures, script_signatures, section_key, split_repo_map,
+)
+
+PYTHON_SOURCE = '''"""Module docstring."""
+import os
+from typing import (
+    Dict,
+    List,
+)
+
+
+def load(path: str, *, strict=False) -> Dict[str, List[int]]:
+    def inner():
+        pass
+    return {}
+
+
+class Store(Base, metaclass=Meta):
+    class Config:
+        pass
+
+    async def fetch(self, key):
+        return key
+'''
+
+JSX_SOURCE = """import React, { useState } from 'react';
+import type {
+  User,
+  Role,
+} from './types';
+
+const PATTERN = /[{}]/g;
+
+export function Hero({ title }: Props) {
+  const [open, setOpen] = useState(false);
+  const ratio = (a + b) / c;
+  return (
+    <div className="hero">
+      <p>it's {title}</p>
+      <p>Don't miss our "best" offers, open 24/7.</p>
+      <a href="/pricing">Pricing</a>
+    </div>
+  );
+}
+
+export default class Page extends React.Component<Props> {
+  private count = 0;
+  render() { return <div>it's {this.count}</div>; }
+  handle = async (event) => { const s = 'a{'; return s; };
+}
+
+export const fetchUser = async (id: string): Promise<User> => {
+  return api.get(`/users/${id}`);
+};
+export type Theme = 'light' | 'dark';
+"""
+
+
+def test_python_signatures_cover_imports_functions_and_class_members():
+    assert python_signatures(PYTHON_SOURCE) == [
+        (0, "import os"),
+        (0, "from typing import Dict, List"),
+        (0, "def load(path: str, *, strict=False) -> Dict[str, List[int]]"),
+        (0, "class Store(Base, metaclass=Meta)"),
+        (1, "class Config"),
+        (1, "async def fetch(self, key)"),
+    ]
+
+
+def test_python_syntax_error_falls_back_to_regex():
+    signatures, method = extract_signatures("broken.py", "def ok():\n    pass\ndef broken(:\n")
+    assert method == "regex"
+    assert (0, "def ok") in signatures
+
+
+def test_script_signatures_handle_jsx_text_and_regex_literals():
+    signatures, method = extract_signatures("Hero.tsx", JSX_SOURCE)
+
+    assert method == "script"
+    assert signatures == [
+        (0, "import React, { useState } from 'react'"),
+        (0, "import type { User, Role } from './types'"),
+        (0, "export function Hero({ title }: Props)"),
+        (0, "export default class Page extends React.Component<Props>"),
+        (1, "render()"),
+        (1, "handle = async (event) =>"),
+        (0, "export const fetchUser = async (id: string): Promise<User> =>"),
+        (0, "export type Theme = 'light' | 'dark'"),
+    ]
+
+
+@pytest.mark.parametrize("line", [
+    "const re = /[{}]/g;",
+    "if (/\\{/.test(s)) { run(); }",
+    "const half = total / 2; const s = '{';",
+    "const el = <p>it's {x}</p>;",
+    "const el = <p>Say \"hi\" {x}</p>;",
+])
+def test_script_masking_keeps_brackets_balanced(line):
+    assert script_signatures(f"{line}\nexport function after() {{}}\n") == [(0, "export function after()")]
+
+
+def test_script_unbalanced_brackets_raise():
+    with pytest.raises(SyntaxError):
+        script_signatures("export function broken() {\n")
+    assert extract_signatures("broken.js", "export function broken() {\n")[1] == "regex"
+
+
+def test_long_signatures_are_clipped():
+    signatures = python_signatures(f"def f({', '.join(f'argument_{i}' for i in range(40))}):\n    pass\n")
+    assert len(signatures[0][1]) == MAP_SIGNATURE_MAX_CHARS
+    assert signatures[0][1].endswith("...")
+
+
+def test_split_repo_map_inverts_assemble():
+    header = ["🛠️ Tech Stack: React", ""]
+    sections = [format_section("src/a.ts", [(0, "export function a()")]), format_section("src/b.ts", [])]
+    text = assemble_repo_map(header, sections)
+
+    parsed_header, parsed_sections = split_repo_map(text)
+
+    assert parsed_header == ["🛠️ Tech Stack: React"]
+    assert list(parsed_sections) == ["src/a.ts", "src/b.ts"]
+    assert assemble_repo_map(parsed_header, list(parsed_sections.values())) == text.replace("React\n\n", "React\n")
+
+
+def test_section_key_depends_on_content_and_parser():
+    assert section_key("a.py", "x = 1") == section_key("b.py", "x = 1")
+    assert section_key("a.py", "x = 1") != section_key("a.py", "x = 2")
+    assert section_key("a.py", "x = 1") != section_key("a.ts", "x = 1")
+
+
+def test_map_section_cache_round_trip(tmp_path):
+    path = str(tmp_path / "sections.sqlite3")
+    cache = MapSectionCache(path)
+    cache.put_many([("k1", [(0, "def a()"), (1, "def b(self)")])])
+
+    assert cache.get("k1") == [(0, "def a()"), (1, "def b(self)")]
+    assert cache.get("missing") is None
+    assert MapSectionCache(path).get("k1") == [(0, "def a()"), (1, "def b(self)")]
+
+
+def test_map_section_cache_prunes_stale_and_excess_entries(tmp_path):
+    cache = MapSectionCache(str(tmp_path / "sections.sqlite3"), max_age_days=1, max_entries=3)
+    cache.put_many([(f"k{i}", [(0, f"def f{i}()")]) for i in range(6)])
+    # k0 and k1 were last used long ago; k0 is read again before pruning
+    cache._connect().execute("UPDATE sections SET last_used = 0 WHERE key IN ('k0', 'k1')")
+    cache.get("k0")
+
+    assert cache.prune() == 3
+    remaining = {key for key in ("k0", "k1", "k2", "k3", "k4", "k5") if cache.get(key) is not None}
+    assert "k0" in remaining and "k1" not in remaining
+    assert len(remaining) == 3
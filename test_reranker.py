@@ -0,0 +1,63 @@
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from reranker import LocalReranker, create_node_postprocessors, retrieval_top_k
+
+
+def _candidates(*items):
+    return [
+        NodeWithScore(node=TextNode(id_=path, text=text, metadata={"file_path": path}), score=1.0)
+        for path, text in items
+    ]
+
+
+FILLER = [(f"app/module_{i}.py", f"def helper_{i}(value):\n    return value + {i}\n") for i in range(6)]
+
+
+def test_keeps_top_n_and_promotes_relevant_chunk():
+    nodes = _candidates(*FILLER, ("app/billing.py", "def charge_invoice(invoice):\n    return gateway.charge(invoice.total)\n"))
+    reranker = LocalReranker(top_n=3)
+
+    kept = reranker.postprocess_nodes(nodes, QueryBundle("how is an invoice charged?"))
+
+    # Retrieved last, but the only chunk sharing a term with the question
+    assert len(kept) == 3
+    assert "app/billing.py" in [n.node.metadata["file_path"] for n in kept]
+    assert kept[0].score >= kept[1].score >= kept[2].score
+
+
+def test_repo_map_symbols_boost_defining_file():
+    nodes = _candidates(*FILLER, ("app/session.py", "def start(request):\n    return Session(request)\n"))
+    reranker = LocalReranker(top_n=2, symbol_terms={"app/session.py": {"build_session_token", "session"}})
+
+    kept = reranker.postprocess_nodes(nodes, QueryBundle("where is build_session_token?"))
+
+    assert kept[0].node.metadata["file_path"] == "app/session.py"
+
+
+def test_tests_and_docs_are_penalised_unless_asked_for():
+    text = "def parse_settings(path):\n    return load(path)\n"
+    nodes = _candidates(*FILLER[:3], ("tests/test_settings.py", text), ("app/settings.py", text), *FILLER[3:])
+    reranker = LocalReranker(top_n=7)
+
+    kept = [n.node.metadata["file_path"] for n in reranker.postprocess_nodes(nodes, QueryBundle("how does parse_settings work?"))]
+    assert kept.index("app/settings.py") < kept.index("tests/test_settings.py")
+
+    kept = [n.node.metadata["file_path"] for n in reranker.postprocess_nodes(nodes, QueryBundle("which tests cover parse_settings?"))]
+    assert kept.index("tests/test_settings.py") < kept.index("app/settings.py")
+
+
+def test_small_candidate_lists_pass_through():
+    nodes = _candidates(*FILLER[:2])
+    assert LocalReranker(top_n=6).postprocess_nodes(nodes, QueryBundle("anything")) == nodes
+
+
+def test_factory_follows_reranker_setting(monkeypatch):
+    import reranker
+
+    monkeypatch.setattr(reranker, "RERANKER", "none")
+    assert create_node_postprocessors("repo") == []
+    assert retrieval_top_k(10) == 10
+
+    monkeypatch.setattr(reranker, "RERANKER", "local")
+    assert isinstance(create_node_postprocessors("repo")[0], LocalReranker)
+    assert retrieval_top_k(10) == reranker.RERANK_CANDIDATES
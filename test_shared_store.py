@@ -0,0 +1,96 @@
+import uuid
+
+import chromadb
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from shared_store import SharedChunkVectorStore
+
+LICENSE = "# Copyright (c) Example Corp.\n# Licensed under the MIT License.\n"
+HELPER = "def clamp(x, lo, hi):\n    return max(lo, min(x, hi))\n"
+
+
+def _collection():
+    return chromadb.EphemeralClient().get_or_create_collection(f"shared_{uuid.uuid4().hex}")
+
+
+def _node(node_id, text, path, embedding=None, parent=None):
+    node = TextNode(id_=node_id, text=text, metadata={"file_path": path}, embedding=embedding)
+    if parent:
+        node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=parent)
+    return node
+
+
+def _views(tmp_path, collection, *repos):
+    return [SharedChunkVectorStore(collection, str(tmp_path / f"{repo}.sqlite3"), repo) for repo in repos]
+
+
+def _query(view, embedding, k=5):
+    return view.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=k))
+
+
+def test_chunks_shared_across_repos_are_stored_once(tmp_path):
+    collection = _collection()
+    a, b = _views(tmp_path, collection, "a", "b")
+
+    a.add([_node("a1", LICENSE, "LICENSE", [1.0, 0.0]), _node("a2", HELPER, "util.py", [0.0, 1.0])])
+    # b's copy of the license needs no vector: a already stored it
+    b_license = _node("b1", LICENSE, "vendor/LICENSE", parent="b-parent")
+    assert b.missing_vectors([b_license]) == []
+    b.add([b_license])
+
+    assert collection.count() == 2
+    result = _query(b, [1.0, 0.0])
+    assert result.ids == ["b1"]
+    assert result.nodes[0].metadata["file_path"] == "vendor/LICENSE"
+    assert result.nodes[0].get_content() == LICENSE
+    assert result.nodes[0].parent_node.node_id == "b-parent"
+    assert _query(a, [1.0, 0.0], k=2).ids == ["a1", "a2"]
+
+
+def test_entry_survives_until_its_last_repo_drops_it(tmp_path):
+    collection = _collection()
+    a, b = _views(tmp_path, collection, "a", "b")
+    a.add([_node("a1", LICENSE, "LICENSE", [1.0, 0.0])])
+    b.add([_node("b1", LICENSE, "LICENSE")])
+
+    a.delete_file_paths({"LICENSE"})
+    assert collection.count() == 1
+    assert _query(a, [1.0, 0.0]).ids == []
+    assert _query(b, [1.0, 0.0]).ids == ["b1"]
+
+    b.delete_nodes(["b1"])
+    assert collection.count() == 0
+
+
+def test_entry_kept_while_another_node_of_the_repo_has_it(tmp_path):
+    collection = _collection()
+    (a,) = _views(tmp_path, collection, "a")
+    a.add([_node("a1", LICENSE, "LICENSE", [1.0, 0.0]), _node("a2", LICENSE, "docs/LICENSE")])
+
+    a.delete_file_paths({"LICENSE"})
+    assert _query(a, [1.0, 0.0]).ids == ["a2"]
+
+
+def test_new_content_without_vector_is_rejected(tmp_path):
+    (a,) = _views(tmp_path, _collection(), "a")
+    try:
+        a.add([_node("a1", HELPER, "util.py")])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_retag_and_clear_move_membership(tmp_path):
+    collection = _collection()
+    old, staging = _views(tmp_path, collection, "r", "r:staging")
+    old.add([_node("o1", LICENSE, "LICENSE", [1.0, 0.0]), _node("o2", HELPER, "old.py", [0.0, 1.0])])
+    staging.add([_node("s1", LICENSE, "LICENSE")])
+
+    old.clear()
+    staging.retag("r")
+
+    assert collection.count() == 1
+    assert collection.get(include=["metadatas"])["metadatas"] == [{"repos": ["r"]}]
+    assert _query(staging, [1.0, 0.0]).ids == ["s1"]